@@ -94,6 +94,18 @@ class ExternalServiceException(APIException):
         )
 
 
+class GatewayTimeoutException(APIException):
+    """Plazo de la petición agotado esperando a un servicio externo (504)"""
+
+    def __init__(self, service: str, timeout: float):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"External service '{service}' did not respond within {timeout:g}s",
+            error_code="GATEWAY_TIMEOUT",
+            extra={"service": service, "timeout_seconds": timeout},
+        )
+
+
 class RateLimitException(APIException):
     """Límite de tasa excedido (429)"""
 
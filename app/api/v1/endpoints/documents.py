@@ -1,10 +1,13 @@
 import asyncio
 import shutil
 import os
+from datetime import datetime, timedelta
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, Depends, status
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Depends, Query, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.services.transformer import procesar_archivo_subido
+from app.core.config import settings
 from app.core.database import get_session
 from app.models import Lote, Factura, User
 from app.core.deps import get_current_user
@@ -69,6 +72,13 @@ async def subir_documento(file: UploadFile = File(...)):
 @router.post("/emitir-facturas-masivas", response_model=BatchUploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def emitir_facturas_masivas(
     file: UploadFile = File(...),
+    plazo_segundos: Optional[int] = Query(
+        None, ge=0,
+        description=(
+            "Plazo del lote en segundos; 0 = sin plazo "
+            "(si se omite, LOTE_DEADLINE_SECONDS, que por defecto es 0)"
+        ),
+    ),
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
@@ -83,6 +93,8 @@ async def emitir_facturas_masivas(
     - Repository pattern
     - Validación mejorada
     - Excepciones personalizadas
+    - Plazo del lote: al vencer, lo que no se envió queda CANCELADA y el
+      lote termina EXPIRADO
     """
     # Validar tipo de archivo
     allowed_extensions = {".csv", ".xlsx", ".xls"}
@@ -93,6 +105,9 @@ async def emitir_facturas_masivas(
             f"File type {file_ext} not supported. Allowed: {', '.join(allowed_extensions)}"
         ])
 
+    plazo = settings.LOTE_DEADLINE_SECONDS if plazo_segundos is None else plazo_segundos
+    fecha_limite = datetime.utcnow() + timedelta(seconds=plazo) if plazo else None
+
     # 1. Guardar archivo temporal
     temp_filename = TEMP_DIR / f"lote_{file.filename}"
 
@@ -104,7 +119,9 @@ async def emitir_facturas_masivas(
         lote_repo = LoteRepository(session)
         nuevo_lote = Lote(
             nombre_archivo=file.filename,
-            estado="PENDIENTE"
+            estado="PENDIENTE",
+            usuario_id=current_user.id,
+            fecha_limite=fecha_limite,
         )
         lote_guardado = await lote_repo.create(nuevo_lote)
 
@@ -1,19 +1,29 @@
 import asyncio
 from typing import List, Optional
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.exc import DBAPIError
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.database import get_session
+from app.core.deadline import Deadline, DeadlineExpirado, con_deadline, sin_deadline
 from app.core.deps import get_current_user
 from app.models import User, Factura
 from app.services.api_client import factus_client
+from app.services.invoice_service import InvoiceService
+from app.services.send_scheduler import Carril
 from app.repositories.factura_repository import FacturaRepository
 from app.schemas import (
     InvoiceCreate,
     InvoiceResponse,
-    InvoiceListResponse,
+    InvoiceCursorListResponse,
+    CursorPageInfo,
+)
+from app.api.errors.http_errors import (
+    ValidationException,
+    NotFoundException,
+    ConflictException,
+    GatewayTimeoutException,
 )
-from app.api.errors.http_errors import ValidationException, NotFoundException, ConflictException
 
 router = APIRouter()
 
@@ -21,6 +31,10 @@ router = APIRouter()
 @router.post("/facturas", response_model=InvoiceResponse, status_code=status.HTTP_201_CREATED)
 async def crear_factura_individual(
     factura_in: InvoiceCreate,
+    timeout: Optional[float] = Query(
+        None, gt=0, le=300,
+        description="Plazo total de la petición en segundos (BD + Factus)",
+    ),
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
@@ -31,7 +45,25 @@ async def crear_factura_individual(
     - Schemas con validación automática
     - Excepciones personalizadas
     - Repository pattern
+    - Plazo opcional (`timeout`): recorta las consultas (statement_timeout)
+      y el envío a Factus; si vence antes de la respuesta se devuelve 504
+      y la factura no se guarda
     """
+    plazo = Deadline.en_segundos(timeout) if timeout else None
+    try:
+        with con_deadline(plazo):
+            return await _crear_factura(factura_in, session)
+    except DeadlineExpirado:
+        raise GatewayTimeoutException("Factus", timeout)
+    except DBAPIError:
+        if plazo is not None and plazo.expirado:
+            # Consulta cortada por el statement_timeout del plazo
+            raise GatewayTimeoutException("Factus", timeout)
+        raise
+
+
+async def _crear_factura(factura_in: InvoiceCreate, session: AsyncSession) -> InvoiceResponse:
+    """Validar, enviar a Factus (carril interactivo) y guardar la factura"""
 
     # 1. Validar que no exista referencia duplicada
     factura_repo = FacturaRepository(session)
@@ -94,8 +126,13 @@ async def crear_factura_individual(
         "items": items_transformados,
     }
 
-    # 5. Enviar a Factus API
-    resultado_api = await factus_client.enviar_factura(factura_payload)
+    # 5. Enviar a Factus API (carril interactivo: el usuario espera la respuesta)
+    resultado_api = await factus_client.enviar_factura(
+        factura_payload, carril=Carril.INTERACTIVO
+    )
+
+    if resultado_api.get("deadline_expirado"):
+        raise DeadlineExpirado()
 
     es_exito = resultado_api.get("status") in [200, 201]
     estado_final = "ENVIADA" if es_exito else "ERROR_API"
@@ -114,7 +151,12 @@ async def crear_factura_individual(
         lote_id=None,
     )
 
-    factura_guardada = await factura_repo.create(nueva_factura)
+    # Factus ya respondió: el resultado se guarda aunque el plazo venza aquí.
+    # Se cierra la transacción de lectura (con statement_timeout) para que el
+    # INSERT abra una nueva sin plazo.
+    with sin_deadline():
+        await session.rollback()
+        factura_guardada = await factura_repo.create(nueva_factura)
 
     # 7. Retornar respuesta transformada
     return InvoiceResponse(
@@ -152,25 +194,24 @@ async def obtener_factura(
     )
 
 
-@router.get("/facturas/cliente/{email}", response_model=InvoiceListResponse)
+@router.get("/facturas/cliente/{email}", response_model=InvoiceCursorListResponse)
 async def obtener_facturas_cliente(
     email: str,
-    page: int = 1,
     page_size: int = 50,
+    after: Optional[str] = Query(None, description="Cursor: facturas siguientes a esa"),
+    before: Optional[str] = Query(None, description="Cursor: facturas anteriores a esa"),
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Obtener facturas de un cliente con paginación"""
-    if page < 1 or page_size < 1:
-        raise ValidationException(["page and page_size must be positive"])
-
-    factura_repo = FacturaRepository(session)
-    skip = (page - 1) * page_size
+    """
+    Obtener facturas de un cliente, paginadas por cursores (más recientes primero).
 
-    facturas = await factura_repo.get_by_cliente_email(
-        email=email, skip=skip, limit=page_size
+    Usar page_info.next_cursor como `after` para la página siguiente y
+    page_info.prev_cursor como `before` para la anterior.
+    """
+    pagina = await InvoiceService(session).paginar_facturas_cliente(
+        email, limit=page_size, after=after, before=before
     )
-    total = await factura_repo.count(cliente_email=email)
 
     items = [
         InvoiceResponse(
@@ -182,11 +223,15 @@ async def obtener_facturas_cliente(
             motivo_rechazo=f.motivo_rechazo,
             factus_response=f.api_response,
         )
-        for f in facturas
+        for f in pagina.items
     ]
 
-    pages = (total + page_size - 1) // page_size
-
-    return InvoiceListResponse(
-        items=items, total=total, page=page, page_size=page_size, pages=pages
-    )
+    return InvoiceCursorListResponse(
+        items=items,
+        page_info=CursorPageInfo(
+            has_next=pagina.hay_siguiente,
+            has_previous=pagina.hay_anterior,
+            next_cursor=pagina.cursor_fin if pagina.hay_siguiente else None,
+            prev_cursor=pagina.cursor_inicio if pagina.hay_anterior else None,
+        ),
+    )
\ No newline at end of file
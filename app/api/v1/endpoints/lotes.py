@@ -0,0 +1,127 @@
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.deps import get_current_user
+from app.models import User
+from app.api.v1.service_deps import get_lote_service
+from app.services.lote_service import LoteService
+from app.services.progress import lote_progress_hub
+from app.schemas import LoteResponse, LoteReenvioResponse, LoteProgresoResponse
+
+router = APIRouter()
+
+
+def _evento_sse(progreso: LoteProgresoResponse) -> str:
+    return f"event: progreso\ndata: {progreso.model_dump_json()}\n\n"
+
+
+async def _stream_progreso(
+    request: Request, inicial: LoteProgresoResponse
+) -> AsyncIterator[str]:
+    """
+    Stream SSE del avance de un lote.
+
+    Cada evento lleva el snapshot completo, así un cliente que se reconecta
+    no necesita reconstruir nada. Termina cuando el lote llega a un estado
+    final, el cliente se desconecta o Redis deja de responder: en ese caso
+    el navegador se reconecta solo (`retry`) y recibe el estado de la BD,
+    una lectura por PK del lote, no de sus facturas.
+    """
+    yield f"retry: {int(settings.LOTE_PROGRESS_HEARTBEAT_SECONDS * 1000)}\n\n"
+    eventos = lote_progress_hub.seguir(
+        inicial.lote_id, inicial.model_dump(), settings.LOTE_PROGRESS_HEARTBEAT_SECONDS
+    )
+    # aclosing: al desconectarse el cliente se libera su suscripción en el hub
+    async with aclosing(eventos):
+        async for evento in eventos:
+            if await request.is_disconnected():
+                return
+            if evento is None:
+                # Keep-alive: evita que proxies cierren la conexión ociosa
+                yield ": keep-alive\n\n"
+                continue
+            yield _evento_sse(LoteProgresoResponse(**evento))
+
+
+@router.get("/lotes/{lote_id}/progreso", response_class=StreamingResponse)
+async def progreso_lote(
+    lote_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    lote_service: LoteService = Depends(get_lote_service),
+):
+    """
+    Avance en vivo de un lote (Server-Sent Events).
+
+    Un evento `progreso` por chunk ingerido, batch enviado o cambio de
+    estado, con procesados, enviadas, rechazadas, errores y facturas por
+    segundo. Reemplaza el polling de `lote(id)`.
+
+    Uso: `curl -N -H "Authorization: Bearer <token>" /api/v1/lotes/42/progreso`
+    """
+    inicial = await lote_service.obtener_progreso_lote(lote_id)
+    # Devolver la conexión al pool: el stream puede durar horas y no vuelve
+    # a leer la BD (la sesión de la request se cerraría recién al final)
+    await lote_service.session.close()
+    return StreamingResponse(
+        _stream_progreso(request, inicial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/lotes/{lote_id}/reenviar-fallidas",
+    response_model=LoteReenvioResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def reenviar_facturas_fallidas(
+    lote_id: int,
+    current_user: User = Depends(get_current_user),
+    lote_service: LoteService = Depends(get_lote_service),
+):
+    """
+    Reenviar a Factus solo las facturas ERROR_API de un lote
+    (ej: tras una caída de Factus), sin reprocesar el archivo.
+
+    Retorna inmediatamente; los envíos salen en background por el outbox.
+    """
+    return await lote_service.reenviar_facturas_fallidas(lote_id)
+
+
+@router.post("/lotes/{lote_id}/cancelar", response_model=LoteResponse)
+async def cancelar_lote(
+    lote_id: int,
+    current_user: User = Depends(get_current_user),
+    lote_service: LoteService = Depends(get_lote_service),
+):
+    """
+    Cancelar un lote: no se envían más facturas a Factus.
+
+    Los envíos en vuelo terminan y quedan registrados; el resto pasa a CANCELADA.
+    """
+    return await lote_service.cancelar_lote(lote_id)
+
+
+@router.post("/lotes/{lote_id}/pausar", response_model=LoteResponse)
+async def pausar_lote(
+    lote_id: int,
+    current_user: User = Depends(get_current_user),
+    lote_service: LoteService = Depends(get_lote_service),
+):
+    """Pausar los envíos de un lote (se retoman con /reanudar)"""
+    return await lote_service.pausar_lote(lote_id)
+
+
+@router.post("/lotes/{lote_id}/reanudar", response_model=LoteResponse)
+async def reanudar_lote(
+    lote_id: int,
+    current_user: User = Depends(get_current_user),
+    lote_service: LoteService = Depends(get_lote_service),
+):
+    """Reanudar los envíos de un lote pausado"""
+    return await lote_service.reanudar_lote(lote_id)
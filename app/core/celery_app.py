@@ -19,4 +19,31 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Confirmar la tarea solo al terminar: si el worker muere a mitad de un
+    # lote, el broker la re-entrega y el lote se reanuda desde su checkpoint.
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    # Con Redis, una tarea sin ack se re-entrega al vencer visibility_timeout
+    # aunque siga corriendo: debe superar la tarea más larga. Las tareas se
+    # mantienen cortas (la ingesta no drena el outbox y cada dispatcher
+    # procesa FACTUS_OUTBOX_TASK_BATCHES batches antes de re-encolarse).
+    broker_transport_options={
+        "visibility_timeout": int(os.getenv("CELERY_VISIBILITY_TIMEOUT", "7200")),
+    },
+    # Dispatcher global del outbox: recoge envíos con lease vencido
+    # (dispatcher caído) y los de lotes cuya tarea ya no está en la cola.
+    # Uno a la vez (lock en Redis) y con FACTUS_OUTBOX_SWEEP_BATCHES batches
+    # como máximo. Requiere `celery -A app.core.celery_app beat`.
+    beat_schedule={
+        "despachar-outbox": {
+            "task": "despachar_outbox_task",
+            "schedule": float(os.getenv("FACTUS_OUTBOX_SWEEP_SECONDS", "60")),
+        },
+        # Re-drive de facturas en el dead-letter con fallo transitorio
+        "redrive-dead-letters": {
+            "task": "redrive_dead_letters_task",
+            "schedule": float(os.getenv("FACTUS_DLQ_REDRIVE_SECONDS", "300")),
+        },
+    },
 )
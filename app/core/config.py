@@ -49,6 +49,89 @@ class Settings(BaseSettings):
     FACTUS_TOKEN: str = os.getenv("FACTUS_TOKEN", "mock-token-local")
     FACTUS_TIMEOUT: int = int(os.getenv("FACTUS_TIMEOUT", "30"))
     FACTUS_MOCK_MODE: bool = os.getenv("FACTUS_MOCK_MODE", "True").lower() == "true"
+    # Pool HTTP compartido (keep-alive + HTTP/2 opcional)
+    FACTUS_HTTP2: bool = os.getenv("FACTUS_HTTP2", "True").lower() == "true"
+    FACTUS_CONNECT_TIMEOUT: float = float(os.getenv("FACTUS_CONNECT_TIMEOUT", "5"))
+    FACTUS_MAX_CONNECTIONS: int = int(os.getenv("FACTUS_MAX_CONNECTIONS", "100"))
+    FACTUS_MAX_KEEPALIVE: int = int(os.getenv("FACTUS_MAX_KEEPALIVE", "20"))
+    FACTUS_KEEPALIVE_EXPIRY: float = float(os.getenv("FACTUS_KEEPALIVE_EXPIRY", "30"))
+    
+    # Cuota de envíos a Factus (token bucket compartido vía Redis)
+    FACTUS_RATE_LIMIT_ENABLED: bool = os.getenv("FACTUS_RATE_LIMIT_ENABLED", "True").lower() == "true"
+    FACTUS_RATE_LIMIT_PER_SECOND: float = float(os.getenv("FACTUS_RATE_LIMIT_PER_SECOND", "10"))
+    FACTUS_RATE_LIMIT_BURST: int = int(os.getenv("FACTUS_RATE_LIMIT_BURST", "20"))
+    FACTUS_RATE_LIMIT_KEY: str = os.getenv("FACTUS_RATE_LIMIT_KEY", "factus:rate_limit")
+    # Procesos que comparten la cuota (reparto del fallback local sin Redis)
+    FACTUS_RATE_LIMIT_NODES: int = int(os.getenv("FACTUS_RATE_LIMIT_NODES", "1"))
+    
+    # Reparto justo de la cuota entre lotes: un flujo (usuario, lote) sin
+    # envíos en FAIR_FLOW_TTL segundos deja de contar
+    FACTUS_FAIR_FLOW_TTL: float = float(os.getenv("FACTUS_FAIR_FLOW_TTL", "5"))
+    # Pesos por usuario "id:peso,id:peso" (por defecto 1)
+    FACTUS_FAIR_USER_WEIGHTS: str = os.getenv("FACTUS_FAIR_USER_WEIGHTS", "")
+    # Tokens del bucket que el tráfico masivo deja libres para el interactivo
+    FACTUS_INTERACTIVE_RESERVE: float = float(os.getenv("FACTUS_INTERACTIVE_RESERVE", "2"))
+    # Concurrencia adaptativa (AIMD) de peticiones en vuelo
+    FACTUS_CONCURRENCY_INITIAL: int = int(os.getenv("FACTUS_CONCURRENCY_INITIAL", "10"))
+    FACTUS_CONCURRENCY_MIN: int = int(os.getenv("FACTUS_CONCURRENCY_MIN", "1"))
+    FACTUS_CONCURRENCY_MAX: int = int(os.getenv("FACTUS_CONCURRENCY_MAX", "200"))
+    FACTUS_CONCURRENCY_BACKOFF: float = float(os.getenv("FACTUS_CONCURRENCY_BACKOFF", "0.5"))
+    # Latencia (s) por debajo de la cual la ventana puede crecer
+    FACTUS_LATENCY_TARGET: float = float(os.getenv("FACTUS_LATENCY_TARGET", "2.0"))
+    
+    # Reintentos (backoff exponencial + jitter) y presupuesto por lote
+    FACTUS_RETRY_MAX_ATTEMPTS: int = int(os.getenv("FACTUS_RETRY_MAX_ATTEMPTS", "4"))
+    FACTUS_RETRY_BASE_DELAY: float = float(os.getenv("FACTUS_RETRY_BASE_DELAY", "0.5"))
+    FACTUS_RETRY_MAX_DELAY: float = float(os.getenv("FACTUS_RETRY_MAX_DELAY", "30"))
+    FACTUS_RETRY_BUDGET_RATIO: float = float(os.getenv("FACTUS_RETRY_BUDGET_RATIO", "0.2"))
+    FACTUS_RETRY_BUDGET_MIN: int = int(os.getenv("FACTUS_RETRY_BUDGET_MIN", "20"))
+    
+    # Circuit breaker: fallos consecutivos para abrir y espera hasta el sondeo
+    FACTUS_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("FACTUS_CIRCUIT_FAILURE_THRESHOLD", "20"))
+    FACTUS_CIRCUIT_RESET_TIMEOUT: float = float(os.getenv("FACTUS_CIRCUIT_RESET_TIMEOUT", "30"))
+    
+    # Grabación / reproducción de tráfico (off, record, replay) para benchmarks
+    FACTUS_RECORD_MODE: str = os.getenv("FACTUS_RECORD_MODE", "off")
+    FACTUS_RECORD_FILE: str = os.getenv("FACTUS_RECORD_FILE", "recordings/factus.jsonl.gz")
+    # Multiplicador de la latencia grabada en replay (0 = sin espera)
+    FACTUS_REPLAY_LATENCY_SCALE: float = float(os.getenv("FACTUS_REPLAY_LATENCY_SCALE", "1.0"))
+    
+    # ========== PROCESAMIENTO DE LOTES ==========
+    # Facturas enviadas y confirmadas en BD por cada checkpoint
+    LOTE_CHUNK_SIZE: int = int(os.getenv("LOTE_CHUNK_SIZE", "500"))
+    # Plazo por defecto de un lote en segundos (0 = sin plazo, el default);
+    # al vencer, lo que no se envió se cancela y el lote queda EXPIRADO
+    LOTE_DEADLINE_SECONDS: int = int(os.getenv("LOTE_DEADLINE_SECONDS", "0"))
+    # Outbox: envíos reclamados por dispatcher en cada vuelta
+    FACTUS_OUTBOX_BATCH_SIZE: int = int(os.getenv("FACTUS_OUTBOX_BATCH_SIZE", "100"))
+    # Segundos que un dispatcher retiene sus filas antes de que otro las
+    # reclame; se renueva antes de cada envío (solo vence si el dispatcher cae)
+    FACTUS_OUTBOX_LEASE_SECONDS: float = float(os.getenv("FACTUS_OUTBOX_LEASE_SECONDS", "300"))
+    # Dispatchers en paralelo por lote (cada uno en su propia tarea Celery)
+    FACTUS_OUTBOX_DISPATCHERS: int = int(os.getenv("FACTUS_OUTBOX_DISPATCHERS", "4"))
+    # Batches por tarea dispatcher; luego se re-encola (tareas Celery cortas)
+    FACTUS_OUTBOX_TASK_BATCHES: int = int(os.getenv("FACTUS_OUTBOX_TASK_BATCHES", "10"))
+    # Batches del barrido global de celery beat: solo recoge leases vencidos
+    # y rezagados; el drenado lo hacen los dispatchers de cada lote
+    FACTUS_OUTBOX_SWEEP_BATCHES: int = int(os.getenv("FACTUS_OUTBOX_SWEEP_BATCHES", "1"))
+    # Dead-letter: facturas reencoladas por pasada del re-driver
+    FACTUS_DLQ_REDRIVE_BATCH: int = int(os.getenv("FACTUS_DLQ_REDRIVE_BATCH", "1000"))
+    # Espera antes del siguiente re-drive de una factura (se duplica en cada uno)
+    FACTUS_DLQ_BACKOFF_SECONDS: float = float(os.getenv("FACTUS_DLQ_BACKOFF_SECONDS", "60"))
+    # Re-drives automáticos por factura antes de dejarla para revisión manual
+    FACTUS_DLQ_MAX_REDRIVES: int = int(os.getenv("FACTUS_DLQ_MAX_REDRIVES", "5"))
+    # Progreso en vivo de los lotes (Redis): prefijo de claves/canales y
+    # segundos que se conserva el último snapshot
+    LOTE_PROGRESS_KEY: str = os.getenv("LOTE_PROGRESS_KEY", "factus:lote-progreso")
+    LOTE_PROGRESS_TTL_SECONDS: int = int(os.getenv("LOTE_PROGRESS_TTL_SECONDS", "86400"))
+    # Segundos entre keep-alives del stream SSE de progreso
+    LOTE_PROGRESS_HEARTBEAT_SECONDS: float = float(os.getenv("LOTE_PROGRESS_HEARTBEAT_SECONDS", "15"))
+    
+    # Totales de los listados: segundos que vale un conteo cacheado y
+    # mínimo de filas estimadas para devolver la estimación del planner
+    # (por debajo se cuenta exacto)
+    COUNT_CACHE_TTL_SECONDS: float = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "30"))
+    COUNT_ESTIMATE_MIN_ROWS: int = int(os.getenv("COUNT_ESTIMATE_MIN_ROWS", "10000"))
     
     # ========== REDIS / CACHÉ ==========
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -0,0 +1,111 @@
+"""Deadline - Presupuesto de tiempo propagado por contextvars"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExpirado(Exception):
+    """El presupuesto de tiempo se agotó antes de terminar la operación"""
+
+
+class Deadline:
+    """
+    Instante límite para terminar un trabajo (lote o petición).
+
+    Se propaga implícitamente con un ContextVar: asyncio.gather y las
+    tareas hijas heredan el contexto, así el límite llega a los envíos
+    HTTP (timeout recortado) y a la BD (statement_timeout) sin pasar el
+    objeto por cada firma.
+    """
+
+    def __init__(self, expira: float):
+        self.expira = expira  # time.monotonic()
+
+    @classmethod
+    def en_segundos(cls, segundos: float) -> "Deadline":
+        return cls(time.monotonic() + segundos)
+
+    @classmethod
+    def desde_fecha(cls, fecha_limite: datetime) -> "Deadline":
+        """Desde una fecha UTC naive (como las columnas del modelo)"""
+        return cls.en_segundos((fecha_limite - datetime.utcnow()).total_seconds())
+
+    def restante(self) -> float:
+        return max(0.0, self.expira - time.monotonic())
+
+    @property
+    def expirado(self) -> bool:
+        return self.restante() <= 0
+
+
+_deadline_actual: ContextVar[Optional[Deadline]] = ContextVar("deadline_actual", default=None)
+
+
+def deadline_actual() -> Optional[Deadline]:
+    return _deadline_actual.get()
+
+
+def deadline_expirado() -> bool:
+    deadline = _deadline_actual.get()
+    return deadline is not None and deadline.expirado
+
+
+def tiempo_restante(maximo: float) -> float:
+    """`maximo` recortado al tiempo que le queda al deadline actual"""
+    deadline = _deadline_actual.get()
+    if deadline is None:
+        return maximo
+    return min(maximo, deadline.restante())
+
+
+@contextmanager
+def con_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Ejecutar el bloque bajo `deadline` (None = sin cambios).
+
+    Si ya hay uno más estricto en el contexto, se conserva ese.
+    """
+    actual = _deadline_actual.get()
+    if deadline is None or (actual is not None and actual.expira <= deadline.expira):
+        yield actual
+        return
+    token = _deadline_actual.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline_actual.reset(token)
+
+
+@contextmanager
+def sin_deadline() -> Iterator[None]:
+    """
+    Ejecutar el bloque sin deadline (ej: registrar el resultado parcial
+    de un lote expirado; ese trabajo no debe cancelarse).
+    """
+    token = _deadline_actual.set(None)
+    try:
+        yield
+    finally:
+        _deadline_actual.reset(token)
+
+
+async def esperar(aw: Awaitable[T]) -> T:
+    """
+    Esperar `aw` como máximo hasta el deadline actual.
+
+    Raises:
+        DeadlineExpirado: si el deadline vence antes (aw se cancela)
+    """
+    deadline = _deadline_actual.get()
+    if deadline is None:
+        return await aw
+    try:
+        return await asyncio.wait_for(aw, deadline.restante())
+    except asyncio.TimeoutError:
+        raise DeadlineExpirado() from None
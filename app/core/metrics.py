@@ -0,0 +1,57 @@
+"""Metrics - Registro de métricas en memoria del proceso"""
+
+from typing import Any, Dict, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _render(name: str, key: LabelKey) -> str:
+    """Formato estilo Prometheus: nombre{label="valor"}"""
+    if not key:
+        return name
+    labels = ",".join(f'{k}="{v}"' for k, v in key)
+    return f"{name}{{{labels}}}"
+
+
+class MetricsRegistry:
+    """
+    Gauges y contadores del proceso actual (API o worker Celery).
+
+    Uso:
+        metrics.set_gauge("factus_concurrency_limit", 12.5)
+        metrics.inc("factus_requests_total", status=429)
+        metrics.snapshot()  # expuesto en GET /metrics
+    """
+
+    def __init__(self):
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Fijar el valor actual de un gauge"""
+        self._gauges[(name, _label_key(labels))] = value
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Incrementar un contador"""
+        key = (name, _label_key(labels))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def remove_gauge(self, name: str, **labels) -> None:
+        """Eliminar un gauge (ej: flujo que ya terminó)"""
+        self._gauges.pop((name, _label_key(labels)), None)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Copia serializable de todas las métricas"""
+        return {
+            "gauges": {_render(n, k): v for (n, k), v in self._gauges.items()},
+            "counters": {_render(n, k): v for (n, k), v in self._counters.items()},
+        }
+
+
+# Instancia global
+metrics = MetricsRegistry()
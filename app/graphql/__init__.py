@@ -4,6 +4,7 @@ from app.graphql.types import (
     InvoiceType, InvoiceListType, LoteType, LoteListType,
     LoteDetailType, LoteStatisticsType, UserType, AuthResponseType,
     SimpleInvoiceType,
+    PageInfo, InvoiceEdge, InvoiceConnection, LoteEdge, LoteConnection,
     EstadoFactura, EstadoLote
 )
 from app.graphql.inputs import (
@@ -20,6 +21,7 @@ __all__ = [
     "InvoiceType", "InvoiceListType", "SimpleInvoiceType",
     "LoteType", "LoteListType", "LoteDetailType",
     "LoteStatisticsType", "UserType", "AuthResponseType",
+    "PageInfo", "InvoiceEdge", "InvoiceConnection", "LoteEdge", "LoteConnection",
     "EstadoFactura", "EstadoLote",
     
     # Inputs
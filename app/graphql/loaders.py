@@ -0,0 +1,81 @@
+"""GraphQL Loaders - DataLoaders por request para las relaciones"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from strawberry.dataloader import DataLoader
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Factura, Lote, User
+from app.repositories.factura_repository import FacturaRepository
+from app.repositories.lote_repository import LoteRepository
+from app.repositories.user_repository import UserRepository
+
+# (lote_id, skip, limit, columnas): las facturas se paginan por lote y se
+# leen solo las columnas que pide la query
+ClaveFacturas = Tuple[int, int, int, Tuple[str, ...]]
+
+T = TypeVar("T")
+
+
+class Loaders:
+    """
+    DataLoaders de una request GraphQL (se crean en get_graphql_context).
+
+    Los resolvers piden de a un elemento (el lote de una factura, el
+    usuario de un lote) y el DataLoader junta todas las claves pedidas en
+    el mismo nivel de la query en una sola consulta (WHERE id IN ...).
+    Cada request tiene su propia caché: nada se comparte entre usuarios.
+
+    Las consultas de distintos loaders se serializan con un lock: la
+    AsyncSession de la request no admite operaciones concurrentes. Los
+    resolvers que consultan la sesión a la par de los loaders (ej.
+    totalCount junto a edges) usan el mismo lock vía `ejecutar`.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._lock = asyncio.Lock()
+        self.lote = DataLoader(load_fn=self._cargar_lotes)
+        self.usuario = DataLoader(load_fn=self._cargar_usuarios)
+        self.facturas_de_lote = DataLoader(load_fn=self._cargar_facturas_de_lotes)
+
+    async def ejecutar(self, operacion: Callable[[], Awaitable[T]]) -> T:
+        """
+        Correr una consulta sobre la sesión de la request en turno con los
+        loaders. `operacion` no debe usar un loader (el lock no es reentrante).
+        """
+        async with self._lock:
+            return await operacion()
+
+    async def _cargar_lotes(self, ids: List[int]) -> List[Optional[Lote]]:
+        async with self._lock:
+            por_id = await LoteRepository(self.session).get_by_ids(ids)
+        return [por_id.get(lote_id) for lote_id in ids]
+
+    async def _cargar_usuarios(self, ids: List[int]) -> List[Optional[User]]:
+        async with self._lock:
+            por_id = await UserRepository(self.session).get_by_ids(ids)
+        return [por_id.get(usuario_id) for usuario_id in ids]
+
+    async def _cargar_facturas_de_lotes(
+        self, claves: List[ClaveFacturas]
+    ) -> List[List[Factura]]:
+        """
+        Una consulta por ventana (skip, limit) y proyección distintas;
+        normalmente es una sola.
+        """
+        por_ventana: Dict[Tuple[int, int, Tuple[str, ...]], List[int]] = {}
+        for lote_id, skip, limit, columnas in claves:
+            por_ventana.setdefault((skip, limit, columnas), []).append(lote_id)
+
+        repo = FacturaRepository(self.session)
+        cargadas: Dict[ClaveFacturas, List[Factura]] = {}
+        async with self._lock:
+            for (skip, limit, columnas), lote_ids in por_ventana.items():
+                por_lote = await repo.get_by_lotes(
+                    lote_ids, limit=limit, skip=skip, columnas=columnas
+                )
+                for lote_id in lote_ids:
+                    cargadas[(lote_id, skip, limit, columnas)] = por_lote.get(lote_id, [])
+        return [cargadas[clave] for clave in claves]
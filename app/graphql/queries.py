@@ -1,19 +1,27 @@
 """GraphQL Queries - Resolvers de lectura"""
 
+import json
 import strawberry
-from typing import List, Optional
+from sqlalchemy import inspect
+from typing import Awaitable, Callable, List, Optional
 from strawberry.types import Info
 
 from app.graphql.types import (
-    InvoiceType, InvoiceListType, LoteType, LoteListType,
-    LoteDetailType, LoteStatisticsType, UserType, SimpleInvoiceType
+    InvoiceType, LoteType, LoteListType,
+    LoteDetailType, LoteStatisticsType, UserType, SimpleInvoiceType,
+    PageInfo, InvoiceEdge, InvoiceConnection, LoteEdge, LoteConnection
 )
 from app.graphql.inputs import PaginationInput
+from app.graphql.selection import columnas_pedidas
 from app.services.invoice_service import InvoiceService
 from app.services.lote_service import LoteService
 from app.core.database import get_session
 from app.core.deps import get_current_user
-from app.models import User
+from app.models import Factura, User
+from app.repositories.conteo import CONTEO_CACHE, CONTEO_ESTIMADO
+from app.repositories.factura_repository import FacturaRepository
+from app.repositories.pagination import Pagina
+from app.api.errors.http_errors import NotFoundException, ValidationException
 
 
 @strawberry.type
@@ -38,84 +46,48 @@ class Query:
             InvoiceType con la factura
         """
         session = info.context.get("session")
-        service = InvoiceService(session)
-        invoice_response = await service.obtener_factura(id)
-        
-        return InvoiceType(
-            id=invoice_response.id,
-            numbering_range_id=invoice_response.numbering_range_id,
-            reference_code=invoice_response.reference_code,
-            observation=None,
-            payment_form="1",
-            payment_method_code="10",
-            cliente_email=invoice_response.cliente_email,
-            cliente_nombre=invoice_response.cliente_nombre,
-            total=invoice_response.total,
-            estado=invoice_response.estado,
-            motivo_rechazo=invoice_response.motivo_rechazo,
-            api_response=invoice_response.api_response,
-            created_at=invoice_response.created_at,
-            updated_at=invoice_response.updated_at,
-            lote_id=invoice_response.lote_id,
-            usuario_id=invoice_response.usuario_id
+        factura = await FacturaRepository(session).get(
+            id, columnas=_columnas_factura(info)
         )
+        if not factura:
+            raise NotFoundException("Factura", id)
+        
+        return _invoice_type(factura)
     
     @strawberry.field
     async def invoices(
         self,
         info: Info,
         estado: Optional[str] = None,
-        pagination: Optional[PaginationInput] = None
-    ) -> InvoiceListType:
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None
+    ) -> InvoiceConnection:
         """
-        Listar facturas con paginación y filtros.
+        Listar facturas por cursores (más recientes primero).
+        
+        OPTIMIZACIÓN: Paginación keyset sobre el id (ix_factura_estado_id
+        con filtro): la página 10.000 cuesta lo mismo que la primera.
         
         Args:
             estado: Filtro por estado (PENDIENTE, ENVIADA, etc.)
-            pagination: Parámetros de paginación (skip, limit)
+            first/after: Facturas siguientes al cursor `after`
+            last/before: Facturas anteriores al cursor `before`
             
         Returns:
-            InvoiceListType con lista paginada
+            InvoiceConnection con edges y pageInfo
         """
         session = info.context.get("session")
         service = InvoiceService(session)
         
-        skip = pagination.skip if pagination else 0
-        limit = pagination.limit if pagination else 100
-        
-        list_response = await service.listar_facturas(
-            estado=estado,
-            skip=skip,
-            limit=limit
+        filtros = {"estado": estado} if estado else {}
+        pagina = await service.get_page(
+            _limite_connection(first, last), after, before,
+            columnas=_columnas_factura(info, "edges", "node"), **filtros
         )
-        
-        items = [
-            InvoiceType(
-                id=inv.id,
-                numbering_range_id=inv.numbering_range_id,
-                reference_code=inv.reference_code,
-                observation=None,
-                payment_form="1",
-                payment_method_code="10",
-                cliente_email=inv.cliente_email,
-                cliente_nombre=inv.cliente_nombre,
-                total=inv.total,
-                estado=inv.estado,
-                motivo_rechazo=inv.motivo_rechazo,
-                api_response=inv.api_response,
-                created_at=inv.created_at,
-                updated_at=inv.updated_at,
-                lote_id=inv.lote_id,
-                usuario_id=inv.usuario_id
-            )
-            for inv in list_response.items
-        ]
-        
-        return InvoiceListType(
-            items=items,
-            total=list_response.total,
-            skip=skip,
-            limit=limit
+        return _invoice_connection(
+            pagina, lambda: service.count(CONTEO_ESTIMADO, **filtros)
         )
     
     @strawberry.field
@@ -123,57 +95,30 @@ class Query:
         self,
         info: Info,
         email: str,
-        pagination: Optional[PaginationInput] = None
-    ) -> InvoiceListType:
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None
+    ) -> InvoiceConnection:
         """
-        Obtener facturas de un cliente por email.
+        Obtener facturas de un cliente por email, por cursores.
         
         Args:
             email: Email del cliente
-            pagination: Parámetros de paginación
+            first/after, last/before: Ventana de la connection
             
         Returns:
-            InvoiceListType con facturas del cliente
+            InvoiceConnection con facturas del cliente
         """
         session = info.context.get("session")
         service = InvoiceService(session)
         
-        skip = pagination.skip if pagination else 0
-        limit = pagination.limit if pagination else 100
-        
-        list_response = await service.obtener_facturas_cliente(
-            email=email,
-            skip=skip,
-            limit=limit
+        pagina = await service.paginar_facturas_cliente(
+            email, _limite_connection(first, last), after, before,
+            columnas=_columnas_factura(info, "edges", "node")
         )
-        
-        items = [
-            InvoiceType(
-                id=inv.id,
-                numbering_range_id=inv.numbering_range_id,
-                reference_code=inv.reference_code,
-                observation=None,
-                payment_form="1",
-                payment_method_code="10",
-                cliente_email=inv.cliente_email,
-                cliente_nombre=inv.cliente_nombre,
-                total=inv.total,
-                estado=inv.estado,
-                motivo_rechazo=inv.motivo_rechazo,
-                api_response=inv.api_response,
-                created_at=inv.created_at,
-                updated_at=inv.updated_at,
-                lote_id=inv.lote_id,
-                usuario_id=inv.usuario_id
-            )
-            for inv in list_response.items
-        ]
-        
-        return InvoiceListType(
-            items=items,
-            total=list_response.total,
-            skip=skip,
-            limit=limit
+        return _invoice_connection(
+            pagina, lambda: service.count(CONTEO_CACHE, cliente_email=email)
         )
     
     # ============= LOTE QUERIES =============
@@ -185,50 +130,33 @@ class Query:
         id: int
     ) -> LoteDetailType:
         """
-        Obtener un lote con detalles completos (con facturas preload).
+        Obtener un lote con detalles completos.
         
-        OPTIMIZACIÓN: Usa eager loading (selectinload) para prevenir N+1 problem.
-        Sin optimización: 1 query para lote + 1 query por cada factura
-        Con optimización: 1 query con JOIN que carga todo
+        OPTIMIZACIÓN: El lote se lee por PK; sus facturas (`facturas`) no
+        se precargan: las resuelve LoteDetailType.facturas por el DataLoader,
+        paginadas y leyendo solo las columnas que pide la query.
         
         Args:
             id: ID del lote
             
         Returns:
-            LoteDetailType con información del lote y facturas relacionadas
+            LoteDetailType con información del lote
         """
         session = info.context.get("session")
         
-        # Usar LoteRepository con método optimizado (selectinload)
         from app.repositories import LoteRepository
-        lote_repo = LoteRepository(session)
-        lote_detail = await lote_repo.get_with_relations(id)
+        lote_detail = await LoteRepository(session).get(id)
         
         if not lote_detail:
-            from app.api.errors.http_errors import NotFoundException
             raise NotFoundException("Lote", id)
         
-        # Convertir facturas a SimpleInvoiceType
-        # Ahora las facturas YA están cargadas (no genera queries adicionales)
-        facturas_convertidas = [
-            SimpleInvoiceType(
-                id=factura.id,
-                reference_code=factura.reference_code,
-                cliente_email=factura.cliente_email or "",
-                estado=factura.estado,
-                total=factura.total
-            )
-            for factura in (lote_detail.facturas or [])
-        ]
-        
         return LoteDetailType(
             id=lote_detail.id,
             nombre_archivo=lote_detail.nombre_archivo,
             fecha_carga=lote_detail.fecha_carga,
             total_registros=lote_detail.total_registros,
             registros_procesados=lote_detail.registros_procesados,
-            estado=lote_detail.estado,
-            facturas=facturas_convertidas or []
+            estado=lote_detail.estado
         )
     
     @strawberry.field
@@ -236,65 +164,40 @@ class Query:
         self,
         info: Info,
         estado: Optional[str] = None,
-        pagination: Optional[PaginationInput] = None
-    ) -> LoteListType:
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None
+    ) -> LoteConnection:
         """
-        Listar lotes con paginación y filtros (con facturas preload).
+        Listar lotes por cursores (más recientes primero).
         
-        OPTIMIZACIÓN: Usa eager loading (selectinload) para prevenir N+1 problem.
-        Sin optimización: 1 query para listar + 1 query por cada lote para sus facturas
-        Con optimización: 1 query con JOIN para todos los lotes y sus facturas
+        OPTIMIZACIÓN: Paginación keyset sobre el id (ix_lote_estado_id con
+        filtro). Las facturas (`node { facturas }`) y el usuario de los
+        lotes los cargan DataLoaders: una consulta por nivel para toda la
+        página, solo si la query los pide.
         
         Args:
             estado: Filtro por estado (PENDIENTE, PROCESANDO, COMPLETADO, etc.)
-            pagination: Parámetros de paginación (skip, limit)
+            first/after, last/before: Ventana de la connection
             
         Returns:
-            LoteListType con lista de lotes y metadata
+            LoteConnection con edges y pageInfo
         """
         session = info.context.get("session")
+        service = LoteService(session)
         
-        skip = pagination.skip if pagination else 0
-        limit = pagination.limit if pagination else 100
-        
-        # Usar LoteRepository con método optimizado (selectinload)
-        from app.repositories import LoteRepository
-        lote_repo = LoteRepository(session)
-        
-        # Si se pide filtrar por estado, usar método especializado
-        if estado:
-            result = await lote_repo.get_by_estado_with_relations(
-                estado=estado,
-                skip=skip,
-                limit=limit
-            )
-            total = await lote_repo.count_by_estado(estado)
-        else:
-            # Traer todos con relaciones
-            result = await lote_repo.get_all_with_relations(
-                skip=skip,
-                limit=limit
-            )
-            total = await lote_repo.count()
-        
-        items = [
-            LoteType(
-                id=lote.id,
-                nombre_archivo=lote.nombre_archivo,
-                fecha_carga=lote.fecha_carga,
-                total_registros=lote.total_registros,
-                registros_procesados=lote.registros_procesados,
-                estado=lote.estado,
-                usuario_id=lote.usuario_id
-            )
-            for lote in result
-        ]
-        
-        return LoteListType(
-            items=items,
-            total=total,
-            skip=skip,
-            limit=limit
+        filtros = {"estado": estado} if estado else {}
+        pagina = await service.paginar_lotes(
+            estado, _limite_connection(first, last), after, before
+        )
+        return LoteConnection(
+            edges=[
+                LoteEdge(cursor=cursor, node=_lote_type(lote))
+                for lote, cursor in zip(pagina.items, pagina.cursores)
+            ],
+            page_info=_page_info(pagina),
+            contar=lambda: service.count(CONTEO_CACHE, **filtros)
         )
     
     @strawberry.field
@@ -304,9 +207,10 @@ class Query:
         pagination: Optional[PaginationInput] = None
     ) -> LoteListType:
         """
-        Obtener historial de lotes (últimos primero) con facturas preload.
+        Obtener historial de lotes (últimos primero).
         
-        OPTIMIZACIÓN: Usa eager loading (selectinload) para prevenir N+1 problem.
+        OPTIMIZACIÓN: Sin relaciones; si la query pide `items { facturas }`
+        las carga un DataLoader (una consulta para todos los lotes, sin N+1).
         Retorna lotes ordenados por fecha_carga DESC.
         
         Args:
@@ -320,31 +224,16 @@ class Query:
         skip = pagination.skip if pagination else 0
         limit = pagination.limit if pagination else 100
         
-        # Usar LoteRepository con método optimizado (selectinload)
         from app.repositories import LoteRepository
         lote_repo = LoteRepository(session)
         
         # Obtener historial ordenado por fecha DESC
-        result = await lote_repo.get_historial_with_relations(
-            skip=skip,
-            limit=limit
-        )
+        result = await lote_repo.get_historial(skip=skip, limit=limit)
         
         # Para historial, contar TODOS los lotes (sin filtro)
-        total = await lote_repo.count()
+        total = await lote_repo.count(CONTEO_CACHE)
         
-        items = [
-            LoteType(
-                id=lote.id,
-                nombre_archivo=lote.nombre_archivo,
-                fecha_carga=lote.fecha_carga,
-                total_registros=lote.total_registros,
-                registros_procesados=lote.registros_procesados,
-                estado=lote.estado,
-                usuario_id=lote.usuario_id
-            )
-            for lote in result
-        ]
+        items = [_lote_type(lote) for lote in result]
         
         return LoteListType(
             items=items,
@@ -362,8 +251,9 @@ class Query:
         """
         Obtener estadísticas de un lote (conteos y montos).
         
-        OPTIMIZACIÓN: Calcula estadísticas en base de datos (no en memoria).
-        Retorna agregaciones directas sin transferir datos innecesarios.
+        OPTIMIZACIÓN: Lee los contadores que el pipeline mantiene en la fila
+        del lote (una lectura por PK): no se cargan facturas ni su JSONB
+        api_response, cuesta lo mismo con 10 que con 200.000 facturas.
         
         Args:
             lote_id: ID del lote
@@ -373,35 +263,112 @@ class Query:
         """
         session = info.context.get("session")
         
-        # Usar LoteRepository para obtener estadísticas optimizadas
         from app.repositories import LoteRepository
-        lote_repo = LoteRepository(session)
-        
-        # Obtener lote con sus facturas
-        lote = await lote_repo.get_with_relations(lote_id)
+        stats = await LoteRepository(session).get_estadisticas(lote_id)
         
-        if not lote:
+        if stats is None:
             from app.api.errors.http_errors import NotFoundException
             raise NotFoundException("Lote", lote_id)
         
-        # Calcular estadísticas desde facturas cargadas
-        facturas = lote.facturas or []
-        
-        total_facturas = len(facturas)
-        enviadas = sum(1 for f in facturas if f.estado == "ENVIADA")
-        rechazadas = sum(1 for f in facturas if f.estado == "RECHAZADA")
-        pendientes = sum(1 for f in facturas if f.estado in ["PENDIENTE", "PROCESANDO"])
-        
-        total_monto = sum(f.total for f in facturas if f.total)
-        promedio_monto = (total_monto / total_facturas) if total_facturas > 0 else 0.0
-        tasa_exito = ((enviadas / total_facturas) * 100) if total_facturas > 0 else 0.0
-        
-        return LoteStatisticsType(
-            total_facturas=total_facturas,
-            enviadas=enviadas,
-            rechazadas=rechazadas,
-            pendientes=pendientes,
-            total_monto=total_monto,
-            promedio_monto=promedio_monto,
-            tasa_exito=tasa_exito
-        )
+        return LoteStatisticsType(**stats)
+
+
+# ============= HELPERS =============
+
+def _limite_connection(first: Optional[int], last: Optional[int]) -> int:
+    """Tamaño de página de una connection (first o last, no ambos)"""
+    if first is not None and last is not None:
+        raise ValidationException(["Use either first or last, not both"])
+    if first is not None:
+        return first
+    return last if last is not None else 100
+
+
+def _page_info(pagina: Pagina) -> PageInfo:
+    return PageInfo(
+        has_next_page=pagina.hay_siguiente,
+        has_previous_page=pagina.hay_anterior,
+        start_cursor=pagina.cursor_inicio,
+        end_cursor=pagina.cursor_fin
+    )
+
+
+# Columnas que leen los campos de InvoiceType que no son columnas
+_DEPENDENCIAS_FACTURA = {"lote": ["lote_id"]}
+
+
+def _columnas_factura(info: Info, *ruta: str) -> List[str]:
+    """Columnas de Factura que necesita la selección bajo `ruta`"""
+    return columnas_pedidas(info, Factura, *ruta, dependencias=_DEPENDENCIAS_FACTURA)
+
+
+def _columna(factura, nombre: str):
+    """
+    Valor de una columna de la factura, o None si no se cargó.
+
+    La factura puede venir proyectada (load_only): las columnas no
+    cargadas no se pidieron en la query (leerlas dispararía una carga
+    perezosa, que en async falla).
+    """
+    return None if nombre in inspect(factura).unloaded else getattr(factura, nombre)
+
+
+def _invoice_type(factura) -> InvoiceType:
+    """Factura (ORM, posiblemente proyectada) → InvoiceType"""
+    api_response = _columna(factura, "api_response")
+    return InvoiceType(
+        id=factura.id,
+        numbering_range_id=None,
+        reference_code=_columna(factura, "reference_code"),
+        observation=None,
+        payment_form="1",
+        payment_method_code="10",
+        cliente_email=_columna(factura, "cliente_email"),
+        cliente_nombre=None,
+        total=_columna(factura, "total"),
+        estado=_columna(factura, "estado"),
+        motivo_rechazo=_columna(factura, "motivo_rechazo"),
+        api_response=json.dumps(api_response) if api_response is not None else None,
+        created_at=None,
+        updated_at=None,
+        lote_id=_columna(factura, "lote_id"),
+        usuario_id=None
+    )
+
+
+def _simple_invoice_type(factura) -> SimpleInvoiceType:
+    """Factura (ORM, posiblemente proyectada) → SimpleInvoiceType"""
+    return SimpleInvoiceType(
+        id=factura.id,
+        reference_code=_columna(factura, "reference_code"),
+        cliente_email=_columna(factura, "cliente_email") or "",
+        estado=_columna(factura, "estado"),
+        total=_columna(factura, "total")
+    )
+
+
+def _invoice_connection(
+    pagina: Pagina, contar: Callable[[], Awaitable[int]]
+) -> InvoiceConnection:
+    return InvoiceConnection(
+        edges=[
+            InvoiceEdge(cursor=cursor, node=_invoice_type(factura))
+            for factura, cursor in zip(pagina.items, pagina.cursores)
+        ],
+        page_info=_page_info(pagina),
+        contar=contar
+    )
+
+
+def _lote_type(result) -> LoteType:
+    """Lote (ORM) o LoteResponse → LoteType"""
+    return LoteType(
+        id=result.id,
+        nombre_archivo=result.nombre_archivo,
+        fecha_carga=result.fecha_carga,
+        total_registros=result.total_registros,
+        registros_procesados=result.registros_procesados,
+        estado=result.estado,
+        usuario_id=result.usuario_id,
+        fecha_limite=result.fecha_limite
+    )
@@ -1,13 +1,15 @@
 """GraphQL Schema - Unificación de tipos, queries, mutations"""
 
 import strawberry
-from typing import Optional
+from contextlib import aclosing
+from typing import AsyncGenerator, Optional
 from strawberry.types import Info
 
 # Importar todos los tipos
 from app.graphql.types import (
     InvoiceType, InvoiceListType, LoteType, LoteListType,
-    LoteDetailType, LoteStatisticsType, UserType, AuthResponseType
+    LoteDetailType, LoteStatisticsType, UserType, AuthResponseType,
+    LoteResendType, LoteProgressType
 )
 
 # Importar inputs
@@ -19,9 +21,11 @@ from app.graphql.inputs import (
 from app.services.invoice_service import InvoiceService
 from app.services.lote_service import LoteService
 from app.services.auth_service import AuthService
+from app.services.progress import lote_progress_hub
+from app.core.config import settings
 
 # Importar Query existente
-from app.graphql.queries import Query
+from app.graphql.queries import Query, _lote_type
 
 
 # ============= MUTATIONS =============
@@ -192,8 +196,84 @@ class Mutation:
             total_registros=result.total_registros,
             registros_procesados=result.registros_procesados,
             estado=result.estado,
-            usuario_id=result.usuario_id
+            usuario_id=result.usuario_id,
+            fecha_limite=result.fecha_limite
+        )
+
+    @strawberry.mutation
+    async def resend_failed_invoices(
+        self,
+        info: Info,
+        lote_id: int
+    ) -> LoteResendType:
+        """
+        Reenviar solo las facturas ERROR_API de un lote.
+        
+        Args:
+            lote_id: ID del lote
+            
+        Returns:
+            LoteResendType con las facturas reencoladas
+        """
+        session = info.context.get("session")
+        service = LoteService(session)
+        result = await service.reenviar_facturas_fallidas(lote_id)
+        
+        return LoteResendType(
+            lote_id=result.lote_id,
+            reenviadas=result.reenviadas,
+            estado=result.estado,
+            registros_procesados=result.registros_procesados
+        )
+
+    @strawberry.mutation
+    async def cancel_lote(self, info: Info, lote_id: int) -> LoteType:
+        """Cancelar un lote: no se envían más facturas a Factus"""
+        service = LoteService(info.context.get("session"))
+        return _lote_type(await service.cancelar_lote(lote_id))
+
+    @strawberry.mutation
+    async def pause_lote(self, info: Info, lote_id: int) -> LoteType:
+        """Pausar los envíos de un lote"""
+        service = LoteService(info.context.get("session"))
+        return _lote_type(await service.pausar_lote(lote_id))
+
+    @strawberry.mutation
+    async def resume_lote(self, info: Info, lote_id: int) -> LoteType:
+        """Reanudar los envíos de un lote pausado"""
+        service = LoteService(info.context.get("session"))
+        return _lote_type(await service.reanudar_lote(lote_id))
+
+
+# ============= SUBSCRIPTIONS =============
+
+@strawberry.type
+class Subscription:
+    """Subscriptions GraphQL - Eventos en vivo (WebSocket)"""
+
+    @strawberry.subscription
+    async def lote_progress(
+        self, info: Info, lote_id: int
+    ) -> AsyncGenerator[LoteProgressType, None]:
+        """
+        Cambios de estado y contadores de un lote, hasta que termina.
+
+        Los eventos los publican los workers en Redis y un solo PubSub por
+        proceso los reparte a todas las subscriptions (LoteProgressHub):
+        ninguna consulta a la BD por suscriptor después del estado inicial.
+        """
+        session = info.context.get("session")
+        inicial = await LoteService(session).obtener_progreso_lote(lote_id)
+        # Devolver la conexión al pool: la subscription puede durar horas
+        await session.close()
+
+        eventos = lote_progress_hub.seguir(
+            lote_id, inicial.model_dump(), settings.LOTE_PROGRESS_HEARTBEAT_SECONDS
         )
+        async with aclosing(eventos):
+            async for evento in eventos:
+                if evento is not None:
+                    yield LoteProgressType(**evento)
 
 
 # ============= SCHEMA =============
@@ -204,6 +284,7 @@ from app.graphql.extensions import CustomErrorHandling, PerformanceMonitoring
 schema = strawberry.Schema(
     query=Query,
     mutation=Mutation,
+    subscription=Subscription,
     extensions=[
         CustomErrorHandling,
         PerformanceMonitoring,
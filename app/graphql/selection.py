@@ -0,0 +1,66 @@
+"""GraphQL Selection - Campos pedidos por el cliente en la query"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from strawberry.types import Info
+from strawberry.types.nodes import SelectedField
+
+
+def _campos(selecciones: Iterable) -> Iterator[SelectedField]:
+    """Campos de un nivel, expandiendo fragments (inline y con nombre)"""
+    for seleccion in selecciones:
+        if isinstance(seleccion, SelectedField):
+            yield seleccion
+        else:
+            yield from _campos(seleccion.selections)
+
+
+def campos_pedidos(info: Info, *ruta: str) -> Set[str]:
+    """
+    Nombres (GraphQL, camelCase) de los campos pedidos bajo `ruta`.
+
+    La ruta parte del campo que se está resolviendo, ej. para
+    `lotes { edges { node { id facturas { id } } } }`:
+        campos_pedidos(info, "edges", "node") → {"id", "facturas"}
+
+    Permite que un resolver cargue solo lo que se va a devolver
+    (relaciones, columnas pesadas).
+    """
+    nivel = [hijo for campo in _campos(info.selected_fields) for hijo in _campos(campo.selections)]
+    for nombre in ruta:
+        nivel = [
+            hijo
+            for campo in nivel
+            if campo.name == nombre
+            for hijo in _campos(campo.selections)
+        ]
+    return {campo.name for campo in nivel}
+
+
+def _snake(nombre: str) -> str:
+    """referenceCode → reference_code (inverso del auto camelCase de strawberry)"""
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", nombre).lower()
+
+
+def columnas_pedidas(
+    info: Info,
+    modelo,
+    *ruta: str,
+    dependencias: Optional[Dict[str, Sequence[str]]] = None,
+) -> List[str]:
+    """
+    Columnas de `modelo` que necesitan los campos pedidos bajo `ruta`.
+
+    Un campo cuenta si se llama como una columna (en snake_case); los
+    campos calculados o relaciones declaran en `dependencias` las columnas
+    que leen (ej. {"lote": ["lote_id"]}). La PK la agrega la proyección.
+    """
+    columnas = set(modelo.__table__.columns.keys())
+    pedidas = set()
+    for campo in campos_pedidos(info, *ruta):
+        nombre = _snake(campo)
+        if nombre in columnas:
+            pedidas.add(nombre)
+        pedidas.update((dependencias or {}).get(nombre, ()))
+    return sorted(pedidas)
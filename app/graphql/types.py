@@ -1,9 +1,13 @@
 """GraphQL Types - Definición de tipos de salida"""
 
 import strawberry
-from typing import List, Optional
+from typing import Awaitable, Callable, List, Optional
 from datetime import datetime
 from enum import Enum
+from strawberry.types import Info
+
+from app.graphql.inputs import PaginationInput
+from app.repositories.pagination import LIMITE_MAXIMO
 
 # Enums para estados
 @strawberry.enum
@@ -13,6 +17,7 @@ class EstadoFactura(Enum):
     ENVIADA = "ENVIADA"
     RECHAZADA = "RECHAZADA"
     ABONADA = "ABONADA"
+    CANCELADA = "CANCELADA"
 
 
 @strawberry.enum
@@ -22,6 +27,9 @@ class EstadoLote(Enum):
     PROCESANDO = "PROCESANDO"
     COMPLETADO = "COMPLETADO"
     ERROR = "ERROR"
+    PAUSADO = "PAUSADO"
+    CANCELADO = "CANCELADO"
+    EXPIRADO = "EXPIRADO"
 
 
 # ============= ITEM TYPE =============
@@ -62,18 +70,18 @@ class CustomerType:
 class InvoiceType:
     """Tipo para factura"""
     id: int
-    numbering_range_id: int
+    numbering_range_id: Optional[int]
     reference_code: str
     observation: Optional[str]
     payment_form: str
     payment_method_code: str
     cliente_email: str
-    cliente_nombre: str
+    cliente_nombre: Optional[str]
     total: float
     estado: str  # Será validado en resolver
     motivo_rechazo: Optional[str]
     api_response: Optional[str]
-    created_at: datetime
+    created_at: Optional[datetime]
     updated_at: Optional[datetime]
     lote_id: Optional[int]
     usuario_id: Optional[int]
@@ -82,6 +90,17 @@ class InvoiceType:
     items: Optional[List[ItemType]] = None
     customer: Optional[CustomerType] = None
 
+    @strawberry.field
+    async def lote(self, info: Info) -> Optional["LoteType"]:
+        """Lote de la factura (DataLoader: un solo SELECT para toda la página)"""
+        if self.lote_id is None:
+            return None
+        lote = await info.context["loaders"].lote.load(self.lote_id)
+        if lote is None:
+            return None
+        from app.graphql.queries import _lote_type
+        return _lote_type(lote)
+
 
 # ============= INVOICE LIST TYPE =============
 
@@ -104,6 +123,41 @@ class InvoiceListType:
         return (self.skip // self.limit) + 1
 
 
+# ============= CONNECTIONS (paginación por cursores) =============
+
+@strawberry.type
+class PageInfo:
+    """Navegación de una connection (Relay)"""
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: Optional[str]
+    end_cursor: Optional[str]
+
+
+@strawberry.type
+class InvoiceEdge:
+    """Factura con su cursor"""
+    cursor: str
+    node: InvoiceType
+
+
+@strawberry.type
+class InvoiceConnection:
+    """Página de facturas por cursores (first/after, last/before)"""
+    edges: List[InvoiceEdge]
+    page_info: PageInfo
+    # Solo se cuenta si la query pide totalCount
+    contar: strawberry.Private[Optional[Callable[[], Awaitable[int]]]] = None
+
+    @strawberry.field
+    async def total_count(self, info: Info) -> Optional[int]:
+        """Total del listado (exacto, cacheado o estimado según el listado)"""
+        if self.contar is None:
+            return None
+        # Corre a la par de los loaders de `edges`: misma sesión, en turno
+        return await info.context["loaders"].ejecutar(self.contar)
+
+
 # ============= LOTE TYPE =============
 
 @strawberry.type
@@ -116,9 +170,79 @@ class LoteType:
     registros_procesados: Optional[int]
     estado: str
     usuario_id: Optional[int]
-    
-    # Facturas del lote (lazy loading)
-    facturas: Optional[List[InvoiceType]] = None
+    fecha_limite: Optional[datetime] = None
+
+    @strawberry.field
+    async def facturas(
+        self, info: Info, pagination: Optional[PaginationInput] = None
+    ) -> List[InvoiceType]:
+        """
+        Facturas del lote (por id), paginadas por lote.
+
+        DataLoader: las facturas de todos los lotes de la página salen de
+        una sola consulta, leyendo solo la ventana pedida de cada lote y
+        solo las columnas que pide la query.
+        """
+        from app.graphql.queries import _invoice_type
+        facturas = await _facturas_de_lote(info, self.id, pagination)
+        return [_invoice_type(factura) for factura in facturas]
+
+    @strawberry.field
+    async def usuario(self, info: Info) -> Optional["UserType"]:
+        """Usuario que subió el lote (DataLoader)"""
+        if self.usuario_id is None:
+            return None
+        usuario = await info.context["loaders"].usuario.load(self.usuario_id)
+        if usuario is None:
+            return None
+        return UserType(id=usuario.id, email=usuario.email, is_active=usuario.is_active)
+
+
+@strawberry.type
+class LoteResendType:
+    """Resultado de reenviar las facturas fallidas de un lote"""
+    lote_id: int
+    reenviadas: int
+    estado: str
+    registros_procesados: int
+
+
+@strawberry.type
+class LoteProgressType:
+    """Avance en vivo de un lote (subscription loteProgress)"""
+    lote_id: int
+    estado: Optional[str]
+    total: int
+    ingeridas: int
+    procesados: int
+    enviadas: int
+    rechazadas: int
+    errores: int
+    facturas_por_segundo: float
+
+
+@strawberry.type
+class LoteEdge:
+    """Lote con su cursor"""
+    cursor: str
+    node: LoteType
+
+
+@strawberry.type
+class LoteConnection:
+    """Página de lotes por cursores (first/after, last/before)"""
+    edges: List[LoteEdge]
+    page_info: PageInfo
+    # Solo se cuenta si la query pide totalCount
+    contar: strawberry.Private[Optional[Callable[[], Awaitable[int]]]] = None
+
+    @strawberry.field
+    async def total_count(self, info: Info) -> Optional[int]:
+        """Total del listado (exacto, cacheado o estimado según el listado)"""
+        if self.contar is None:
+            return None
+        # Corre a la par de los loaders de `edges`: misma sesión, en turno
+        return await info.context["loaders"].ejecutar(self.contar)
 
 
 # ============= SIMPLE INVOICE TYPE (para resúmenes) =============
@@ -144,7 +268,40 @@ class LoteDetailType:
     total_registros: int
     registros_procesados: int
     estado: str
-    facturas: Optional[List[SimpleInvoiceType]] = None
+
+    @strawberry.field
+    async def facturas(
+        self, info: Info, pagination: Optional[PaginationInput] = None
+    ) -> List[SimpleInvoiceType]:
+        """
+        Facturas del lote (por id), paginadas: solo la ventana pedida y
+        las columnas que pide la query (DataLoader, como LoteType.facturas).
+        """
+        from app.graphql.queries import _simple_invoice_type
+        facturas = await _facturas_de_lote(info, self.id, pagination)
+        return [_simple_invoice_type(factura) for factura in facturas]
+
+
+async def _facturas_de_lote(
+    info: Info, lote_id: int, pagination: Optional[PaginationInput]
+) -> list:
+    """
+    Ventana de facturas de un lote vía el DataLoader de la request.
+
+    Raises:
+        ValidationException: si skip/limit están fuera de rango
+    """
+    skip = pagination.skip if pagination else 0
+    limit = pagination.limit if pagination else 100
+    if skip < 0 or not 1 <= limit <= LIMITE_MAXIMO:
+        from app.api.errors.http_errors import ValidationException
+        raise ValidationException([
+            f"skip must be >= 0 and limit between 1 and {LIMITE_MAXIMO}"
+        ])
+    from app.graphql.queries import _columnas_factura
+    return await info.context["loaders"].facturas_de_lote.load(
+        (lote_id, skip, limit, tuple(_columnas_factura(info)))
+    )
 
 
 # ============= LOTE LIST TYPE =============
@@ -174,6 +331,9 @@ class LoteStatisticsType:
     total_monto: float
     promedio_monto: float
     tasa_exito: float
+    error_api: int = 0
+    canceladas: int = 0
+    monto_exitoso: float = 0.0
 
 
 # ============= USER TYPE =============
@@ -183,9 +343,9 @@ class UserType:
     """Tipo para usuario"""
     id: int
     email: str
-    full_name: str
     is_active: bool
-    created_at: datetime
+    full_name: Optional[str] = None
+    created_at: Optional[datetime] = None
 
 
 # ============= AUTH RESPONSE TYPE =============
@@ -1,6 +1,7 @@
-from fastapi import FastAPI, Depends, Request
+from fastapi import FastAPI, Depends, Request, WebSocket
 from strawberry.fastapi import GraphQLRouter
 from app.graphql.schema import schema
+from app.graphql.loaders import Loaders
 from app.api.v1.router import api_router
 from app.core.config import settings
 from app.core.database import init_db, get_session
@@ -9,6 +10,9 @@ from typing import AsyncGenerator, Optional, Dict, Any
 from app.api.errors.handlers import setup_exception_handlers
 from app.core.deps import get_current_user
 from app.models import User
+from app.services.api_client import factus_client
+from app.services.progress import lote_progress
+from app.core.metrics import metrics
 
 # 1. Inicializar App
 app = FastAPI(
@@ -33,23 +37,34 @@ async def on_startup():
     print("📚 REST API habilitado en /docs")
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Liberar recursos compartidos"""
+    # Cierra el pool de conexiones HTTP hacia Factus
+    await factus_client.aclose()
+    await lote_progress.aclose()
+
+
 # --- CONTEXT GETTER PARA GRAPHQL CON INYECCIÓN DE DEPENDENCIAS ---
 async def get_graphql_context(
-    request: Request,
+    request: Request = None,
+    websocket: WebSocket = None,
     db: AsyncSession = Depends(get_session),
 ) -> Dict[str, Any]:
     """
     Contexto para GraphQL con:
     - Sesión de base de datos
     - Usuario actual (si está autenticado)
-    - Request object
+    - Request object (None en subscriptions por WebSocket)
+    - DataLoaders de la request (batching de relaciones, ver app.graphql.loaders)
     
     GraphQL pasará esto a info.context en cada resolver.
     """
     user: Optional[User] = None
+    conexion = request if request is not None else websocket
     
     # Intentar obtener usuario del header Authorization
-    auth_header = request.headers.get("Authorization")
+    auth_header = conexion.headers.get("Authorization")
     if auth_header:
         try:
             # Extraer token y validar
@@ -58,11 +73,17 @@ async def get_graphql_context(
         except Exception:
             # Si falla validación, continuar sin usuario
             pass
+
+    if websocket is not None:
+        # La sesión vive lo que dure el WebSocket: no retener la conexión
+        # del pool entre operaciones
+        await db.close()
     
     return {
         "session": db,
         "user": user,
-        "request": request
+        "request": request,
+        "loaders": Loaders(db)
     }
 
 
@@ -90,6 +111,15 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """
+    Métricas en memoria de este proceso (concurrencia, envíos a Factus, etc.)
+    Protegido: expone el estado interno del limitador y del circuito.
+    """
+    return metrics.snapshot()
+
+
 @app.get("/")
 def home():
     return {
@@ -101,6 +131,7 @@ def home():
             "login": "POST /api/v1/auth/login",
             "procesar_documento": "POST /api/v1/procesar-documento",
             "emitir_masivas": "POST /api/v1/emitir-facturas-masivas (Protegido)",
-            "emitir_individual": "POST /api/v1/facturas (Protegido)"
+            "emitir_individual": "POST /api/v1/facturas (Protegido)",
+            "metricas": "GET /metrics (Protegido)"
         }
     }
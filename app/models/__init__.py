@@ -1,5 +1,7 @@
 from .user import User
 from .lote import Lote
 from .factura import Factura
+from .outbox import FacturaOutbox
+from .dead_letter import FacturaDeadLetter
 
-__all__ = ["User", "Lote", "Factura"]
+__all__ = ["User", "Lote", "Factura", "FacturaOutbox", "FacturaDeadLetter"]
@@ -0,0 +1,49 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index
+from sqlalchemy.dialects.postgresql import JSONB
+
+# Clasificación del fallo
+FALLO_TRANSITORIO = "TRANSITORIO"  # Sin respuesta, 429, 5xx, circuito abierto: se reenvía solo
+FALLO_PERMANENTE = "PERMANENTE"    # 4xx de validación: requiere corregir los datos
+
+# Estados de una entrada del dead-letter
+DLQ_PENDIENTE = "PENDIENTE"        # Esperando re-drive (o revisión manual si es permanente)
+DLQ_REENCOLADA = "REENCOLADA"      # Devuelta al outbox; esperando resultado
+DLQ_RESUELTA = "RESUELTA"          # El reenvío fue aceptado por Factus
+
+
+class FacturaDeadLetter(SQLModel, table=True):
+    """
+    Envío fallido a Factus (factura en ERROR_API) con lo necesario para
+    reenviarlo sin volver a subir el archivo: payload y clasificación.
+
+    Una entrada por factura: cada nuevo fallo actualiza la misma fila.
+    """
+    __tablename__ = "factura_dead_letter"
+    # Selección del re-driver: pendientes transitorios cuyo backoff ya venció
+    __table_args__ = (
+        Index(
+            "ix_factura_dead_letter_redrive",
+            "estado", "clasificacion", "proximo_intento",
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    factura_id: int = Field(foreign_key="factura.id", unique=True)
+    lote_id: Optional[int] = Field(default=None, foreign_key="lote.id", index=True)
+
+    payload: Dict[str, Any] = Field(sa_column=Column(JSONB, nullable=False))
+
+    clasificacion: str
+    status: int                        # Último status HTTP (0 = sin respuesta)
+    error: Optional[str] = None
+    intentos: int = 0                  # Intentos HTTP del último envío
+
+    estado: str = DLQ_PENDIENTE
+    reenvios: int = 0
+    proximo_intento: datetime = Field(default_factory=datetime.utcnow)
+
+    fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
+    fecha_actualizacion: datetime = Field(default_factory=datetime.utcnow)
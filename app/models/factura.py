@@ -1,12 +1,26 @@
 from typing import Optional, Dict, Any, TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column
+from sqlalchemy import Column, Index
 from sqlalchemy.dialects.postgresql import JSONB
 
 if TYPE_CHECKING:
     from .lote import Lote
 
+# Estados que ya no requieren envío a Factus (un lote reanudado los omite)
+ESTADOS_TERMINALES = ("ENVIADA", "RECHAZADA", "ERROR_API")
+
+
 class Factura(SQLModel, table=True):
+    # Índice compuesto para consultas por lote + estado (reanudación, reintentos),
+    # para la paginación keyset (filtro de igualdad + id) y para las
+    # facturas de cada lote por id (DataLoader de GraphQL)
+    __table_args__ = (
+        Index("ix_factura_lote_id_estado", "lote_id", "estado"),
+        Index("ix_factura_lote_id_id", "lote_id", "id"),
+        Index("ix_factura_cliente_email_id", "cliente_email", "id"),
+        Index("ix_factura_estado_id", "estado", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     
     # Índices para búsquedas rápidas (B-Tree en Postgres)
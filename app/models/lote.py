@@ -1,16 +1,64 @@
 from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime
 
 if TYPE_CHECKING:
     from .factura import Factura
 
+# Estados del ciclo de vida de un lote
+ESTADOS_LOTE = (
+    "PENDIENTE", "PROCESANDO", "COMPLETADO", "ERROR", "PAUSADO", "CANCELADO", "EXPIRADO",
+)
+# Lotes cuyos envíos no deben salir a Factus (los dispatchers los saltan)
+ESTADOS_DETENIDOS = ("PAUSADO", "CANCELADO", "EXPIRADO")
+# Lotes que ya no cambian por sí solos (el progreso deja de publicarse)
+ESTADOS_FINALES = ("COMPLETADO", "ERROR", "CANCELADO", "EXPIRADO")
+# Estado de la factura → contador del lote que la cuenta
+CONTADOR_POR_ESTADO = {
+    "PENDIENTE": "pendientes",
+    "ENVIADA": "enviadas",
+    "RECHAZADA": "rechazadas",
+    "ERROR_API": "error_api",
+    "CANCELADA": "canceladas",
+}
+
 class Lote(SQLModel, table=True):
+    # Paginación keyset: listado por estado e historial por fecha
+    __table_args__ = (
+        Index("ix_lote_estado_id", "estado", "id"),
+        Index("ix_lote_fecha_carga_id", "fecha_carga", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     nombre_archivo: str = Field(index=True)
     fecha_carga: datetime = Field(default_factory=datetime.utcnow)
     total_registros: int = 0
     total_errores: int = 0
     estado: str = "PROCESADO"
+    # Usuario que subió el lote (reparto justo de la cuota de Factus)
+    usuario_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
+
+    # Checkpoint del procesamiento por chunks (permite reanudar un lote
+    # si el worker muere o la tarea Celery se re-entrega)
+    registros_procesados: int = 0
+    chunks_completados: int = 0
+    fecha_checkpoint: Optional[datetime] = None
+    # Todas las facturas del archivo están en BD (con su envío en el outbox);
+    # a partir de aquí el lote se cierra cuando el outbox queda vacío
+    ingesta_completa: bool = False
+    # Plazo del lote: al vencer se corta lo que falte (estado EXPIRADO)
+    fecha_limite: Optional[datetime] = None
+
+    # Facturas del lote por estado y montos, ajustados en la misma
+    # transacción que cambia cada factura (LoteRepository.ajustar_contadores):
+    # las estadísticas del lote son una lectura por PK, sin agregar facturas
+    pendientes: int = 0
+    enviadas: int = 0
+    rechazadas: int = 0
+    error_api: int = 0
+    canceladas: int = 0
+    monto_total: float = 0.0
+    monto_exitoso: float = 0.0
 
     facturas: List["Factura"] = Relationship(back_populates="lote")
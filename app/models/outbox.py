@@ -0,0 +1,43 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index
+from sqlalchemy.dialects.postgresql import JSONB
+
+# Estados de una fila del outbox
+OUTBOX_PENDIENTE = "PENDIENTE"  # Esperando dispatcher
+OUTBOX_EN_CURSO = "EN_CURSO"    # Reclamada; el lease vence en lease_hasta
+OUTBOX_ENVIADO = "ENVIADO"      # Resultado de Factus guardado en la factura
+OUTBOX_CANCELADO = "CANCELADO"  # Lote cancelado antes de enviarla
+
+
+class FacturaOutbox(SQLModel, table=True):
+    """
+    Envío pendiente a Factus (patrón transactional outbox).
+
+    Se inserta en la misma transacción que la Factura PENDIENTE: si la
+    factura existe, su envío también. Los dispatchers reclaman filas con
+    FOR UPDATE SKIP LOCKED y un lease; solo quien aún tiene el lease puede
+    registrar el resultado.
+    """
+    __tablename__ = "factura_outbox"
+    # Reclamo de filas por lote + estado y conteo de pendientes al cerrar un lote
+    __table_args__ = (
+        Index("ix_factura_outbox_lote_id_estado", "lote_id", "estado"),
+        Index("ix_factura_outbox_estado_id", "estado", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    factura_id: int = Field(foreign_key="factura.id", unique=True)
+    lote_id: Optional[int] = Field(default=None, foreign_key="lote.id")
+
+    # Payload listo para POST /v1/bills/validate
+    payload: Dict[str, Any] = Field(sa_column=Column(JSONB, nullable=False))
+
+    estado: str = OUTBOX_PENDIENTE
+    intentos: int = 0
+    lease_token: Optional[str] = None
+    lease_hasta: Optional[datetime] = None
+
+    fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
+    fecha_envio: Optional[datetime] = None
@@ -4,10 +4,14 @@ from app.repositories.base import BaseRepository
 from app.repositories.factura_repository import FacturaRepository
 from app.repositories.user_repository import UserRepository
 from app.repositories.lote_repository import LoteRepository
+from app.repositories.outbox_repository import OutboxRepository
+from app.repositories.dead_letter_repository import DeadLetterRepository
 
 __all__ = [
     "BaseRepository",
     "FacturaRepository",
     "UserRepository",
     "LoteRepository",
+    "OutboxRepository",
+    "DeadLetterRepository",
 ]
@@ -1,9 +1,23 @@
 """Base Repository - CRUD genérico"""
 
-from typing import Generic, TypeVar, Type, Optional, List
+from typing import Dict, Generic, TypeVar, Type, Optional, List, Sequence, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
 from sqlmodel import select, SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.repositories.conteo import (
+    CONTEO_CACHE,
+    CONTEO_ESTIMADO,
+    CONTEO_EXACTO,
+    MODOS_CONTEO,
+    cache_conteos,
+    estimar_filas,
+)
+from app.repositories.pagination import Pagina, paginar
+
 
 ModelType = TypeVar("ModelType", bound=SQLModel)
 
@@ -18,9 +32,36 @@ class BaseRepository(Generic[ModelType]):
         self.model = model
         self.session = session
 
-    async def get(self, id: int) -> Optional[ModelType]:
-        """Obtener por ID"""
-        return await self.session.get(self.model, id)
+    def _proyectar(self, query, columnas: Optional[Sequence[str]]):
+        """
+        Cargar solo `columnas` (la PK siempre); None = todas.
+
+        Las columnas no pedidas (ej. un JSONB grande) no se leen ni viajan
+        desde la BD; acceder a ellas en el objeto no está permitido.
+        """
+        if columnas is None:
+            return query
+        return query.options(
+            load_only(*(getattr(self.model, c) for c in (columnas or ("id",))))
+        )
+
+    async def get(
+        self, id: int, columnas: Optional[Sequence[str]] = None
+    ) -> Optional[ModelType]:
+        """Obtener por ID (opcionalmente solo algunas columnas)"""
+        if columnas is None:
+            return await self.session.get(self.model, id)
+        query = self._proyectar(select(self.model).where(self.model.id == id), columnas)
+        result = await self.session.execute(query)
+        return result.scalars().first()
+
+    async def get_by_ids(self, ids: Sequence[int]) -> Dict[int, ModelType]:
+        """Varios registros por ID en una consulta (id → registro; faltan los inexistentes)"""
+        if not ids:
+            return {}
+        query = select(self.model).where(self.model.id.in_(list(ids)))
+        result = await self.session.execute(query)
+        return {obj.id: obj for obj in result.scalars().all()}
 
     async def get_all(
         self, skip: int = 0, limit: int = 100, **filters
@@ -36,6 +77,55 @@ class BaseRepository(Generic[ModelType]):
         result = await self.session.execute(query)
         return result.scalars().all()
 
+    async def get_all_con_total(
+        self, skip: int = 0, limit: int = 100, **filters
+    ) -> Tuple[List[ModelType], int]:
+        """
+        Página (id DESC) y total del listado en una sola consulta.
+
+        El total sale de COUNT(*) OVER() en cada fila: un viaje a la BD en
+        lugar de la página más un COUNT(*) aparte. Conviene con filtros
+        selectivos (un cliente, un lote); para tablas enteras, count() con
+        CONTEO_ESTIMADO.
+        """
+        query = select(self.model, func.count().over().label("total"))
+        for key, value in filters.items():
+            if hasattr(self.model, key):
+                query = query.where(getattr(self.model, key) == value)
+        query = query.order_by(self.model.id.desc()).offset(skip).limit(limit)
+
+        filas = (await self.session.execute(query)).all()
+        if filas:
+            return [fila[0] for fila in filas], filas[0].total
+        # Página vacía: la ventana no dice cuántas filas quedaron antes del offset
+        return [], (await self.count(**filters) if skip else 0)
+
+    async def get_page(
+        self,
+        limit: int = 100,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        columnas: Optional[Sequence[str]] = None,
+        **filters,
+    ) -> Pagina[ModelType]:
+        """
+        Obtener una página por keyset sobre el id (más recientes primero).
+
+        A diferencia de get_all (OFFSET), el costo no crece con la
+        profundidad de la página. `columnas`: proyección (ver _proyectar).
+
+        Raises:
+            CursorInvalido: si after/before no son cursores válidos
+        """
+        query = self._proyectar(select(self.model), columnas)
+        for key, value in filters.items():
+            if hasattr(self.model, key):
+                query = query.where(getattr(self.model, key) == value)
+
+        return await paginar(
+            self.session, query, (self.model.id,), limit, after, before
+        )
+
     async def create(self, obj: ModelType) -> ModelType:
         """Crear nuevo registro"""
         self.session.add(obj)
@@ -59,18 +149,45 @@ class BaseRepository(Generic[ModelType]):
             return True
         return False
 
-    async def count(self, **filters) -> int:
-        """Contar registros con filtros"""
-        from sqlalchemy import func
-
-        query = select(func.count()).select_from(self.model)
-
-        for key, value in filters.items():
-            if hasattr(self.model, key):
-                query = query.where(getattr(self.model, key) == value)
-
+    async def count(self, modo: str = CONTEO_EXACTO, **filters) -> int:
+        """
+        Contar registros con filtros.
+
+        Args:
+            modo: CONTEO_EXACTO (COUNT(*) en cada llamada), CONTEO_CACHE
+                (COUNT(*) cacheado con TTL e invalidado al escribir) o
+                CONTEO_ESTIMADO (estimación del planner; si es menor que
+                COUNT_ESTIMATE_MIN_ROWS se cuenta exacto, es barato)
+        """
+        if modo not in MODOS_CONTEO:
+            raise ValueError(f"Unknown count mode: {modo}")
+
+        filters = {k: v for k, v in filters.items() if hasattr(self.model, k)}
+        condiciones = [getattr(self.model, k) == v for k, v in filters.items()]
+        tabla = self.model.__tablename__
+
+        if modo == CONTEO_ESTIMADO:
+            filas = select(self.model.id).where(*condiciones)
+            estimado = await estimar_filas(self.session, filas, tabla, bool(filters))
+            if estimado >= settings.COUNT_ESTIMATE_MIN_ROWS:
+                metrics.inc("repository_count_total", modo=modo, tabla=tabla)
+                return estimado
+
+        if modo == CONTEO_CACHE:
+            clave = cache_conteos.clave(tabla, filters)
+            total = cache_conteos.get(clave)
+            if total is not None:
+                metrics.inc("repository_count_total", modo=modo, tabla=tabla)
+                return total
+            generacion = cache_conteos.generacion(tabla)
+
+        query = select(func.count()).select_from(self.model).where(*condiciones)
         result = await self.session.execute(query)
-        return result.scalar()
+        total = result.scalar()
+        if modo == CONTEO_CACHE:
+            cache_conteos.set(clave, total, generacion)
+        metrics.inc("repository_count_total", modo=CONTEO_EXACTO, tabla=tabla)
+        return total
 
     async def exists(self, id: int) -> bool:
         """Verificar si existe"""
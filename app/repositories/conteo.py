@@ -0,0 +1,128 @@
+"""Conteo - Estrategias para el total de los listados paginados"""
+
+import json
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+
+# Modos de BaseRepository.count (cada endpoint elige el suyo)
+CONTEO_EXACTO = "exacto"      # COUNT(*) en cada llamada
+CONTEO_CACHE = "cache"        # COUNT(*) cacheado con TTL, invalidado al escribir
+CONTEO_ESTIMADO = "estimado"  # Estimación del planner de Postgres
+MODOS_CONTEO = (CONTEO_EXACTO, CONTEO_CACHE, CONTEO_ESTIMADO)
+
+ClaveConteo = Tuple[str, Tuple[Tuple[str, Hashable], ...]]
+
+
+class CacheConteos:
+    """
+    Conteos exactos cacheados en el proceso.
+
+    Cada tabla lleva una generación que sube cuando una transacción de
+    este proceso que la escribió hace commit; un conteo guardado con otra
+    generación se descarta. La generación se toma *antes* de contar: si
+    un commit ocurre mientras el COUNT corre, el valor ya nace inválido.
+    Las escrituras de otros procesos (workers Celery) solo las acota el TTL.
+    """
+
+    def __init__(self, ttl: float, maximo: int = 10_000):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._valores: Dict[ClaveConteo, Tuple[int, int, float]] = {}
+        self._generaciones: Dict[str, int] = {}
+
+    @staticmethod
+    def clave(tabla: str, filtros: Dict[str, Any]) -> ClaveConteo:
+        return tabla, tuple(sorted(filtros.items()))
+
+    def generacion(self, tabla: str) -> int:
+        return self._generaciones.get(tabla, 0)
+
+    def get(self, clave: ClaveConteo) -> Optional[int]:
+        guardado = self._valores.get(clave)
+        if guardado is None:
+            return None
+        generacion, total, expira = guardado
+        if generacion != self.generacion(clave[0]) or expira < time.monotonic():
+            del self._valores[clave]
+            return None
+        return total
+
+    def set(self, clave: ClaveConteo, total: int, generacion: int) -> None:
+        if len(self._valores) >= self.maximo:
+            self._valores.clear()
+        self._valores[clave] = (generacion, total, time.monotonic() + self.ttl)
+
+    def invalidar(self, tabla: str) -> None:
+        self._generaciones[tabla] = self.generacion(tabla) + 1
+
+
+cache_conteos = CacheConteos(settings.COUNT_CACHE_TTL_SECONDS)
+
+
+def _tablas_escritas(session: Session) -> set:
+    return session.info.setdefault("conteo_tablas_escritas", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_flush(session, flush_context):
+    """Altas, cambios y bajas del ORM (add/delete + flush)"""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tabla = getattr(obj, "__tablename__", None)
+        if tabla:
+            _tablas_escritas(session).add(tabla)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _registrar_dml(orm_execute_state):
+    """INSERT/UPDATE/DELETE ejecutados con session.execute()"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        tabla = getattr(orm_execute_state.statement, "table", None)
+        if tabla is not None:
+            _tablas_escritas(orm_execute_state.session).add(tabla.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_conteos(session):
+    for tabla in session.info.pop("conteo_tablas_escritas", ()):
+        cache_conteos.invalidar(tabla)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_escrituras(session):
+    session.info.pop("conteo_tablas_escritas", None)
+
+
+async def estimar_filas(session: AsyncSession, query, tabla: str, filtrado: bool) -> int:
+    """
+    Filas estimadas por el planner de Postgres (sin recorrer la tabla).
+
+    Sin filtros se lee pg_class.reltuples (actualizado por ANALYZE y
+    autovacuum); con filtros, las "Plan Rows" de EXPLAIN sobre `query`,
+    que salen de las estadísticas de las columnas filtradas.
+
+    Returns:
+        Estimación, o -1 si la tabla nunca se analizó
+    """
+    if not filtrado:
+        result = await session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(quote_ident(:tabla) AS regclass)"),
+            {"tabla": tabla},
+        )
+        return int(result.scalar() or -1)
+
+    # Directo al driver: text() tomaría como parámetro cualquier ":nombre"
+    # dentro de un valor literal (ej. un filtro "a:b")
+    conexion = await session.connection()
+    sql = query.compile(dialect=conexion.dialect, compile_kwargs={"literal_binds": True})
+    result = await conexion.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
@@ -0,0 +1,140 @@
+"""Dead Letter Repository - Envíos fallidos a Factus y su re-drive"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import FacturaDeadLetter, Lote
+from app.models.dead_letter import (
+    DLQ_PENDIENTE,
+    DLQ_REENCOLADA,
+    DLQ_RESUELTA,
+    FALLO_TRANSITORIO,
+)
+from app.models.lote import ESTADOS_DETENIDOS
+from app.repositories.base import BaseRepository
+
+
+class DeadLetterRepository(BaseRepository[FacturaDeadLetter]):
+    """
+    Repositorio del dead-letter de facturas.
+
+    Los métodos de escritura no hacen commit: se usan dentro de la
+    transacción que cierra o reencola las filas del outbox.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(FacturaDeadLetter, session)
+
+    async def registrar_fallos(self, fallos: Sequence[Dict[str, Any]]) -> None:
+        """
+        Crear o actualizar las entradas de facturas fallidas (sin commit).
+
+        Un solo INSERT ... ON CONFLICT para todo el batch. Un nuevo fallo de
+        una entrada reencolada la devuelve a PENDIENTE y conserva reenvios y
+        proximo_intento (fijado al reencolar).
+        """
+        if not fallos:
+            return
+        ahora = datetime.utcnow()
+        stmt = insert(FacturaDeadLetter).values([
+            {
+                **valores,
+                "estado": DLQ_PENDIENTE,
+                "proximo_intento": ahora,
+                "fecha_creacion": ahora,
+                "fecha_actualizacion": ahora,
+            }
+            for valores in fallos
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FacturaDeadLetter.factura_id],
+            set_={
+                "clasificacion": stmt.excluded.clasificacion,
+                "status": stmt.excluded.status,
+                "error": stmt.excluded.error,
+                "intentos": stmt.excluded.intentos,
+                "payload": stmt.excluded.payload,
+                "estado": DLQ_PENDIENTE,
+                "fecha_actualizacion": ahora,
+            },
+        )
+        await self.session.execute(stmt)
+
+    async def marcar_resueltas(self, factura_ids: Iterable[int]) -> None:
+        """Cerrar las entradas reencoladas cuyo reenvío tuvo éxito (sin commit)"""
+        ids = list(factura_ids)
+        if not ids:
+            return
+        await self.session.execute(
+            update(FacturaDeadLetter)
+            .where(
+                FacturaDeadLetter.factura_id.in_(ids),
+                FacturaDeadLetter.estado == DLQ_REENCOLADA,
+            )
+            .values(estado=DLQ_RESUELTA, fecha_actualizacion=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def reclamar_para_reenvio(
+        self, limite: int, max_reenvios: int
+    ) -> List[FacturaDeadLetter]:
+        """
+        Entradas transitorias listas para reenviar (backoff vencido).
+
+        FOR UPDATE SKIP LOCKED: dos re-drivers simultáneos no toman la misma.
+        Se omiten las de lotes pausados o cancelados.
+        """
+        query = (
+            select(FacturaDeadLetter)
+            .outerjoin(Lote, Lote.id == FacturaDeadLetter.lote_id)
+            .where(
+                or_(Lote.id.is_(None), Lote.estado.not_in(ESTADOS_DETENIDOS)),
+                FacturaDeadLetter.estado == DLQ_PENDIENTE,
+                FacturaDeadLetter.clasificacion == FALLO_TRANSITORIO,
+                FacturaDeadLetter.proximo_intento <= datetime.utcnow(),
+                FacturaDeadLetter.reenvios < max_reenvios,
+            )
+            .order_by(FacturaDeadLetter.proximo_intento)
+            .limit(limite)
+            .with_for_update(of=FacturaDeadLetter, skip_locked=True)
+        )
+        result = await self.session.execute(query)
+        return result.scalars().all()
+
+    async def programar_reenvio(
+        self, entradas: List[FacturaDeadLetter], backoff_segundos: float
+    ) -> None:
+        """
+        Marcar entradas del re-driver como REENCOLADA (sin commit).
+
+        Si vuelven a fallar no se reintentan antes de backoff * 2^reenvios.
+        """
+        ahora = datetime.utcnow()
+        for entrada in entradas:
+            entrada.estado = DLQ_REENCOLADA
+            entrada.proximo_intento = ahora + timedelta(
+                seconds=backoff_segundos * (2 ** entrada.reenvios)
+            )
+            entrada.reenvios += 1
+            entrada.fecha_actualizacion = ahora
+            self.session.add(entrada)
+
+    async def marcar_reencoladas(self, factura_ids: Iterable[int]) -> None:
+        """Reenvío manual: entradas pendientes → REENCOLADA, sin consumir re-drives (sin commit)"""
+        ids = list(factura_ids)
+        if not ids:
+            return
+        await self.session.execute(
+            update(FacturaDeadLetter)
+            .where(
+                FacturaDeadLetter.factura_id.in_(ids),
+                FacturaDeadLetter.estado == DLQ_PENDIENTE,
+            )
+            .values(estado=DLQ_REENCOLADA, fecha_actualizacion=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
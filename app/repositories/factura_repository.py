@@ -1,11 +1,14 @@
 """Factura Repository"""
 
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Set
+from sqlalchemy import Integer, column, true, values
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models import Factura
 from app.repositories.base import BaseRepository
+from app.repositories.lote_repository import CambiosContadores, LoteRepository
+from app.repositories.pagination import Pagina, paginar
 
 
 class FacturaRepository(BaseRepository[Factura]):
@@ -32,6 +35,70 @@ class FacturaRepository(BaseRepository[Factura]):
         result = await self.session.execute(query)
         return result.scalars().all()
 
+    async def get_by_lotes(
+        self,
+        lote_ids: Sequence[int],
+        limit: int = 100,
+        skip: int = 0,
+        columnas: Optional[Sequence[str]] = None,
+    ) -> Dict[int, List[Factura]]:
+        """
+        Facturas de varios lotes en una consulta, paginadas por lote.
+
+        LATERAL por lote: cada uno elige los ids de su ventana (skip, limit)
+        solo con ix_factura_lote_id_id, aunque tenga cientos de miles de
+        facturas; después se leen únicamente esas filas, y de ellas solo
+        `columnas` (ver BaseRepository._proyectar; lote_id siempre).
+
+        Returns:
+            {lote_id: facturas por id}; los lotes sin facturas no aparecen
+        """
+        if not lote_ids:
+            return {}
+        lotes = values(column("lote_id", Integer), name="lotes").data(
+            [(lote_id,) for lote_id in lote_ids]
+        )
+        ventana = (
+            select(Factura.id)
+            .where(Factura.lote_id == lotes.c.lote_id)
+            .order_by(Factura.id)
+            .offset(skip)
+            .limit(limit)
+            .lateral()
+        )
+        if columnas is not None:
+            columnas = {*columnas, "lote_id"}
+        query = self._proyectar(
+            select(Factura)
+            .select_from(lotes)
+            .join(ventana, true())
+            .join(Factura, Factura.id == ventana.c.id)
+            .order_by(Factura.id),
+            columnas,
+        )
+        result = await self.session.execute(query)
+
+        por_lote: Dict[int, List[Factura]] = {}
+        for f in result.scalars().all():
+            por_lote.setdefault(f.lote_id, []).append(f)
+        return por_lote
+
+    async def get_reference_codes_by_lote(
+        self, lote_id: int, estados: Sequence[str]
+    ) -> Set[str]:
+        """
+        Obtener los códigos de referencia de un lote en los estados dados.
+
+        Solo lee la columna reference_code (usa ix_factura_lote_id_estado),
+        sin materializar filas completas ni el JSONB api_response.
+        """
+        query = select(Factura.reference_code).where(
+            Factura.lote_id == lote_id,
+            Factura.estado.in_(estados),
+        )
+        result = await self.session.execute(query)
+        return set(result.scalars().all())
+
     async def get_by_cliente_email(
         self, email: str, skip: int = 0, limit: int = 50
     ) -> List[Factura]:
@@ -46,6 +113,25 @@ class FacturaRepository(BaseRepository[Factura]):
         result = await self.session.execute(query)
         return result.scalars().all()
 
+    async def get_page_by_cliente_email(
+        self,
+        email: str,
+        limit: int = 50,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        columnas: Optional[Sequence[str]] = None,
+    ) -> Pagina[Factura]:
+        """
+        Facturas de un cliente paginadas por keyset (id DESC).
+
+        Usa ix_factura_cliente_email_id: cada página es un rango del índice.
+        `columnas`: proyección (ver BaseRepository._proyectar).
+        """
+        query = self._proyectar(
+            select(Factura).where(Factura.cliente_email == email), columnas
+        )
+        return await paginar(self.session, query, (Factura.id,), limit, after, before)
+
     async def get_estadisticas_lote(self, lote_id: int) -> dict:
         """Calcular estadísticas de un lote"""
         from sqlalchemy import func
@@ -109,6 +195,11 @@ class FacturaRepository(BaseRepository[Factura]):
         if not factura:
             return None
 
+        # Los contadores del lote se ajustan en la misma transacción
+        contadores = CambiosContadores()
+        contadores.mover(factura.lote_id, factura.estado, nuevo_estado, factura.total)
+        await LoteRepository(self.session).ajustar_contadores(contadores)
+
         factura.estado = nuevo_estado
 
         if motivo:
@@ -1,12 +1,54 @@
 """Lote Repository - Repositorio especializado para Lotes con eager loading"""
 
-from typing import List, Optional, Dict, Any
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Sequence, Tuple
+from sqlalchemy import func, update
 from sqlmodel import select
 from sqlalchemy.orm import selectinload
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.models import Lote
+from app.models import Factura, Lote
+from app.models.lote import CONTADOR_POR_ESTADO, ESTADOS_LOTE
 from app.repositories.base import BaseRepository
+from app.repositories.pagination import Pagina, paginar
+
+
+class CambiosContadores:
+    """
+    Cambios de estado de facturas acumulados por lote.
+
+    Se registran fila a fila y se aplican con un UPDATE por lote
+    (LoteRepository.ajustar_contadores) al cerrar la transacción.
+    """
+
+    def __init__(self):
+        self.por_lote: Dict[int, Dict[str, float]] = {}
+
+    def mover(
+        self,
+        lote_id: Optional[int],
+        desde: Optional[str],
+        hacia: Optional[str],
+        monto: float = 0.0,
+        cantidad: int = 1,
+    ) -> None:
+        """
+        Registrar `cantidad` facturas de `monto` cada una que pasan de
+        `desde` a `hacia` (desde=None: altas). Sin lote no hay contadores.
+        """
+        if lote_id is None or desde == hacia:
+            return
+        cambios = self.por_lote.setdefault(lote_id, {})
+        if desde is None:
+            cambios["monto_total"] = cambios.get("monto_total", 0.0) + monto * cantidad
+        for estado, signo in ((desde, -1), (hacia, 1)):
+            columna = CONTADOR_POR_ESTADO.get(estado)
+            if columna:
+                cambios[columna] = cambios.get(columna, 0) + signo * cantidad
+            if estado == "ENVIADA":
+                cambios["monto_exitoso"] = (
+                    cambios.get("monto_exitoso", 0.0) + signo * monto * cantidad
+                )
 
 
 class LoteRepository(BaseRepository[Lote]):
@@ -77,6 +119,24 @@ class LoteRepository(BaseRepository[Lote]):
         result = await self.session.execute(query)
         return result.scalars().all()
     
+    async def get_page_by_estado(
+        self,
+        estado: Optional[str] = None,
+        limit: int = 100,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Pagina[Lote]:
+        """
+        Lotes paginados por keyset (id DESC), con filtro opcional de estado.
+
+        Sin relaciones (en GraphQL las cargan los DataLoaders). Usa
+        ix_lote_estado_id con filtro y la PK sin él.
+        """
+        query = select(Lote)
+        if estado:
+            query = query.where(Lote.estado == estado)
+        return await paginar(self.session, query, (Lote.id,), limit, after, before)
+
     # ============= DOMAIN-SPECIFIC METHODS =============
     
     async def get_by_nombre(self, nombre: str) -> Optional[Lote]:
@@ -95,6 +155,160 @@ class LoteRepository(BaseRepository[Lote]):
         result = await self.session.execute(query)
         return result.scalars().first()
 
+    async def cambiar_estado(
+        self, lote_id: int, desde: Sequence[str], hacia: str
+    ) -> bool:
+        """
+        Transición atómica de estado (sin commit).
+
+        UPDATE condicional: False si el lote no estaba en ninguno de `desde`
+        (otra petición o el pipeline lo cambió antes).
+        """
+        result = await self.session.execute(
+            update(Lote)
+            .where(Lote.id == lote_id, Lote.estado.in_(desde))
+            .values(estado=hacia)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    async def get_estado(self, lote_id: int, bloquear: bool = False) -> Optional[str]:
+        """
+        Leer solo el estado actual del lote (sin caché de la sesión).
+
+        bloquear=True toma FOR UPDATE: una cancelación concurrente espera
+        a que termine la transacción en curso.
+        """
+        query = select(Lote.estado).where(Lote.id == lote_id)
+        if bloquear:
+            query = query.with_for_update()
+        result = await self.session.execute(query)
+        return result.scalars().first()
+
+    async def get_checkpoint(self, lote_id: int) -> Optional[Tuple[str, int]]:
+        """
+        Estado y chunks_completados del lote, bloqueándolo (FOR UPDATE).
+
+        Punto de control de la ingesta: una cancelación concurrente espera a
+        que termine el chunk, y una segunda ejecución de la misma tarea
+        (re-entrega del broker) se detecta porque avanzó chunks_completados.
+        """
+        query = (
+            select(Lote.estado, Lote.chunks_completados)
+            .where(Lote.id == lote_id)
+            .with_for_update()
+        )
+        result = await self.session.execute(query)
+        fila = result.first()
+        return (fila[0], fila[1]) if fila else None
+
+    async def get_usuarios(self, lote_ids: List[int]) -> Dict[int, Optional[int]]:
+        """Mapear lote_id → usuario_id (solo esas dos columnas)"""
+        query = select(Lote.id, Lote.usuario_id).where(Lote.id.in_(lote_ids))
+        result = await self.session.execute(query)
+        return {lote_id: usuario_id for lote_id, usuario_id in result.all()}
+
+    async def get_plazos(self, lote_ids: List[int]) -> Dict[int, Optional[datetime]]:
+        """Mapear lote_id → fecha_limite (solo esas dos columnas)"""
+        query = select(Lote.id, Lote.fecha_limite).where(Lote.id.in_(lote_ids))
+        result = await self.session.execute(query)
+        return {lote_id: fecha_limite for lote_id, fecha_limite in result.all()}
+
+    async def ajustar_contadores(self, cambios: CambiosContadores) -> None:
+        """
+        Aplicar los cambios acumulados a los contadores (sin commit).
+
+        Incremento en SQL (col = col + delta): la tarea del lote y los
+        dispatchers ajustan el mismo lote en paralelo sin pisarse.
+        """
+        for lote_id, deltas in cambios.por_lote.items():
+            valores = {
+                columna: getattr(Lote, columna) + delta
+                for columna, delta in deltas.items()
+                if delta
+            }
+            if not valores:
+                continue
+            await self.session.execute(
+                update(Lote)
+                .where(Lote.id == lote_id)
+                .values(**valores)
+                .execution_options(synchronize_session=False)
+            )
+
+    async def get_estadisticas(self, lote_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Estadísticas del lote desde sus contadores (lectura por PK).
+
+        Returns:
+            {
+                'total_facturas', 'enviadas', 'rechazadas', 'error_api',
+                'pendientes', 'canceladas': int,
+                'total_monto', 'monto_exitoso', 'promedio_monto': float,
+                'tasa_exito': float (%)
+            }
+            o None si el lote no existe
+        """
+        query = select(
+            Lote.pendientes,
+            Lote.enviadas,
+            Lote.rechazadas,
+            Lote.error_api,
+            Lote.canceladas,
+            Lote.monto_total,
+            Lote.monto_exitoso,
+        ).where(Lote.id == lote_id)
+        fila = (await self.session.execute(query)).first()
+        if fila is None:
+            return None
+
+        total = (
+            fila.pendientes + fila.enviadas + fila.rechazadas
+            + fila.error_api + fila.canceladas
+        )
+        return {
+            "total_facturas": total,
+            "enviadas": fila.enviadas,
+            "rechazadas": fila.rechazadas,
+            "error_api": fila.error_api,
+            "pendientes": fila.pendientes,
+            "canceladas": fila.canceladas,
+            "total_monto": fila.monto_total,
+            "monto_exitoso": fila.monto_exitoso,
+            "promedio_monto": fila.monto_total / total if total else 0.0,
+            "tasa_exito": round(fila.enviadas / total * 100, 2) if total else 0.0,
+        }
+
+    async def recalcular_contadores(self, lote_id: int) -> None:
+        """
+        Reconstruir los contadores desde las facturas (sin commit).
+
+        Una agregación GROUP BY estado sobre ix_factura_lote_id_estado; para
+        lotes creados antes de los contadores o tras una corrección manual.
+        """
+        query = (
+            select(Factura.estado, func.count(), func.coalesce(func.sum(Factura.total), 0.0))
+            .where(Factura.lote_id == lote_id)
+            .group_by(Factura.estado)
+        )
+        valores: Dict[str, float] = {
+            columna: 0 for columna in CONTADOR_POR_ESTADO.values()
+        }
+        valores.update(monto_total=0.0, monto_exitoso=0.0)
+        for estado, total, monto in (await self.session.execute(query)).all():
+            columna = CONTADOR_POR_ESTADO.get(estado)
+            if columna:
+                valores[columna] = total
+            valores["monto_total"] += monto
+            if estado == "ENVIADA":
+                valores["monto_exitoso"] = monto
+        await self.session.execute(
+            update(Lote)
+            .where(Lote.id == lote_id)
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+
     async def get_pendientes(self) -> List[Lote]:
         """Obtener lotes pendientes de procesamiento (sin relaciones)"""
         query = select(Lote).where(Lote.estado == "PENDIENTE")
@@ -139,6 +353,17 @@ class LoteRepository(BaseRepository[Lote]):
 
     # ============= ADVANCED QUERIES =============
     
+    async def get_historial(self, skip: int = 0, limit: int = 100) -> List[Lote]:
+        """Historial de lotes por fecha descendente (sin relaciones)"""
+        query = (
+            select(Lote)
+            .order_by(Lote.fecha_carga.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return result.scalars().all()
+    
     async def get_historial_with_relations(
         self,
         skip: int = 0,
@@ -193,14 +418,29 @@ class LoteRepository(BaseRepository[Lote]):
         return result.scalars().all()
 
     async def count_by_estado(self, estado: str) -> int:
-        """Contar lotes por estado"""
-        query = select(Lote).where(Lote.estado == estado)
+        """Contar lotes por estado (COUNT(*) sobre ix_lote_estado_id)"""
+        return await self.count(estado=estado)
+
+    async def count_por_estado(self) -> Dict[str, int]:
+        """
+        Lotes por estado en una sola consulta (GROUP BY estado).
+
+        La agregación la hace Postgres sobre ix_lote_estado_id: no se
+        transfiere ninguna fila de lote, cuesta lo mismo con mil que con un
+        millón de lotes en memoria de la aplicación.
+
+        Returns:
+            {estado: lotes}, con 0 para los estados de ESTADOS_LOTE sin lotes
+        """
+        query = select(Lote.estado, func.count()).group_by(Lote.estado)
         result = await self.session.execute(query)
-        return len(result.scalars().all())
+        conteos = dict.fromkeys(ESTADOS_LOTE, 0)
+        conteos.update({estado: total for estado, total in result.all()})
+        return conteos
 
     async def get_estadisticas_totales(self) -> Dict[str, Any]:
         """
-        Obtener estadísticas globales de lotes.
+        Obtener estadísticas globales de lotes (una consulta, ver count_por_estado).
         
         Returns:
             {
@@ -208,21 +448,23 @@ class LoteRepository(BaseRepository[Lote]):
                 'pendientes': int,
                 'procesando': int,
                 'completados': int,
-                'errores': int
+                'errores': int,
+                'pausados': int,
+                'cancelados': int,
+                'expirados': int,
+                'por_estado': {estado: int}
             }
         """
-        all_lotes = await self.get_all()
-        
-        total = len(all_lotes)
-        pendientes = len([l for l in all_lotes if l.estado == "PENDIENTE"])
-        procesando = len([l for l in all_lotes if l.estado == "PROCESANDO"])
-        completados = len([l for l in all_lotes if l.estado == "COMPLETADO"])
-        errores = len([l for l in all_lotes if l.estado == "ERROR"])
+        por_estado = await self.count_por_estado()
         
         return {
-            "total": total,
-            "pendientes": pendientes,
-            "procesando": procesando,
-            "completados": completados,
-            "errores": errores
+            "total": sum(por_estado.values()),
+            "pendientes": por_estado["PENDIENTE"],
+            "procesando": por_estado["PROCESANDO"],
+            "completados": por_estado["COMPLETADO"],
+            "errores": por_estado["ERROR"],
+            "pausados": por_estado["PAUSADO"],
+            "cancelados": por_estado["CANCELADO"],
+            "expirados": por_estado["EXPIRADO"],
+            "por_estado": por_estado
         }
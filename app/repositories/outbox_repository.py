@@ -0,0 +1,476 @@
+"""Outbox Repository - Reclamo y cierre de envíos pendientes a Factus"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Integer, column, func, or_, update, values
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Factura, FacturaOutbox, Lote
+from app.models.lote import ESTADOS_DETENIDOS
+from app.models.outbox import (
+    OUTBOX_CANCELADO,
+    OUTBOX_EN_CURSO,
+    OUTBOX_ENVIADO,
+    OUTBOX_PENDIENTE,
+)
+from app.repositories.base import BaseRepository
+from app.repositories.dead_letter_repository import DeadLetterRepository
+from app.repositories.lote_repository import CambiosContadores, LoteRepository
+
+# Columnas de la Factura que escribe registrar_resultados
+COLUMNAS_RESULTADO = ("estado", "motivo_rechazo", "api_response")
+
+
+class OutboxRepository(BaseRepository[FacturaOutbox]):
+    """
+    Repositorio del outbox de facturas.
+
+    Varios dispatchers (procesos o máquinas) drenan el outbox en paralelo:
+    - reclamar(): FOR UPDATE SKIP LOCKED, cada fila va a un solo dispatcher
+    - registrar_resultados(): la factura, la fila del outbox y su entrada
+      en el dead-letter se cierran en la misma transacción y solo si el
+      lease sigue siendo del dispatcher
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(FacturaOutbox, session)
+
+    async def reclamar(
+        self,
+        token: str,
+        limite: int,
+        lease_segundos: float,
+        lote_id: Optional[int] = None,
+    ) -> List[FacturaOutbox]:
+        """
+        Reclamar hasta `limite` envíos pendientes (o con lease vencido).
+
+        Las filas bloqueadas por otro dispatcher se saltan en lugar de
+        esperar, así N dispatchers avanzan en paralelo sin pisarse. Las de
+        lotes detenidos (pausados, cancelados, expirados) o con el plazo
+        vencido no se reclaman: es el punto de control entre batches.
+        """
+        ahora = datetime.utcnow()
+        query = (
+            select(FacturaOutbox.id)
+            .outerjoin(Lote, Lote.id == FacturaOutbox.lote_id)
+            .where(
+                or_(Lote.id.is_(None), Lote.estado.not_in(ESTADOS_DETENIDOS)),
+                or_(Lote.fecha_limite.is_(None), Lote.fecha_limite > ahora),
+                or_(
+                    FacturaOutbox.estado == OUTBOX_PENDIENTE,
+                    (FacturaOutbox.estado == OUTBOX_EN_CURSO)
+                    & (FacturaOutbox.lease_hasta < ahora),
+                )
+            )
+            .order_by(FacturaOutbox.id)
+            .limit(limite)
+            .with_for_update(of=FacturaOutbox, skip_locked=True)
+        )
+        if lote_id is not None:
+            query = query.where(FacturaOutbox.lote_id == lote_id)
+
+        ids = (await self.session.execute(query)).scalars().all()
+        if not ids:
+            await self.session.commit()
+            return []
+
+        result = await self.session.execute(
+            update(FacturaOutbox)
+            .where(FacturaOutbox.id.in_(ids))
+            .values(
+                estado=OUTBOX_EN_CURSO,
+                lease_token=token,
+                lease_hasta=ahora + timedelta(seconds=lease_segundos),
+                intentos=FacturaOutbox.intentos + 1,
+            )
+            .returning(FacturaOutbox)
+            .execution_options(synchronize_session=False)
+        )
+        reclamados = list(result.scalars().all())
+        await self.session.commit()
+        return sorted(reclamados, key=lambda fila: fila.id)
+
+    async def renovar_lease(
+        self, fila_id: int, token: str, lease_segundos: float
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Extender el lease de una fila justo antes de enviarla (con commit).
+
+        Un batch reclamado espera turno en el rate limiter, la ventana AIMD
+        y los reintentos: sin renovar, el lease vencería a mitad del batch y
+        otro dispatcher volvería a enviar la fila. También es el último
+        punto de control del lote: una cancelación o pausa posterior al
+        reclamo se ve aquí, no recién en el próximo batch.
+
+        Returns:
+            (False si la fila ya no es de este dispatcher (no debe enviarse),
+            estado actual de su lote)
+        """
+        result = await self.session.execute(
+            update(FacturaOutbox)
+            .where(
+                FacturaOutbox.id == fila_id,
+                FacturaOutbox.lease_token == token,
+                FacturaOutbox.estado == OUTBOX_EN_CURSO,
+            )
+            .values(lease_hasta=datetime.utcnow() + timedelta(seconds=lease_segundos))
+            .returning(FacturaOutbox.lote_id)
+            .execution_options(synchronize_session=False)
+        )
+        renovada = result.first()
+        estado_lote = None
+        if renovada is not None and renovada[0] is not None:
+            estado_lote = await LoteRepository(self.session).get_estado(renovada[0])
+        await self.session.commit()
+        return renovada is not None, estado_lote
+
+    async def cancelar_reclamadas(
+        self, token: str, fila_ids: Sequence[int], motivo: str
+    ) -> None:
+        """
+        Cancelar filas reclamadas que no se enviaron porque su lote se
+        canceló o expiró después del reclamo (sin commit).
+        """
+        if not fila_ids:
+            return
+        result = await self.session.execute(
+            update(FacturaOutbox)
+            .where(
+                FacturaOutbox.id.in_(list(fila_ids)),
+                FacturaOutbox.lease_token == token,
+                FacturaOutbox.estado == OUTBOX_EN_CURSO,
+            )
+            .values(estado=OUTBOX_CANCELADO, lease_token=None)
+            .returning(FacturaOutbox.factura_id)
+            .execution_options(synchronize_session=False)
+        )
+        factura_ids = list(result.scalars().all())
+        if not factura_ids:
+            return
+        canceladas = await self.session.execute(
+            update(Factura)
+            .where(Factura.id.in_(factura_ids), Factura.estado == "PENDIENTE")
+            .values(estado="CANCELADA", motivo_rechazo=motivo)
+            .returning(Factura.lote_id, Factura.total)
+            .execution_options(synchronize_session=False)
+        )
+        contadores = CambiosContadores()
+        for lote_id, monto in canceladas.all():
+            contadores.mover(lote_id, "PENDIENTE", "CANCELADA", monto or 0.0)
+        await LoteRepository(self.session).ajustar_contadores(contadores)
+
+    async def liberar_reclamadas(self, token: str, fila_ids: Sequence[int]) -> None:
+        """
+        Devolver a PENDIENTE filas reclamadas que no se enviaron porque su
+        lote se pausó después del reclamo (sin commit). Salen al reanudar.
+        """
+        if not fila_ids:
+            return
+        await self.session.execute(
+            update(FacturaOutbox)
+            .where(
+                FacturaOutbox.id.in_(list(fila_ids)),
+                FacturaOutbox.lease_token == token,
+                FacturaOutbox.estado == OUTBOX_EN_CURSO,
+            )
+            .values(estado=OUTBOX_PENDIENTE, lease_token=None, lease_hasta=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def registrar_resultados(
+        self,
+        token: str,
+        resultados: Sequence[
+            Tuple[FacturaOutbox, Dict[str, Any], Optional[Dict[str, Any]]]
+        ],
+    ) -> Dict[int, Dict[str, int]]:
+        """
+        Guardar el resultado de cada envío en su factura y cerrar el outbox.
+
+        Sentencias por batch, no por fila: un UPDATE del outbox, un
+        UPDATE ... FROM (VALUES ...) de las facturas, un INSERT del
+        dead-letter y los ajustes de cada lote.
+
+        Args:
+            token: Lease con el que se reclamaron las filas
+            resultados: (fila del outbox, valores para la Factura
+                (COLUMNAS_RESULTADO), valores del dead-letter si el envío falló)
+
+        Returns:
+            {lote_id: {estado de la factura: facturas registradas}}. Las
+            filas cuyo lease ya no es nuestro (venció y otro dispatcher la
+            reclamó) se descartan: el otro dispatcher reenvía con la misma
+            Idempotency-Key.
+        """
+        ahora = datetime.utcnow()
+        por_id = {fila.id: (fila, valores, dl) for fila, valores, dl in resultados}
+        registradas: Dict[int, Dict[str, int]] = {}
+        if not por_id:
+            await self.session.commit()
+            return registradas
+
+        # Cerrar solo las filas cuyo lease sigue siendo de este dispatcher
+        cerradas = await self.session.execute(
+            update(FacturaOutbox)
+            .where(
+                FacturaOutbox.id.in_(list(por_id)),
+                FacturaOutbox.lease_token == token,
+                FacturaOutbox.estado == OUTBOX_EN_CURSO,
+            )
+            .values(estado=OUTBOX_ENVIADO, fecha_envio=ahora, lease_token=None)
+            .returning(FacturaOutbox.id)
+            .execution_options(synchronize_session=False)
+        )
+        propias = [por_id[fila_id] for fila_id in cerradas.scalars().all()]
+        if not propias:
+            await self.session.commit()
+            return registradas
+
+        tabla = Factura.__table__
+        datos = values(
+            column("id", Integer),
+            *(column(nombre, tabla.c[nombre].type) for nombre in COLUMNAS_RESULTADO),
+            name="resultado",
+        ).data([
+            (fila.factura_id, *(valores.get(nombre) for nombre in COLUMNAS_RESULTADO))
+            for fila, valores, _ in propias
+        ])
+        actualizadas = await self.session.execute(
+            update(Factura)
+            .where(Factura.id == datos.c.id)
+            .values(**{nombre: datos.c[nombre] for nombre in COLUMNAS_RESULTADO})
+            .returning(Factura.id, Factura.total)
+            .execution_options(synchronize_session=False)
+        )
+        montos = dict(actualizadas.all())
+
+        dead_letters = DeadLetterRepository(self.session)
+        await dead_letters.registrar_fallos(
+            [dl for _, _, dl in propias if dl is not None]
+        )
+        await dead_letters.marcar_resueltas(
+            [fila.factura_id for fila, _, dl in propias if dl is None]
+        )
+
+        contadores = CambiosContadores()
+        for fila, valores, _ in propias:
+            contadores.mover(
+                fila.lote_id, "PENDIENTE", valores["estado"], montos.get(fila.factura_id) or 0.0
+            )
+            if fila.lote_id is not None:
+                por_estado = registradas.setdefault(fila.lote_id, {})
+                por_estado[valores["estado"]] = por_estado.get(valores["estado"], 0) + 1
+        await LoteRepository(self.session).ajustar_contadores(contadores)
+
+        for lote_id, por_estado in registradas.items():
+            await self.session.execute(
+                update(Lote)
+                .where(Lote.id == lote_id)
+                .values(
+                    registros_procesados=Lote.registros_procesados + sum(por_estado.values()),
+                    fecha_checkpoint=ahora,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        await self.session.commit()
+        return registradas
+
+    async def get_factura_ids_fallidas(self, lote_id: int) -> List[int]:
+        """
+        IDs de las facturas ERROR_API del lote que tienen envío en el outbox.
+
+        Una sola consulta sobre ix_factura_lote_id_estado; el join descarta
+        facturas sin payload guardado (no se pueden reenviar).
+        """
+        query = (
+            select(Factura.id)
+            .join(FacturaOutbox, FacturaOutbox.factura_id == Factura.id)
+            .where(Factura.lote_id == lote_id, Factura.estado == "ERROR_API")
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def reencolar(self, factura_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Devolver facturas ya enviadas al outbox (sin commit).
+
+        - Factura → PENDIENTE; fila del outbox → PENDIENTE, sin lease
+        - Lote: descuenta las facturas de registros_procesados (y de los
+          contadores de su estado anterior) y, si ya se había cerrado,
+          vuelve a PROCESANDO para cerrarse al drenar
+
+        Returns:
+            {lote_id: facturas reencoladas}
+        """
+        ids = list(factura_ids)
+        if not ids:
+            return {}
+
+        # Estado anterior (para los contadores), bloqueando las facturas
+        # hasta el UPDATE
+        result = await self.session.execute(
+            select(Factura.id, Factura.lote_id, Factura.estado, Factura.total)
+            .where(Factura.id.in_(ids), Factura.estado != "PENDIENTE")
+            .with_for_update()
+        )
+        reencoladas = result.all()
+        reencoladas_ids = [factura_id for factura_id, _, _, _ in reencoladas]
+        await self.session.execute(
+            update(Factura)
+            .where(Factura.id.in_(reencoladas_ids))
+            .values(estado="PENDIENTE", motivo_rechazo=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(
+            update(FacturaOutbox)
+            .where(FacturaOutbox.factura_id.in_(reencoladas_ids))
+            .values(estado=OUTBOX_PENDIENTE, lease_token=None, lease_hasta=None)
+            .execution_options(synchronize_session=False)
+        )
+
+        por_lote: Dict[int, int] = {}
+        contadores = CambiosContadores()
+        for _, lote_id, estado, monto in reencoladas:
+            if lote_id is not None:
+                por_lote[lote_id] = por_lote.get(lote_id, 0) + 1
+            contadores.mover(lote_id, estado, "PENDIENTE", monto or 0.0)
+        await LoteRepository(self.session).ajustar_contadores(contadores)
+        for lote_id, cantidad in por_lote.items():
+            await self.session.execute(
+                update(Lote)
+                .where(Lote.id == lote_id)
+                .values(registros_procesados=Lote.registros_procesados - cantidad)
+                .execution_options(synchronize_session=False)
+            )
+        if por_lote:
+            await self.session.execute(
+                update(Lote)
+                .where(
+                    Lote.id.in_(list(por_lote)),
+                    Lote.estado.in_(("COMPLETADO", "ERROR")),
+                    Lote.ingesta_completa.is_(True),
+                )
+                .values(estado="PROCESANDO")
+                .execution_options(synchronize_session=False)
+            )
+        return por_lote
+
+    async def cancelar_pendientes_lote(
+        self,
+        lote_id: int,
+        motivo: str = "Lote cancelado",
+        incluir_lease_vencido: bool = False,
+    ) -> int:
+        """
+        Cancelar los envíos del lote que aún no salieron (sin commit).
+
+        Las filas EN_CURSO no se tocan: su dispatcher ve el lote cancelado
+        antes de enviar cada una (renovar_lease) y las cancela; las que ya
+        salieron se registran normalmente. Con incluir_lease_vencido también
+        se cancelan las de dispatchers caídos (nadie las va a registrar).
+
+        Returns:
+            Facturas canceladas
+        """
+        sin_salir = FacturaOutbox.estado == OUTBOX_PENDIENTE
+        if incluir_lease_vencido:
+            sin_salir = or_(
+                sin_salir,
+                (FacturaOutbox.estado == OUTBOX_EN_CURSO)
+                & (FacturaOutbox.lease_hasta < datetime.utcnow()),
+            )
+        result = await self.session.execute(
+            update(FacturaOutbox)
+            .where(FacturaOutbox.lote_id == lote_id, sin_salir)
+            .values(estado=OUTBOX_CANCELADO, lease_token=None)
+            .returning(FacturaOutbox.factura_id)
+            .execution_options(synchronize_session=False)
+        )
+        factura_ids = list(result.scalars().all())
+        if factura_ids:
+            canceladas = await self.session.execute(
+                update(Factura)
+                .where(Factura.id.in_(factura_ids), Factura.estado == "PENDIENTE")
+                .values(estado="CANCELADA", motivo_rechazo=motivo)
+                .execution_options(synchronize_session=False)
+            )
+            contadores = CambiosContadores()
+            contadores.mover(lote_id, "PENDIENTE", "CANCELADA", cantidad=canceladas.rowcount)
+            await LoteRepository(self.session).ajustar_contadores(contadores)
+        return len(factura_ids)
+
+    async def expirar_lotes_vencidos(self, lote_id: Optional[int] = None) -> List[int]:
+        """
+        Cerrar como EXPIRADO los lotes con el plazo vencido.
+
+        El resultado es parcial: lo ya enviado se conserva y lo que no
+        alcanzó a salir queda CANCELADA. Los lotes bloqueados por otra
+        transacción (ingesta de un chunk, otro barrido) se saltan y se
+        expiran en la siguiente pasada.
+
+        Returns:
+            IDs de los lotes expirados
+        """
+        query = (
+            select(Lote.id)
+            .where(
+                Lote.fecha_limite < datetime.utcnow(),
+                Lote.estado.in_(("PENDIENTE", "PROCESANDO", "PAUSADO")),
+            )
+            .with_for_update(skip_locked=True)
+        )
+        if lote_id is not None:
+            query = query.where(Lote.id == lote_id)
+
+        expirados = list((await self.session.execute(query)).scalars().all())
+        if expirados:
+            await self.session.execute(
+                update(Lote)
+                .where(Lote.id.in_(expirados))
+                .values(estado="EXPIRADO")
+                .execution_options(synchronize_session=False)
+            )
+        for expirado in expirados:
+            await self.cancelar_pendientes_lote(
+                expirado, "Plazo del lote vencido", incluir_lease_vencido=True
+            )
+        await self.session.commit()
+        return expirados
+
+    async def count_pendientes_lote(self, lote_id: int) -> int:
+        """Envíos del lote que aún no tienen resultado (pendientes o en curso)"""
+        query = select(func.count()).select_from(FacturaOutbox).where(
+            FacturaOutbox.lote_id == lote_id,
+            FacturaOutbox.estado.in_((OUTBOX_PENDIENTE, OUTBOX_EN_CURSO)),
+        )
+        result = await self.session.execute(query)
+        return result.scalar()
+
+    async def completar_lotes_drenados(self, lote_ids: Set[int]) -> List[int]:
+        """
+        Marcar COMPLETADO los lotes ya ingeridos y sin envíos pendientes.
+
+        El UPDATE condicional garantiza que solo un dispatcher cierra cada lote.
+        """
+        completados = []
+        for lote_id in lote_ids:
+            if await self.count_pendientes_lote(lote_id):
+                continue
+            result = await self.session.execute(
+                update(Lote)
+                .where(
+                    Lote.id == lote_id,
+                    Lote.estado == "PROCESANDO",
+                    Lote.ingesta_completa.is_(True),
+                )
+                .values(estado="COMPLETADO")
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                completados.append(lote_id)
+        await self.session.commit()
+        return completados
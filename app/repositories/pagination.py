@@ -0,0 +1,170 @@
+"""Pagination - Paginación keyset (cursores) sobre claves de orden indexadas"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+T = TypeVar("T")
+
+# Tamaño máximo de página aceptado por las APIs
+LIMITE_MAXIMO = 500
+
+
+class CursorInvalido(ValueError):
+    """Cursor mal formado o de otro listado"""
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    """Valores de la clave de orden → cursor opaco (base64url)"""
+    serializables = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    crudo = json.dumps(serializables, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, orden: Sequence[Any]) -> Tuple[Any, ...]:
+    """
+    Cursor → valores de la clave de orden, con el tipo de cada columna.
+
+    Raises:
+        CursorInvalido: si no se puede decodificar o no encaja con `orden`
+    """
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(crudo)
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(valores, list) or len(valores) != len(orden):
+        raise CursorInvalido(f"Invalid cursor: {cursor!r}")
+
+    tipados = []
+    for columna, valor in zip(orden, valores):
+        try:
+            tipados.append(_tipar(valor, _tipo_python(columna)))
+        except (ValueError, TypeError, NotImplementedError) as e:
+            raise CursorInvalido(f"Invalid cursor: {cursor!r}") from e
+    return tuple(tipados)
+
+
+def _tipo_python(columna: Any) -> type:
+    """
+    Tipo Python de la columna.
+
+    Los TypeDecorator (ej. UTCDateTime de SQLModel) declaran `object`:
+    se usa el del tipo que envuelven.
+    """
+    return getattr(columna.type, "impl", columna.type).python_type
+
+
+def _tipar(valor: Any, tipo: type) -> Any:
+    """
+    Valor JSON del cursor → tipo de la columna.
+
+    Todo valor se valida: uno de otro tipo (ej. "x" para un id) llegaría
+    al driver y la consulta fallaría con un error de BD en lugar de un 422.
+
+    Raises:
+        TypeError / ValueError: si el valor no corresponde a la columna
+    """
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if isinstance(valor, bool) and tipo is not bool:
+        raise TypeError(f"{valor!r} is not {tipo.__name__}")
+    if tipo is float and isinstance(valor, int):
+        return float(valor)
+    if not isinstance(valor, tipo):
+        raise TypeError(f"{valor!r} is not {tipo.__name__}")
+    return valor
+
+
+@dataclass
+class Pagina(Generic[T]):
+    """
+    Página de un listado keyset.
+
+    `cursores[i]` es el cursor de `items[i]`: pasarlo como `after` devuelve
+    lo que sigue a ese elemento, como `before` lo que lo precede.
+    """
+    items: List[T]
+    cursores: List[str] = field(default_factory=list)
+    hay_siguiente: bool = False
+    hay_anterior: bool = False
+
+    @property
+    def cursor_inicio(self) -> Optional[str]:
+        return self.cursores[0] if self.cursores else None
+
+    @property
+    def cursor_fin(self) -> Optional[str]:
+        return self.cursores[-1] if self.cursores else None
+
+
+async def paginar(
+    session: AsyncSession,
+    query,
+    orden: Sequence[Any],
+    limite: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    descendente: bool = True,
+) -> Pagina:
+    """
+    Ejecutar `query` paginada por keyset sobre las columnas `orden`.
+
+    En lugar de OFFSET (que lee y descarta todas las filas anteriores) se
+    filtra por comparación de tuplas desde el cursor:
+        WHERE (fecha_carga, id) < (:fecha, :id) ORDER BY fecha_carga DESC, id DESC
+    Con un índice sobre las columnas de orden (y los filtros de igualdad
+    delante), la página 10.000 cuesta lo mismo que la primera.
+
+    Args:
+        session: Sesión async
+        query: select() del modelo con los filtros ya aplicados
+        orden: Columnas de orden; la última debe ser única (ej: id)
+        limite: Elementos por página
+        after: Cursor: página siguiente a ese elemento
+        before: Cursor: página anterior a ese elemento
+        descendente: Sentido del listado
+
+    Raises:
+        CursorInvalido: si after/before no son cursores de este listado
+
+    Returns:
+        Pagina con los items en el orden del listado. Al avanzar con
+        `after`, hay_anterior es True (se llegó desde alguna página); al
+        retroceder con `before`, lo mismo para hay_siguiente.
+    """
+    hacia_atras = before is not None
+    clave = tuple_(*orden)
+
+    if after is not None:
+        valores = tuple_(*decodificar_cursor(after, orden))
+        query = query.where(clave < valores if descendente else clave > valores)
+    if before is not None:
+        valores = tuple_(*decodificar_cursor(before, orden))
+        query = query.where(clave > valores if descendente else clave < valores)
+
+    # Hacia atrás se recorre en sentido inverso y luego se da vuelta
+    asc = descendente == hacia_atras
+    query = query.order_by(*(c.asc() if asc else c.desc() for c in orden))
+
+    # Una fila extra indica si hay más allá del límite sin un COUNT
+    result = await session.execute(query.limit(limite + 1))
+    filas = list(result.scalars().all())
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    if hacia_atras:
+        filas.reverse()
+
+    return Pagina(
+        items=filas,
+        cursores=[
+            codificar_cursor([getattr(fila, c.key) for c in orden]) for fila in filas
+        ],
+        hay_siguiente=hay_mas if not hacia_atras else True,
+        hay_anterior=hay_mas if hacia_atras else after is not None,
+    )
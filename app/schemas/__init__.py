@@ -8,10 +8,19 @@ from .invoice import (
     InvoiceCreate,
     InvoiceResponse,
     InvoiceListResponse,
+    InvoiceCursorListResponse,
     InvoiceStats,
 )
-from .lote import LoteCreate, LoteResponse, LoteDetailResponse, ProcessResult, BatchUploadResponse
-from .common import PaginationParams
+from .lote import (
+    LoteCreate,
+    LoteResponse,
+    LoteDetailResponse,
+    LoteReenvioResponse,
+    LoteProgresoResponse,
+    ProcessResult,
+    BatchUploadResponse,
+)
+from .common import PaginationParams, CursorPageInfo
 
 __all__ = [
     "Token",
@@ -23,11 +32,15 @@ __all__ = [
     "InvoiceCreate",
     "InvoiceResponse",
     "InvoiceListResponse",
+    "InvoiceCursorListResponse",
     "InvoiceStats",
     "LoteCreate",
     "LoteResponse",
     "LoteDetailResponse",
+    "LoteReenvioResponse",
+    "LoteProgresoResponse",
     "ProcessResult",
     "BatchUploadResponse",
     "PaginationParams",
+    "CursorPageInfo",
 ]
@@ -1,5 +1,6 @@
 """Schemas compartidos"""
 
+from typing import Optional
 from pydantic import BaseModel, Field
 
 
@@ -16,3 +17,12 @@ class PaginationParams(BaseModel):
     @property
     def limit(self) -> int:
         return self.page_size
+
+
+class CursorPageInfo(BaseModel):
+    """Navegación de un listado por cursores (keyset)"""
+
+    has_next: bool
+    has_previous: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
@@ -4,6 +4,8 @@ from typing import Optional, List
 from pydantic import BaseModel, Field, validator, EmailStr
 from datetime import datetime
 
+from app.schemas.common import CursorPageInfo
+
 
 # ============= ITEM SCHEMAS =============
 
@@ -98,6 +100,13 @@ class InvoiceListResponse(BaseModel):
     pages: int
 
 
+class InvoiceCursorListResponse(BaseModel):
+    """Respuesta paginada por cursores de facturas"""
+
+    items: List[InvoiceResponse]
+    page_info: CursorPageInfo
+
+
 class InvoiceStats(BaseModel):
     """Estadísticas de facturas"""
 
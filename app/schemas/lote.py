@@ -20,7 +20,18 @@ class LoteResponse(BaseModel):
     fecha_carga: datetime
     total_registros: int
     total_errores: int
+    registros_procesados: int = 0
     estado: str
+    usuario_id: Optional[int] = None
+    fecha_limite: Optional[datetime] = None
+    # Contadores de facturas por estado (mantenidos por el pipeline)
+    pendientes: int = 0
+    enviadas: int = 0
+    rechazadas: int = 0
+    error_api: int = 0
+    canceladas: int = 0
+    monto_total: float = 0.0
+    monto_exitoso: float = 0.0
 
     class Config:
         from_attributes = True
@@ -33,6 +44,29 @@ class LoteDetailResponse(LoteResponse):
     estadisticas: Optional[InvoiceStats] = None
 
 
+class LoteReenvioResponse(BaseModel):
+    """Resultado de reenviar las facturas fallidas de un lote"""
+
+    lote_id: int
+    reenviadas: int
+    estado: str
+    registros_procesados: int
+
+
+class LoteProgresoResponse(BaseModel):
+    """Avance en vivo de un lote (eventos SSE de /lotes/{id}/progreso)"""
+
+    lote_id: int
+    estado: Optional[str] = None
+    total: int = 0
+    ingeridas: int = 0
+    procesados: int = 0
+    enviadas: int = 0
+    rechazadas: int = 0
+    errores: int = 0
+    facturas_por_segundo: float = 0.0
+
+
 # ============= PROCESS SCHEMAS =============
 
 
@@ -1,7 +1,29 @@
 import httpx
 import asyncio
+import importlib.util
 import random
+import time
+from typing import Awaitable, Callable, Optional
 from app.core.config import settings
+from app.core.deadline import (
+    DeadlineExpirado,
+    deadline_actual,
+    deadline_expirado,
+    esperar,
+    tiempo_restante,
+)
+from app.core.metrics import metrics
+from app.services.circuit_breaker import factus_circuit_breaker
+from app.services.concurrency import factus_concurrency
+from app.services.factus_recorder import crear_transporte
+from app.services.rate_limiter import factus_rate_limiter
+from app.services.send_scheduler import FLUJO_ANONIMO, Carril, Flujo, reserva_tokens
+from app.services.retry import (
+    RetryBudget,
+    factus_retry_policy,
+    generar_idempotency_key,
+    parse_retry_after,
+)
 
 class FactusService:
     def __init__(self):
@@ -13,23 +35,136 @@ class FactusService:
         # Si settings.FACTUS_URL es vacía o localhost, no importa en modo TEST
         self.base_url = settings.FACTUS_URL 
 
+        # Cliente HTTP de larga vida (keep-alive + HTTP/2). Se crea de forma
+        # perezosa porque sus conexiones quedan atadas al event loop activo:
+        # en Celery cada tarea corre en su propio asyncio.run().
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Cuota de Factus compartida por toda la flota (Redis + fallback local)
+        self.rate_limiter = factus_rate_limiter
+        # Peticiones en vuelo ajustadas a lo que Factus soporta (AIMD)
+        self.concurrency = factus_concurrency
+        # Reintentos con backoff + jitter solo para fallos transitorios
+        self.retry_policy = factus_retry_policy
+        # Corte rápido mientras Factus está caído
+        self.circuit_breaker = factus_circuit_breaker
+
+    # ============= CICLO DE VIDA DEL CLIENTE =============
+
+    @staticmethod
+    def _http2_habilitado() -> bool:
+        """HTTP/2 solo si está configurado y el paquete 'h2' está instalado"""
+        if not settings.FACTUS_HTTP2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            print("⚠️  FACTUS_HTTP2 activo pero 'h2' no está instalado; se usa HTTP/1.1")
+            return False
+        return True
+
+    def _crear_cliente(self) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            http2=self._http2_habilitado(),
+            limits=httpx.Limits(
+                max_connections=settings.FACTUS_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.FACTUS_MAX_KEEPALIVE,
+                keepalive_expiry=settings.FACTUS_KEEPALIVE_EXPIRY,
+            ),
+        )
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            # Grabación / reproducción de tráfico según FACTUS_RECORD_MODE
+            transport=crear_transporte(transport),
+            timeout=httpx.Timeout(
+                settings.FACTUS_TIMEOUT,
+                connect=settings.FACTUS_CONNECT_TIMEOUT,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Cliente compartido por todas las peticiones del event loop actual.
+
+        Si el loop cambió (nueva tarea Celery) o el cliente fue cerrado,
+        se crea uno nuevo; el anterior ya no es utilizable desde este loop.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._client is None
+            or self._client.is_closed
+            or self._client_loop is not loop
+        ):
+            self._client = self._crear_cliente()
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self):
+        """Cerrar el pool de conexiones (shutdown de la API / fin de tarea Celery)"""
+        client, loop = self._client, self._client_loop
+        self._client = None
+        self._client_loop = None
+
+        if client is not None and not client.is_closed and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+        await self.rate_limiter.aclose()
+
+    # ============= OPERACIONES =============
+
     async def verificar_estado_api(self):
+        """
+        Sondeo de salud de Factus.
+
+        También es el sondeo del circuit breaker: una respuesta sin error de
+        servidor lo cierra, un fallo lo mantiene abierto.
+        """
         # MOCK/SIMULACIÓN para estado
         if settings.APP_MODE == "TEST":
             return {"codigo": 200, "mensaje": "Modo Simulación Activo", "data": "OK"}
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(f"{self.base_url}/v1/numbering-ranges", headers=self.headers)
-                return {
-                    "codigo": response.status_code,
-                    "mensaje": "Conexión Exitosa",
-                    "data": str(response.json())
-                }
-            except Exception as e:
-                return {"codigo": 500, "mensaje": f"Error: {str(e)}", "data": ""}
+        try:
+            response = await self.client.get("/v1/numbering-ranges")
+            if response.status_code >= 500:
+                self.circuit_breaker.registrar_fallo()
+            else:
+                self.circuit_breaker.registrar_exito()
+            return {
+                "codigo": response.status_code,
+                "mensaje": "Conexión Exitosa",
+                "data": str(response.json())
+            }
+        except Exception as e:
+            self.circuit_breaker.registrar_fallo()
+            return {"codigo": 500, "mensaje": f"Error: {str(e)}", "data": ""}
 
-    async def enviar_factura(self, factura_json: dict):
+    async def enviar_factura(
+        self,
+        factura_json: dict,
+        retry_budget: Optional[RetryBudget] = None,
+        carril: Carril = Carril.MASIVO,
+        flujo: Optional[Flujo] = None,
+        antes_de_enviar: Optional[Callable[[], Awaitable[Optional[str]]]] = None,
+    ):
+        """
+        Enviar una factura a Factus con reintentos.
+
+        Args:
+            factura_json: Payload de la factura
+            retry_budget: Presupuesto de reintentos compartido por el lote
+                (None = solo limita max_attempts de la política)
+            carril: Prioridad de salida (INTERACTIVO se adelanta al MASIVO)
+            flujo: Usuario y lote del envío masivo, para repartir la cuota
+                de forma justa entre lotes concurrentes
+            antes_de_enviar: Chequeo previo a cada POST, tras las esperas de
+                cuota y concurrencia (ej: renovar el lease del outbox). Si
+                devuelve un motivo, el envío se omite sin llamar a Factus.
+
+        Returns:
+            {'ref', 'status', 'response' | 'error', 'intentos'}; con
+            'omitido' (el motivo) si antes_de_enviar lo descartó
+        """
         ref_code = factura_json.get("reference_code", "N/A")
 
         # --- 🔴 CORTOCIRCUITO (MOCK) ---
@@ -59,24 +194,164 @@ class FactusService:
             }
         
         # --- CÓDIGO REAL (Solo se ejecuta si NO es TEST) ---
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/v1/bills/validate",
-                    json=factura_json,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                return {
-                    "ref": ref_code,
-                    "status": response.status_code,
-                    "response": response.json() if response.status_code != 500 else response.text
-                }
-            except Exception as e:
-                return {
-                    "ref": ref_code,
-                    "status": 0,
-                    "error": str(e)
-                }
+        idempotency_key = generar_idempotency_key(ref_code)
+        if retry_budget is not None:
+            retry_budget.registrar_envio()
+
+        intentos = 0
+        while True:
+            resultado = await self._enviar_intento(
+                factura_json, ref_code, idempotency_key, carril, flujo, antes_de_enviar
+            )
+            intentos += 1
+
+            if resultado.get("deadline_expirado") or resultado.get("omitido"):
+                break
+            if not self.retry_policy.debe_reintentar(resultado, intentos):
+                break
+            espera = self.retry_policy.calcular_espera(intentos, resultado.get("retry_after"))
+            deadline = deadline_actual()
+            if deadline is not None and espera >= deadline.restante():
+                # El reintento no alcanzaría a salir antes del plazo
+                resultado["deadline_expirado"] = True
+                break
+            if retry_budget is not None and not retry_budget.consumir():
+                resultado["retry_budget_agotado"] = True
+                break
+
+            metrics.inc("factus_retries_total", status=resultado.get("status"))
+            await asyncio.sleep(espera)
+
+        resultado["intentos"] = intentos
+        return resultado
+
+    async def _enviar_intento(
+        self,
+        factura_json: dict,
+        ref_code: str,
+        idempotency_key: str,
+        carril: Carril,
+        flujo: Optional[Flujo],
+        antes_de_enviar: Optional[Callable[[], Awaitable[Optional[str]]]] = None,
+    ):
+        """
+        Un único POST a Factus (circuit breaker + concurrencia adaptativa + rate limit).
+
+        Las esperas y el timeout HTTP se recortan al deadline del contexto;
+        un envío cortado por el deadline no cuenta como fallo de Factus.
+        """
+        if deadline_expirado():
+            return self._resultado_deadline(ref_code)
+
+        if not await self._circuito_disponible():
+            # Fallo rápido: el reintento queda "aparcado" hasta el próximo sondeo
+            metrics.inc("factus_circuit_rejected_total")
+            return {
+                "ref": ref_code,
+                "status": 0,
+                "error": "Circuito abierto: Factus no disponible",
+                "circuit_open": True,
+                "retry_after": self.circuit_breaker.tiempo_restante,
+            }
+
+        # Reutiliza el pool: sin handshake TCP/TLS por factura
+        try:
+            await esperar(self.concurrency.acquire(carril, flujo or FLUJO_ANONIMO))
+        except DeadlineExpirado:
+            return self._resultado_deadline(ref_code)
+        inicio = time.monotonic()
+        # Sin respuesta (timeout / error de red) cuenta como sobrecarga
+        sobrecarga = True
+        status = None
+        cortado_por_deadline = False
+        omitido = None
+        try:
+            # Esperar turno en el token bucket compartido (evita ráfagas de 429).
+            # El carril masivo deja libre la reserva del interactivo.
+            await esperar(
+                self.rate_limiter.acquire(reserve=reserva_tokens(carril), flujo=flujo)
+            )
+            if antes_de_enviar is not None:
+                # Tras las esperas: lo que se chequea sigue vigente al enviar
+                # (el token del bucket ya tomado se pierde)
+                omitido = await antes_de_enviar()
+                if omitido is not None:
+                    return {"ref": ref_code, "status": 0, "omitido": omitido}
+            inicio = time.monotonic()
+            response = await self.client.post(
+                "/v1/bills/validate",
+                json=factura_json,
+                headers={"Idempotency-Key": idempotency_key},
+                timeout=httpx.Timeout(
+                    tiempo_restante(settings.FACTUS_TIMEOUT),
+                    connect=tiempo_restante(settings.FACTUS_CONNECT_TIMEOUT),
+                ),
+            )
+            status = response.status_code
+            sobrecarga = status == 429 or status >= 500
+            resultado = {
+                "ref": ref_code,
+                "status": response.status_code,
+                "response": self._cuerpo(response),
+            }
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                resultado["retry_after"] = retry_after
+            metrics.inc("factus_requests_total", status=response.status_code)
+            return resultado
+        except DeadlineExpirado:
+            cortado_por_deadline = True
+            return self._resultado_deadline(ref_code)
+        except Exception as e:
+            if isinstance(e, httpx.TimeoutException) and deadline_expirado():
+                # Timeout recortado por el deadline, no lentitud de Factus
+                cortado_por_deadline = True
+                return self._resultado_deadline(ref_code)
+            metrics.inc("factus_requests_total", status=0)
+            return {
+                "ref": ref_code,
+                "status": 0,
+                "error": str(e)
+            }
+        finally:
+            if cortado_por_deadline or omitido is not None:
+                self.concurrency.release(time.monotonic() - inicio, sobrecarga=False)
+            else:
+                self.concurrency.release(time.monotonic() - inicio, sobrecarga)
+                if status is None or status >= 500:
+                    self.circuit_breaker.registrar_fallo()
+                else:
+                    self.circuit_breaker.registrar_exito()
+
+    @staticmethod
+    def _cuerpo(response: httpx.Response):
+        """
+        JSON de la respuesta, o el texto si no lo es (páginas HTML de un
+        proxy en 502/503, 429 en texto plano): el status y el Retry-After
+        reales se conservan en lugar de convertirse en un fallo de red.
+        """
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    @staticmethod
+    def _resultado_deadline(ref_code: str) -> dict:
+        """Envío no completado porque venció el deadline del lote o la petición"""
+        metrics.inc("factus_deadline_expired_total")
+        return {
+            "ref": ref_code,
+            "status": 0,
+            "error": "Plazo vencido antes de obtener respuesta de Factus",
+            "deadline_expirado": True,
+        }
+
+    async def _circuito_disponible(self) -> bool:
+        """True si el circuito está cerrado (sondeando la salud si toca)"""
+        if self.circuit_breaker.cerrado:
+            return True
+        if self.circuit_breaker.intentar_sondeo():
+            await self.verificar_estado_api()
+        return self.circuit_breaker.cerrado
 
 factus_client = FactusService()
\ No newline at end of file
@@ -1,8 +1,11 @@
 """Base Service - Clase base para servicios de negocio"""
 
-from typing import Generic, TypeVar, Optional, List, Dict, Any
+from typing import Generic, TypeVar, Optional, List, Dict, Any, Awaitable, Callable, Sequence
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.repositories.base import BaseRepository
+from app.repositories.conteo import CONTEO_EXACTO
+from app.repositories.pagination import LIMITE_MAXIMO, CursorInvalido, Pagina
+from app.api.errors.http_errors import ValidationException
 
 T = TypeVar("T")
 R = TypeVar("R")
@@ -78,17 +81,18 @@ class BaseService(Generic[T, R]):
         """
         return await self.repository.get_all(skip=skip, limit=limit, **filters)
     
-    async def count(self, **filters) -> int:
+    async def count(self, modo: str = CONTEO_EXACTO, **filters) -> int:
         """
         Contar registros con filtros opcionales.
         
         Args:
+            modo: Estrategia de conteo (CONTEO_EXACTO, CONTEO_CACHE, CONTEO_ESTIMADO)
             **filters: Filtros dinámicos
             
         Returns:
             Cantidad de registros
         """
-        return await self.repository.count(**filters)
+        return await self.repository.count(modo, **filters)
     
     async def exists(self, id: int) -> bool:
         """
@@ -189,6 +193,45 @@ class BaseService(Generic[T, R]):
             'current_page': current_page
         }
     
+    async def get_page(
+        self,
+        limit: int = 100,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        columnas: Optional[Sequence[str]] = None,
+        **filters
+    ) -> Pagina[T]:
+        """
+        Obtener una página por keyset (cursores after/before).
+
+        Args:
+            columnas: Proyección (solo esas columnas; None = todas)
+
+        Raises:
+            ValidationException: límite fuera de rango o cursor inválido
+        """
+        return await self._paginar(
+            self.repository.get_page, limit, after, before,
+            columnas=columnas, **filters
+        )
+
+    @staticmethod
+    async def _paginar(
+        metodo: Callable[..., Awaitable[Pagina]],
+        limit: int,
+        after: Optional[str],
+        before: Optional[str],
+        *args,
+        **kwargs
+    ) -> Pagina:
+        """Ejecutar un método keyset del repositorio validando límite y cursores"""
+        if not 1 <= limit <= LIMITE_MAXIMO:
+            raise ValidationException([f"limit must be between 1 and {LIMITE_MAXIMO}"])
+        try:
+            return await metodo(*args, limit=limit, after=after, before=before, **kwargs)
+        except CursorInvalido as e:
+            raise ValidationException([str(e)])
+
     async def bulk_create(self, objects: List[T]) -> List[T]:
         """
         Crear múltiples registros en una transacción.
@@ -0,0 +1,112 @@
+"""Circuit Breaker - Corte rápido de envíos cuando Factus está caído"""
+
+import time
+from enum import Enum
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class EstadoCircuito(str, Enum):
+    """Estados del circuito"""
+    CERRADO = "CERRADO"            # Tráfico normal
+    ABIERTO = "ABIERTO"            # Factus caído: se falla rápido
+    SEMI_ABIERTO = "SEMI_ABIERTO"  # Sondeo de salud en curso
+
+
+_VALOR_METRICA = {
+    EstadoCircuito.CERRADO: 0,
+    EstadoCircuito.SEMI_ABIERTO: 1,
+    EstadoCircuito.ABIERTO: 2,
+}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker compartido por todas las corrutinas del proceso.
+
+    - CERRADO → ABIERTO: tras `failure_threshold` fallos consecutivos
+      (sin respuesta o 5xx).
+    - ABIERTO: los envíos no salen a la red; pasado `reset_timeout` una
+      sola corrutina obtiene el sondeo (intentar_sondeo) y pasa a SEMI_ABIERTO.
+    - SEMI_ABIERTO → CERRADO si el sondeo de salud responde bien,
+      → ABIERTO si falla.
+
+    No usa locks: todas las transiciones ocurren sin await intermedio,
+    así que son atómicas dentro del event loop.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+
+        self.estado = EstadoCircuito.CERRADO
+        self._fallos_consecutivos = 0
+        self._abierto_desde = 0.0
+        self._sondeo_desde = 0.0
+        self._publicar_metrica()
+
+    @property
+    def cerrado(self) -> bool:
+        return self.estado == EstadoCircuito.CERRADO
+
+    @property
+    def tiempo_restante(self) -> float:
+        """Segundos hasta que se permita el próximo sondeo"""
+        if self.estado == EstadoCircuito.CERRADO:
+            return 0.0
+        desde = self._sondeo_desde if self.estado == EstadoCircuito.SEMI_ABIERTO else self._abierto_desde
+        return max(0.0, desde + self.reset_timeout - time.monotonic())
+
+    def intentar_sondeo(self) -> bool:
+        """
+        Reservar el sondeo de salud para el llamador.
+
+        True solo para una corrutina por ventana de reset_timeout. Un sondeo
+        que no termina (ej: la tarea Celery murió) se libera al expirar.
+        """
+        if self.estado == EstadoCircuito.CERRADO or self.tiempo_restante > 0:
+            return False
+        self.estado = EstadoCircuito.SEMI_ABIERTO
+        self._sondeo_desde = time.monotonic()
+        self._publicar_metrica()
+        return True
+
+    def registrar_exito(self) -> None:
+        self._fallos_consecutivos = 0
+        if self.estado != EstadoCircuito.CERRADO:
+            print(f"🟢 Circuito '{self.name}' cerrado: Factus responde de nuevo")
+            self.estado = EstadoCircuito.CERRADO
+            self._publicar_metrica()
+
+    def registrar_fallo(self) -> None:
+        self._fallos_consecutivos += 1
+        if self.estado == EstadoCircuito.SEMI_ABIERTO or (
+            self.estado == EstadoCircuito.CERRADO
+            and self._fallos_consecutivos >= self.failure_threshold
+        ):
+            self._abrir()
+
+    def _abrir(self) -> None:
+        if self.estado != EstadoCircuito.ABIERTO:
+            print(
+                f"🔴 Circuito '{self.name}' abierto tras {self._fallos_consecutivos} "
+                f"fallos; próximo sondeo en {self.reset_timeout}s"
+            )
+            metrics.inc("factus_circuit_opened_total", breaker=self.name)
+        self.estado = EstadoCircuito.ABIERTO
+        self._abierto_desde = time.monotonic()
+        self._publicar_metrica()
+
+    def _publicar_metrica(self) -> None:
+        metrics.set_gauge(
+            "factus_circuit_state", _VALOR_METRICA[self.estado], breaker=self.name
+        )
+
+
+factus_circuit_breaker = CircuitBreaker(
+    name="factus",
+    failure_threshold=settings.FACTUS_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.FACTUS_CIRCUIT_RESET_TIMEOUT,
+)
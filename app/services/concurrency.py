@@ -0,0 +1,135 @@
+"""Concurrency - Control adaptativo (AIMD) de peticiones en vuelo hacia Factus"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.send_scheduler import FLUJO_ANONIMO, Carril, Flujo, SendScheduler
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limita las peticiones simultáneas con una ventana AIMD.
+
+    - Aumento aditivo: cada respuesta sana (sin error y con latencia bajo
+      el objetivo) suma 1/ventana, es decir +1 por ventana completa.
+    - Disminución multiplicativa: timeouts, 429 y 5xx multiplican la
+      ventana por `backoff`, como máximo una vez por `latency_target`
+      para que una ráfaga de errores no la colapse al mínimo.
+
+    La ventana aprendida se conserva entre tareas Celery del mismo worker;
+    la cola de espera se reinicia si cambia el event loop. Cuando la ventana
+    está llena, el SendScheduler decide qué envío en espera entra primero
+    (carril interactivo antes que masivo; el masivo, repartido por flujo).
+
+    Uso:
+        await limiter.acquire(Carril.MASIVO, flujo)
+        try:
+            ...
+        finally:
+            limiter.release(latencia, sobrecarga=False)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff: float = 0.5,
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.latency_target = latency_target
+        self.backoff = backoff
+
+        self._in_flight = 0
+        self._waiters = SendScheduler(name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_decrease = 0.0
+        self._publicar_metricas()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _check_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Nuevo event loop (nueva tarea Celery): los waiters anteriores
+            # pertenecen a un loop cerrado
+            self._loop = loop
+            self._waiters.clear()
+            self._in_flight = 0
+
+    async def acquire(
+        self,
+        carril: Carril = Carril.MASIVO,
+        flujo: Flujo = FLUJO_ANONIMO,
+    ) -> None:
+        """Esperar un hueco dentro de la ventana actual"""
+        self._check_loop()
+
+        if not self._waiters and self._in_flight < int(self.limit):
+            self._in_flight += 1
+            self._publicar_metricas()
+            return
+
+        fut = self._loop.create_future()
+        self._waiters.push(fut, carril, flujo)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Se nos concedió el hueco justo al cancelar: devolverlo
+                self._in_flight -= 1
+                self._wake()
+            raise
+
+    def release(self, latency: float, sobrecarga: bool) -> None:
+        """
+        Liberar el hueco y ajustar la ventana según el resultado.
+
+        Args:
+            latency: Duración de la petición en segundos
+            sobrecarga: True si hubo timeout, 429 o 5xx
+        """
+        self._in_flight = max(0, self._in_flight - 1)
+
+        if sobrecarga:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif latency <= self.latency_target:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        self._wake()
+        self._publicar_metricas()
+
+    def _wake(self) -> None:
+        while self._in_flight < int(self.limit):
+            fut = self._waiters.pop()
+            if fut is None:
+                return
+            self._in_flight += 1
+            fut.set_result(None)
+
+    def _publicar_metricas(self) -> None:
+        metrics.set_gauge("factus_concurrency_limit", self.limit, limiter=self.name)
+        metrics.set_gauge("factus_concurrency_in_flight", self._in_flight, limiter=self.name)
+
+
+factus_concurrency = AdaptiveConcurrencyLimiter(
+    name="factus",
+    initial=settings.FACTUS_CONCURRENCY_INITIAL,
+    min_limit=settings.FACTUS_CONCURRENCY_MIN,
+    max_limit=settings.FACTUS_CONCURRENCY_MAX,
+    latency_target=settings.FACTUS_LATENCY_TARGET,
+    backoff=settings.FACTUS_CONCURRENCY_BACKOFF,
+)
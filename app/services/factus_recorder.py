@@ -0,0 +1,168 @@
+"""Factus Recorder - Grabación y reproducción de tráfico HTTP con Factus"""
+
+import asyncio
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+
+# Headers de respuesta que se conservan en la grabación
+_HEADERS_GRABADOS = ("content-type", "retry-after")
+
+# aread() ya entrega el cuerpo decodificado: estos headers no aplican a la copia
+_HEADERS_DE_TRANSPORTE = ("content-encoding", "content-length", "transfer-encoding")
+
+MODOS = ("off", "record", "replay")
+
+
+def _clave(request: httpx.Request) -> Tuple[str, str, Optional[str]]:
+    """Clave de emparejamiento: método, ruta e Idempotency-Key (estable por factura)"""
+    return request.method, request.url.path, request.headers.get("Idempotency-Key")
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte que delega en el real y graba cada par petición/respuesta.
+
+    Formato: JSON Lines comprimido con gzip, un registro por petición:
+        {"m", "p", "k", "req", "s", "h", "b", "t"}
+    (método, ruta, idempotency key, cuerpo enviado, status, headers,
+    cuerpo recibido, latencia en ms).
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, path: Path):
+        self.inner = inner
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Modo append: cada cliente agrega un miembro gzip al mismo archivo
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        inicio = time.monotonic()
+        response = await self.inner.handle_async_request(request)
+        contenido = await response.aread()
+        elapsed_ms = (time.monotonic() - inicio) * 1000
+
+        metodo, ruta, key = _clave(request)
+        registro = {
+            "m": metodo,
+            "p": ruta,
+            "k": key,
+            "req": request.content.decode("utf-8", errors="replace"),
+            "s": response.status_code,
+            "h": {h: response.headers[h] for h in _HEADERS_GRABADOS if h in response.headers},
+            "b": contenido.decode("utf-8", errors="replace"),
+            "t": round(elapsed_ms, 3),
+        }
+        self._file.write(json.dumps(registro, separators=(",", ":")) + "\n")
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=[
+                (k, v) for k, v in response.headers.items()
+                if k.lower() not in _HEADERS_DE_TRANSPORTE
+            ],
+            content=contenido,
+            request=request,
+            extensions={"http_version": response.extensions.get("http_version", b"HTTP/1.1")},
+        )
+
+    async def aclose(self) -> None:
+        self._file.close()
+        await self.inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte que sirve respuestas grabadas sin tocar la red.
+
+    Empareja por (método, ruta, Idempotency-Key); si la factura no fue
+    grabada, recorre en ciclo las respuestas de la misma ruta. La latencia
+    original se reproduce multiplicada por `latency_scale` (0 = sin espera).
+    """
+
+    # Grabaciones cargadas por archivo (compartidas entre clientes del proceso)
+    _cache: Dict[Path, Tuple[Dict[tuple, List[dict]], Dict[tuple, List[dict]]]] = {}
+
+    def __init__(self, path: Path, latency_scale: float = 1.0):
+        self.path = path
+        self.latency_scale = latency_scale
+        self._por_clave, self._por_ruta = self._cargar(path)
+        self._cursores: Dict[tuple, int] = defaultdict(int)
+
+    @classmethod
+    def _cargar(cls, path: Path):
+        if path not in cls._cache:
+            por_clave: Dict[tuple, List[dict]] = defaultdict(list)
+            por_ruta: Dict[tuple, List[dict]] = defaultdict(list)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for linea in f:
+                    if not linea.strip():
+                        continue
+                    r = json.loads(linea)
+                    por_clave[(r["m"], r["p"], r.get("k"))].append(r)
+                    por_ruta[(r["m"], r["p"])].append(r)
+            print(f"📼 Replay Factus: {sum(map(len, por_ruta.values()))} respuestas desde {path}")
+            cls._cache[path] = (dict(por_clave), dict(por_ruta))
+        return cls._cache[path]
+
+    def _siguiente(self, grupo: tuple, registros: List[dict]) -> dict:
+        indice = self._cursores[grupo] % len(registros)
+        self._cursores[grupo] += 1
+        return registros[indice]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        metodo, ruta, key = _clave(request)
+
+        if (metodo, ruta, key) in self._por_clave:
+            grupo = (metodo, ruta, key)
+            registro = self._siguiente(grupo, self._por_clave[grupo])
+        elif (metodo, ruta) in self._por_ruta:
+            grupo = (metodo, ruta)
+            registro = self._siguiente(grupo, self._por_ruta[grupo])
+        else:
+            return httpx.Response(
+                status_code=404,
+                json={"message": f"Sin grabación para {metodo} {ruta}"},
+                request=request,
+            )
+
+        if self.latency_scale > 0:
+            await asyncio.sleep(registro["t"] / 1000 * self.latency_scale)
+
+        return httpx.Response(
+            status_code=registro["s"],
+            headers=registro.get("h", {}),
+            content=registro["b"].encode("utf-8"),
+            request=request,
+        )
+
+
+def crear_transporte(inner: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """
+    Envolver el transporte real según FACTUS_RECORD_MODE.
+
+    - off: transporte real sin cambios
+    - record: real + grabación en FACTUS_RECORD_FILE
+    - replay: respuestas de FACTUS_RECORD_FILE (el transporte real no se usa)
+    """
+    modo = settings.FACTUS_RECORD_MODE.lower()
+    path = Path(settings.FACTUS_RECORD_FILE)
+
+    if modo == "record":
+        return RecordingTransport(inner, path)
+    if modo == "replay":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"FACTUS_RECORD_MODE=replay pero no existe {path}")
+        return ReplayTransport(path, settings.FACTUS_REPLAY_LATENCY_SCALE)
+    if modo != "off":
+        raise ValueError(f"FACTUS_RECORD_MODE inválido: {modo}. Usa {', '.join(MODOS)}")
+    return inner
@@ -1,10 +1,13 @@
 """Invoice Service - Lógica de negocio para facturas"""
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Sequence
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models import Factura, Lote
 from app.repositories.factura_repository import FacturaRepository
+from app.repositories.lote_repository import LoteRepository
+from app.repositories.conteo import CONTEO_ESTIMADO
+from app.repositories.pagination import Pagina
 from app.services.base_service import BaseService
 from app.schemas.invoice import InvoiceCreate, InvoiceResponse, InvoiceListResponse
 from app.api.errors.http_errors import (
@@ -54,10 +57,11 @@ class InvoiceService(BaseService[Factura, InvoiceResponse]):
         Obtener facturas de un cliente por email.
         
         Returns:
-            InvoiceListResponse con paginación
+            InvoiceListResponse con paginación (página y total en una consulta)
         """
-        facturas = await self.repo.get_by_cliente_email(email, skip, limit)
-        total = await self.repo.count(cliente_email=email)
+        facturas, total = await self.repo.get_all_con_total(
+            skip, limit, cliente_email=email
+        )
         
         items = [InvoiceResponse.from_orm(f) for f in facturas]
         return InvoiceListResponse(
@@ -67,6 +71,28 @@ class InvoiceService(BaseService[Factura, InvoiceResponse]):
             limit=limit
         )
     
+    async def paginar_facturas_cliente(
+        self,
+        email: str,
+        limit: int = 50,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        columnas: Optional[Sequence[str]] = None
+    ) -> Pagina[Factura]:
+        """
+        Facturas de un cliente por keyset (cursores after/before).
+
+        Args:
+            columnas: Proyección (solo esas columnas; None = todas)
+
+        Raises:
+            ValidationException: límite fuera de rango o cursor inválido
+        """
+        return await self._paginar(
+            self.repo.get_page_by_cliente_email, limit, after, before, email,
+            columnas=columnas
+        )
+    
     async def obtener_facturas_lote(
         self,
         lote_id: int,
@@ -86,8 +112,10 @@ class InvoiceService(BaseService[Factura, InvoiceResponse]):
         Returns:
             InvoiceListResponse con facturas del lote
         """
-        facturas = await self.repo.get_by_lote(lote_id, estado, skip, limit)
-        total = await self.repo.count(lote_id=lote_id, **{"estado": estado} if estado else {})
+        filters = {"estado": estado} if estado else {}
+        facturas, total = await self.repo.get_all_con_total(
+            skip, limit, lote_id=lote_id, **filters
+        )
         
         items = [InvoiceResponse.from_orm(f) for f in facturas]
         return InvoiceListResponse(
@@ -101,18 +129,24 @@ class InvoiceService(BaseService[Factura, InvoiceResponse]):
         """
         Obtener estadísticas de un lote.
         
+        Lee los contadores del lote (LoteRepository.get_estadisticas).
+        
         Returns:
             {
-                'total': int,
+                'total_facturas': int,
                 'enviadas': int,
                 'rechazadas': int,
+                'error_api': int,
                 'pendientes': int,
+                'canceladas': int,
                 'total_monto': float,
-                'promedio_monto': float
+                'monto_exitoso': float,
+                'promedio_monto': float,
+                'tasa_exito': float (%)
             }
         """
-        stats = await self.repo.get_estadisticas_lote(lote_id)
-        if not stats:
+        stats = await LoteRepository(self.session).get_estadisticas(lote_id)
+        if stats is None:
             raise NotFoundException("Lote", lote_id)
         return stats
     
@@ -131,11 +165,12 @@ class InvoiceService(BaseService[Factura, InvoiceResponse]):
             limit: Límite
             
         Returns:
-            InvoiceListResponse con facturas
+            InvoiceListResponse con facturas. El total es la estimación del
+            planner: contar exacto toda la tabla cuesta más que la página.
         """
         filters = {"estado": estado} if estado else {}
         facturas = await self.repo.get_all(skip=skip, limit=limit, **filters)
-        total = await self.repo.count(**filters)
+        total = await self.repo.count(CONTEO_ESTIMADO, **filters)
         
         items = [InvoiceResponse.from_orm(f) for f in facturas]
         return InvoiceListResponse(
@@ -5,11 +5,28 @@ from datetime import datetime
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models import Lote, Factura
+from app.models.lote import ESTADOS_FINALES
 from app.repositories import LoteRepository
 from app.repositories.factura_repository import FacturaRepository
+from app.repositories.outbox_repository import OutboxRepository
+from app.repositories.dead_letter_repository import DeadLetterRepository
+from app.repositories.conteo import CONTEO_CACHE
+from app.repositories.pagination import Pagina
 from app.services.base_service import BaseService
-from app.schemas.lote import LoteCreate, LoteResponse, LoteDetailResponse
-from app.api.errors.http_errors import NotFoundException, ValidationException
+from app.services.progress import evento_progreso, lote_progress
+from app.core.config import settings
+from app.schemas.lote import (
+    LoteCreate,
+    LoteResponse,
+    LoteDetailResponse,
+    LoteReenvioResponse,
+    LoteProgresoResponse,
+)
+from app.api.errors.http_errors import (
+    NotFoundException,
+    ValidationException,
+    ConflictException,
+)
 
 
 class LoteService(BaseService[Lote, LoteResponse]):
@@ -64,6 +81,36 @@ class LoteService(BaseService[Lote, LoteResponse]):
             ]
         )
     
+    async def obtener_progreso_lote(self, lote_id: int) -> LoteProgresoResponse:
+        """
+        Avance actual de un lote: snapshot en Redis + fila del lote (por PK).
+
+        Sin snapshot (Redis caído o lote antiguo) se arma con las columnas
+        y los contadores del lote. Si el lote ya terminó, manda el estado de la BD.
+
+        Raises:
+            NotFoundException: Si no existe el lote
+        """
+        lote = await self.lote_repo.get(lote_id)
+        if not lote:
+            raise NotFoundException("Lote", lote_id)
+
+        snapshot = await lote_progress.leer(lote_id)
+        if snapshot is None:
+            return LoteProgresoResponse(
+                lote_id=lote_id,
+                estado=lote.estado,
+                total=lote.total_registros,
+                procesados=lote.registros_procesados,
+                enviadas=lote.enviadas,
+                rechazadas=lote.rechazadas,
+                errores=lote.error_api,
+            )
+        progreso = LoteProgresoResponse(**evento_progreso(lote_id, snapshot))
+        if lote.estado in ESTADOS_FINALES or progreso.estado is None:
+            progreso.estado = lote.estado
+        return progreso
+
     async def obtener_lotes_pendientes(
         self,
         skip: int = 0,
@@ -122,7 +169,7 @@ class LoteService(BaseService[Lote, LoteResponse]):
         """
         filters = {"estado": estado} if estado else {}
         lotes = await self.lote_repo.get_all(skip=skip, limit=limit, **filters)
-        total = await self.lote_repo.count(**filters)
+        total = await self.lote_repo.count(CONTEO_CACHE, **filters)
         
         return {
             "items": [LoteResponse.from_orm(lote) for lote in lotes],
@@ -131,6 +178,23 @@ class LoteService(BaseService[Lote, LoteResponse]):
             "limit": limit
         }
     
+    async def paginar_lotes(
+        self,
+        estado: Optional[str] = None,
+        limit: int = 100,
+        after: Optional[str] = None,
+        before: Optional[str] = None
+    ) -> Pagina[Lote]:
+        """
+        Lotes por keyset (id DESC), con filtro opcional de estado.
+
+        Raises:
+            ValidationException: límite fuera de rango o cursor inválido
+        """
+        return await self._paginar(
+            self.lote_repo.get_page_by_estado, limit, after, before, estado
+        )
+
     async def obtener_historial_lotes(
         self,
         skip: int = 0,
@@ -143,7 +207,7 @@ class LoteService(BaseService[Lote, LoteResponse]):
             Lotes ordenados por fecha de carga descendente
         """
         lotes = await self.lote_repo.get_all(skip=skip, limit=limit)
-        total = await self.lote_repo.count()
+        total = await self.lote_repo.count(CONTEO_CACHE)
         
         # Ordenar por fecha descendente
         lotes_sorted = sorted(
@@ -219,6 +283,139 @@ class LoteService(BaseService[Lote, LoteResponse]):
         updated = await self.lote_repo.update(lote)
         return LoteResponse.from_orm(updated)
     
+    async def cancelar_lote(self, lote_id: int) -> LoteResponse:
+        """
+        Cancelar un lote en curso.
+
+        Los envíos que aún no salieron pasan a CANCELADA en la misma
+        transacción; los batches ya en vuelo terminan y registran su
+        resultado. La ingesta se detiene en el siguiente chunk.
+
+        Raises:
+            NotFoundException: Si no existe el lote
+            ConflictException: Si el lote ya terminó o ya estaba cancelado
+        """
+        lote = await self.lote_repo.get(lote_id)
+        if not lote:
+            raise NotFoundException("Lote", lote_id)
+
+        cancelado = await self.lote_repo.cambiar_estado(
+            lote_id, ("PENDIENTE", "PROCESANDO", "PAUSADO", "ERROR"), "CANCELADO"
+        )
+        if not cancelado:
+            await self.session.rollback()
+            raise ConflictException(f"Lote {lote_id} cannot be cancelled ({lote.estado})")
+
+        await OutboxRepository(self.session).cancelar_pendientes_lote(lote_id)
+        await self.session.commit()
+        await lote_progress.publicar(lote_id, estado="CANCELADO")
+
+        await self.session.refresh(lote)
+        return LoteResponse.from_orm(lote)
+
+    async def pausar_lote(self, lote_id: int) -> LoteResponse:
+        """
+        Pausar los envíos de un lote.
+
+        Los dispatchers dejan de reclamar sus facturas desde el siguiente
+        batch; la ingesta del archivo continúa.
+
+        Raises:
+            NotFoundException: Si no existe el lote
+            ConflictException: Si el lote no está pendiente ni procesando
+        """
+        lote = await self.lote_repo.get(lote_id)
+        if not lote:
+            raise NotFoundException("Lote", lote_id)
+
+        if not await self.lote_repo.cambiar_estado(
+            lote_id, ("PENDIENTE", "PROCESANDO"), "PAUSADO"
+        ):
+            await self.session.rollback()
+            raise ConflictException(f"Lote {lote_id} cannot be paused ({lote.estado})")
+        await self.session.commit()
+        await lote_progress.publicar(lote_id, estado="PAUSADO")
+
+        await self.session.refresh(lote)
+        return LoteResponse.from_orm(lote)
+
+    async def reanudar_lote(self, lote_id: int) -> LoteResponse:
+        """
+        Reanudar los envíos de un lote pausado.
+
+        Raises:
+            NotFoundException: Si no existe el lote
+            ConflictException: Si el lote no está pausado
+        """
+        lote = await self.lote_repo.get(lote_id)
+        if not lote:
+            raise NotFoundException("Lote", lote_id)
+
+        if not await self.lote_repo.cambiar_estado(lote_id, ("PAUSADO",), "PROCESANDO"):
+            await self.session.rollback()
+            raise ConflictException(f"Lote {lote_id} is not paused ({lote.estado})")
+        await self.session.commit()
+        await lote_progress.publicar(lote_id, estado="PROCESANDO")
+
+        # Si la ingesta sigue en curso, su tarea despacha al terminar
+        await self.session.refresh(lote)
+        if lote.ingesta_completa:
+            self._lanzar_dispatchers(lote_id)
+        return LoteResponse.from_orm(lote)
+
+    def _lanzar_dispatchers(self, lote_id: int) -> None:
+        """Encolar FACTUS_OUTBOX_DISPATCHERS dispatchers para el lote"""
+        from app.services.tasks import despachar_outbox_task
+
+        for _ in range(settings.FACTUS_OUTBOX_DISPATCHERS):
+            despachar_outbox_task.delay(lote_id)
+
+    async def reenviar_facturas_fallidas(self, lote_id: int) -> LoteReenvioResponse:
+        """
+        Reenviar solo las facturas ERROR_API de un lote.
+
+        Las facturas vuelven al outbox en una transacción (factura, outbox,
+        dead-letter y contador del lote) y salen por los dispatchers, es
+        decir por el cliente con pool, rate limit y reparto justo. El lote
+        vuelve a PROCESANDO y se cierra solo al drenar.
+
+        Raises:
+            NotFoundException: Si no existe el lote
+            ConflictException: Si el lote está cancelado o expirado, o aún
+                no terminó de ingerir el archivo
+        """
+        lote = await self.lote_repo.get(lote_id)
+        if not lote:
+            raise NotFoundException("Lote", lote_id)
+        if lote.estado in ("CANCELADO", "EXPIRADO"):
+            raise ConflictException(f"Lote {lote_id} is closed ({lote.estado})")
+        if not lote.ingesta_completa:
+            raise ConflictException(
+                f"Lote {lote_id} is still being ingested ({lote.estado})"
+            )
+
+        outbox_repo = OutboxRepository(self.session)
+        factura_ids = await outbox_repo.get_factura_ids_fallidas(lote_id)
+        por_lote = await outbox_repo.reencolar(factura_ids)
+        await DeadLetterRepository(self.session).marcar_reencoladas(factura_ids)
+        await self.session.commit()
+
+        reenviadas = por_lote.get(lote_id, 0)
+        if reenviadas:
+            self._lanzar_dispatchers(lote_id)
+
+        await self.session.refresh(lote)
+        # Las reenviadas vuelven a contar como pendientes en el progreso
+        await lote_progress.publicar(
+            lote_id, estado=lote.estado, procesados=-reenviadas, errores=-reenviadas
+        )
+        return LoteReenvioResponse(
+            lote_id=lote_id,
+            reenviadas=reenviadas,
+            estado=lote.estado,
+            registros_procesados=lote.registros_procesados,
+        )
+
     async def obtener_estadisticas_lote(
         self,
         lote_id: int
@@ -226,6 +423,9 @@ class LoteService(BaseService[Lote, LoteResponse]):
         """
         Obtener estadísticas completas de un lote.
         
+        Lectura por PK de los contadores del lote (ver
+        LoteRepository.get_estadisticas): no agrega las facturas.
+        
         Args:
             lote_id: ID del lote
             
@@ -234,38 +434,16 @@ class LoteService(BaseService[Lote, LoteResponse]):
                 'total_facturas': int,
                 'enviadas': int,
                 'rechazadas': int,
+                'error_api': int,
                 'pendientes': int,
+                'canceladas': int,
                 'total_monto': float,
+                'monto_exitoso': float,
                 'promedio_monto': float,
                 'tasa_exito': float (%)
             }
         """
-        lote = await self.lote_repo.get(lote_id)
-        if not lote:
+        stats = await self.lote_repo.get_estadisticas(lote_id)
+        if stats is None:
             raise NotFoundException("Lote", lote_id)
-        
-        stats = await self.factura_repo.get_estadisticas_lote(lote_id)
-        
-        if not stats:
-            return {
-                "total_facturas": 0,
-                "enviadas": 0,
-                "rechazadas": 0,
-                "pendientes": 0,
-                "total_monto": 0.0,
-                "promedio_monto": 0.0,
-                "tasa_exito": 0.0
-            }
-        
-        total = stats.get("total", 0)
-        tasa_exito = (stats.get("enviadas", 0) / total * 100) if total > 0 else 0.0
-        
-        return {
-            "total_facturas": total,
-            "enviadas": stats.get("enviadas", 0),
-            "rechazadas": stats.get("rechazadas", 0),
-            "pendientes": stats.get("pendientes", 0),
-            "total_monto": stats.get("total_monto", 0.0),
-            "promedio_monto": stats.get("promedio_monto", 0.0),
-            "tasa_exito": round(tasa_exito, 2)
-        }
+        return stats
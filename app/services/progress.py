@@ -0,0 +1,382 @@
+"""Progress - Avance de los lotes publicado en Redis (pub/sub + snapshot)"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.lote import ESTADOS_FINALES
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover - redis es opcional
+    aioredis = None
+    RedisError = OSError
+
+
+# Script atómico: aplicar cambios al snapshot del lote y publicarlo.
+# Al hacerse en un solo paso, los eventos salen en el mismo orden en que se
+# aplicaron (varios dispatchers publican sobre el mismo lote) y cada evento
+# lleva el snapshot completo: el suscriptor solo necesita el último.
+#
+# KEYS[1] = hash del snapshot
+# ARGV[1] = canal, ARGV[2] = TTL (s), ARGV[3] = campos a fijar (JSON),
+# ARGV[4] = contadores a incrementar (JSON)
+_PUBLISH_SCRIPT = """
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('HSETNX', KEYS[1], 'inicio_ms', ahora)
+redis.call('HSET', KEYS[1], 'actualizado_ms', ahora)
+
+for campo, valor in pairs(cjson.decode(ARGV[3])) do
+    redis.call('HSET', KEYS[1], campo, valor)
+end
+for campo, delta in pairs(cjson.decode(ARGV[4])) do
+    redis.call('HINCRBY', KEYS[1], campo, delta)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+
+local h = redis.call('HGETALL', KEYS[1])
+local snapshot = {}
+for i = 1, #h, 2 do
+    snapshot[h[i]] = tonumber(h[i + 1]) or h[i + 1]
+end
+local mensaje = cjson.encode(snapshot)
+redis.call('PUBLISH', ARGV[1], mensaje)
+return mensaje
+"""
+
+# Contadores del snapshot (el resto de campos son estado/total/tiempos)
+CONTADORES = ("ingeridas", "procesados", "enviadas", "rechazadas", "errores")
+
+
+def evento_progreso(lote_id: int, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evento para el cliente a partir del snapshot guardado en Redis.
+
+    El throughput se calcula aquí (facturas con respuesta de Factus por
+    segundo desde el primer evento del lote).
+    """
+    evento: Dict[str, Any] = {
+        "lote_id": lote_id,
+        "estado": snapshot.get("estado"),
+        "total": int(snapshot.get("total") or 0),
+    }
+    for campo in CONTADORES:
+        evento[campo] = int(snapshot.get(campo) or 0)
+
+    inicio = snapshot.get("inicio_ms")
+    actualizado = snapshot.get("actualizado_ms")
+    throughput = 0.0
+    if inicio and actualizado and actualizado > inicio:
+        respondidas = evento["enviadas"] + evento["errores"]
+        throughput = round(respondidas / ((actualizado - inicio) / 1000), 2)
+    evento["facturas_por_segundo"] = throughput
+    return evento
+
+
+class LoteProgress:
+    """
+    Progreso de los lotes en Redis.
+
+    - Hash `{prefix}:{lote_id}`: último snapshot (contadores, estado, total)
+    - Canal `{prefix}:{lote_id}`: cada cambio publica el snapshot completo
+
+    Lo escriben la tarea del lote (por chunk) y los dispatchers (por batch);
+    lo leen el SSE y la subscription GraphQL (vía LoteProgressHub) sin
+    tocar la BD. Publicar nunca falla: sin Redis el progreso simplemente no
+    se publica y los clientes recurren al estado del lote en BD.
+
+    Uso:
+        await lote_progress.publicar(lote.id, estado="PROCESANDO", total=1000)
+        await lote_progress.publicar(lote.id, procesados=100, enviadas=98, errores=2)
+    """
+
+    REDIS_RETRY_SECONDS = 30.0
+
+    def __init__(self, prefix: str, redis_url: Optional[str], ttl: int):
+        self.prefix = prefix
+        self.redis_url = redis_url
+        self.ttl = ttl
+
+        self._redis = None
+        self._redis_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._script = None
+        self._redis_down_until = 0.0
+
+    def clave(self, lote_id: int) -> str:
+        """Clave del hash y nombre del canal del lote"""
+        return f"{self.prefix}:{lote_id}"
+
+    def _get_redis(self):
+        """Cliente Redis del event loop actual (cada tarea Celery tiene el suyo)"""
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            self._redis = aioredis.from_url(self.redis_url)
+            self._redis_loop = loop
+            self._script = self._redis.register_script(_PUBLISH_SCRIPT)
+        return self._redis
+
+    def redis_disponible(self) -> bool:
+        return (
+            aioredis is not None
+            and bool(self.redis_url)
+            and time.monotonic() >= self._redis_down_until
+        )
+
+    def _marcar_caido(self, e: Exception) -> None:
+        print(f"⚠️  Progreso de lotes sin Redis ({e})")
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+
+    async def publicar(
+        self,
+        lote_id: int,
+        estado: Optional[str] = None,
+        total: Optional[int] = None,
+        **incrementos: int,
+    ) -> None:
+        """
+        Aplicar cambios al snapshot del lote y publicarlo.
+
+        Args:
+            lote_id: ID del lote
+            estado: Nuevo estado del lote (None = sin cambio)
+            total: Total de facturas del archivo (None = sin cambio)
+            **incrementos: Deltas de CONTADORES (ej: enviadas=98, errores=2)
+        """
+        if not self.redis_disponible():
+            return
+        fijar = {}
+        if estado is not None:
+            fijar["estado"] = estado
+        if total is not None:
+            fijar["total"] = total
+        deltas = {campo: n for campo, n in incrementos.items() if n}
+        if not fijar and not deltas:
+            return
+
+        try:
+            self._get_redis()
+            await self._script(
+                keys=[self.clave(lote_id)],
+                args=[
+                    self.clave(lote_id),
+                    self.ttl,
+                    json.dumps(fijar),
+                    json.dumps(deltas),
+                ],
+            )
+            metrics.inc("lote_progress_published_total")
+        except (RedisError, OSError) as e:
+            self._marcar_caido(e)
+
+    async def leer(self, lote_id: int) -> Optional[Dict[str, Any]]:
+        """Último snapshot del lote (None si no hay o Redis no responde)"""
+        if not self.redis_disponible():
+            return None
+        try:
+            datos = await self._get_redis().hgetall(self.clave(lote_id))
+        except (RedisError, OSError) as e:
+            self._marcar_caido(e)
+            return None
+        if not datos:
+            return None
+        snapshot: Dict[str, Any] = {}
+        for campo, valor in datos.items():
+            valor = valor.decode()
+            snapshot[campo.decode()] = int(valor) if valor.lstrip("-").isdigit() else valor
+        return snapshot
+
+    def pubsub(self):
+        """Nueva conexión PubSub en el cliente del event loop actual"""
+        return self._get_redis().pubsub(ignore_subscribe_messages=True)
+
+    async def aclose(self):
+        """Cerrar la conexión Redis del event loop actual"""
+        client, loop = self._redis, self._redis_loop
+        self._redis = None
+        self._redis_loop = None
+        self._script = None
+
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+
+class LoteProgressHub:
+    """
+    Reparto (fan-out) del progreso entre los suscriptores de un proceso.
+
+    Una sola conexión PubSub por proceso de la API, suscrita solo a los
+    canales de lotes con al menos un suscriptor local. Una tarea lectora
+    reparte cada mensaje a las colas en memoria de sus suscriptores (SSE o
+    subscriptions GraphQL): ni una conexión Redis ni una consulta a la BD
+    por suscriptor.
+
+    Cada mensaje es el snapshot completo, así que un suscriptor lento no
+    frena a los demás: si su cola se llena se descarta el evento más viejo.
+    """
+
+    def __init__(self, progress: LoteProgress, buffer: int = 8):
+        self.progress = progress
+        self.buffer = buffer
+
+        self._suscriptores: Dict[int, Set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._lector: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _check_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._suscriptores.clear()
+            self._pubsub = None
+            self._lector = None
+
+    def _publicar_metricas(self) -> None:
+        metrics.set_gauge("lote_progress_channels", len(self._suscriptores))
+        metrics.set_gauge(
+            "lote_progress_subscribers",
+            sum(len(colas) for colas in self._suscriptores.values()),
+        )
+
+    @asynccontextmanager
+    async def escuchar(self, lote_id: int) -> AsyncIterator[asyncio.Queue]:
+        """
+        Cola con los snapshots publicados del lote (None = Redis se cayó).
+
+        Raises:
+            RedisError / OSError: si Redis no responde al suscribirse
+        """
+        self._check_loop()
+        cola: asyncio.Queue = asyncio.Queue(maxsize=self.buffer)
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.progress.pubsub()
+            if lote_id not in self._suscriptores:
+                await self._pubsub.subscribe(self.progress.clave(lote_id))
+                self._suscriptores[lote_id] = set()
+            self._suscriptores[lote_id].add(cola)
+            if self._lector is None or self._lector.done():
+                self._lector = asyncio.create_task(self._leer())
+            self._publicar_metricas()
+        try:
+            yield cola
+        finally:
+            await self._quitar(lote_id, cola)
+
+    async def _quitar(self, lote_id: int, cola: asyncio.Queue) -> None:
+        async with self._lock:
+            colas = self._suscriptores.get(lote_id)
+            if colas is None:
+                return
+            colas.discard(cola)
+            if colas:
+                self._publicar_metricas()
+                return
+            del self._suscriptores[lote_id]
+            try:
+                if self._suscriptores:
+                    await self._pubsub.unsubscribe(self.progress.clave(lote_id))
+                else:
+                    # Sin suscriptores: cerrar la conexión hasta el próximo
+                    await self._cerrar()
+            except (RedisError, OSError) as e:
+                self.progress._marcar_caido(e)
+            self._publicar_metricas()
+
+    async def _cerrar(self) -> None:
+        lector, pubsub = self._lector, self._pubsub
+        self._lector = None
+        self._pubsub = None
+        if lector is not None and lector is not asyncio.current_task():
+            lector.cancel()
+        if pubsub is not None:
+            await pubsub.aclose()
+
+    @staticmethod
+    def _entregar(cola: asyncio.Queue, snapshot: Optional[Dict[str, Any]]) -> None:
+        if cola.full():
+            cola.get_nowait()
+            metrics.inc("lote_progress_dropped_total")
+        cola.put_nowait(snapshot)
+
+    async def _leer(self) -> None:
+        """Tarea lectora: PubSub → colas de los suscriptores locales"""
+        try:
+            while True:
+                mensaje = await self._pubsub.get_message(timeout=1.0)
+                if mensaje is None:
+                    continue
+                canal = mensaje["channel"]
+                if isinstance(canal, bytes):
+                    canal = canal.decode()
+                lote_id = int(canal.rsplit(":", 1)[1])
+                snapshot = json.loads(mensaje["data"])
+                for cola in list(self._suscriptores.get(lote_id, ())):
+                    self._entregar(cola, snapshot)
+        except (RedisError, OSError) as e:
+            # Avisar a todos (None) para que sus streams terminen; los
+            # clientes se reconectan y reciben el estado de la BD
+            self.progress._marcar_caido(e)
+            async with self._lock:
+                for colas in self._suscriptores.values():
+                    for cola in colas:
+                        self._entregar(cola, None)
+                self._suscriptores.clear()
+                await self._cerrar()
+                self._publicar_metricas()
+
+    async def seguir(
+        self, lote_id: int, inicial: Dict[str, Any], espera: float
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Eventos de progreso de un lote hasta que llegue a un estado final.
+
+        Args:
+            lote_id: ID del lote
+            inicial: Evento inicial (armado con la BD si no hay snapshot)
+            espera: Segundos sin eventos tras los que se emite None
+                (keep-alive para el transporte)
+
+        Yields:
+            Eventos (ver evento_progreso) o None en los keep-alive. Sin
+            Redis solo se emite el evento inicial.
+        """
+        if inicial.get("estado") in ESTADOS_FINALES or not self.progress.redis_disponible():
+            yield inicial
+            return
+
+        try:
+            async with self.escuchar(lote_id) as cola:
+                # Releer tras suscribirse: no se pierde ningún evento intermedio
+                snapshot = await self.progress.leer(lote_id)
+                evento = evento_progreso(lote_id, snapshot) if snapshot else inicial
+                yield evento
+
+                while evento.get("estado") not in ESTADOS_FINALES:
+                    try:
+                        snapshot = await asyncio.wait_for(cola.get(), espera)
+                    except asyncio.TimeoutError:
+                        yield None
+                        continue
+                    if snapshot is None:
+                        return
+                    evento = evento_progreso(lote_id, snapshot)
+                    yield evento
+        except (RedisError, OSError) as e:
+            self.progress._marcar_caido(e)
+
+
+lote_progress = LoteProgress(
+    prefix=settings.LOTE_PROGRESS_KEY,
+    redis_url=settings.REDIS_URL,
+    ttl=settings.LOTE_PROGRESS_TTL_SECONDS,
+)
+lote_progress_hub = LoteProgressHub(lote_progress)
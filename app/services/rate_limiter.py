@@ -0,0 +1,334 @@
+"""Rate Limiter - Token bucket distribuido para envíos a Factus"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.send_scheduler import Flujo
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover - redis es opcional
+    aioredis = None
+    RedisError = OSError
+
+
+# Script atómico de reserva (GCRA / token bucket con saldo negativo).
+# Cada llamada pide `requested` tokens y devuelve cuántos milisegundos debe
+# esperar el llamador. Usa el reloj de Redis para que todos los nodos
+# compartan la misma referencia de tiempo.
+#
+# `reserve` > 0 (tráfico de menor prioridad): solo se toman tokens si quedan
+# al menos `reserve` libres; si no, no se reserva nada y se devuelve la espera
+# negativa (-ms) hasta que los haya, para que el llamador vuelva a intentarlo.
+#
+# Reparto justo: si se indica un flujo ("usuario|lote|peso"), se registra en
+# el ZSET de flujos activos (KEYS[2]) y recibe la parte
+#     peso_usuario / suma(pesos de usuarios activos) / lotes activos del usuario
+# de la cuota, en su propio bucket (KEYS[3]). Solo se aplica con el bucket
+# global agotado: sin contención cualquier flujo usa la cuota libre. Con
+# contención, un flujo sin saldo propio espera (-ms) sin reservar.
+#
+# Retorna {espera_ms, parte * 1e6, flujos activos}.
+_RESERVE_SCRIPT = """
+local key = KEYS[1]
+local flujos_key = KEYS[2]
+local flujo_key = KEYS[3]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local flujo = ARGV[5]
+local ttl = tonumber(ARGV[6])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local data = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local share = 1
+local activos = 0
+local f_tokens, f_rate, f_cap
+if flujo ~= '' then
+    redis.call('ZADD', flujos_key, now, flujo)
+    redis.call('ZREMRANGEBYSCORE', flujos_key, '-inf', now - ttl)
+    redis.call('PEXPIRE', flujos_key, ttl)
+
+    local miembros = redis.call('ZRANGE', flujos_key, 0, -1)
+    activos = #miembros
+    local pesos = {}
+    local lotes = {}
+    local mi_usuario
+    for _, m in ipairs(miembros) do
+        local u, w = string.match(m, '^([^|]*)|[^|]*|([^|]*)$')
+        w = tonumber(w) or 1
+        if pesos[u] == nil or w > pesos[u] then
+            pesos[u] = w
+        end
+        lotes[u] = (lotes[u] or 0) + 1
+        if m == flujo then
+            mi_usuario = u
+        end
+    end
+    local total = 0
+    for _, w in pairs(pesos) do
+        total = total + w
+    end
+    share = pesos[mi_usuario] / total / lotes[mi_usuario]
+
+    f_rate = rate * share
+    f_cap = math.max(requested, capacity * share)
+    local fdata = redis.call('HMGET', flujo_key, 'tokens', 'ts')
+    f_tokens = tonumber(fdata[1])
+    local f_ts = tonumber(fdata[2])
+    if f_tokens == nil then
+        f_tokens = f_cap
+        f_ts = now
+    end
+    f_tokens = math.min(f_cap, f_tokens + math.max(0, now - f_ts) * f_rate / 1000)
+end
+
+local wait = 0
+local contencion = tokens - requested < reserve
+if flujo ~= '' and contencion and f_tokens < requested then
+    wait = -math.max(1, math.ceil((requested - f_tokens) * 1000 / f_rate))
+elseif reserve > 0 and contencion then
+    wait = -math.max(1, math.ceil((requested + reserve - tokens) * 1000 / rate))
+else
+    tokens = tokens - requested
+    if tokens < 0 then
+        wait = math.ceil(-tokens * 1000 / rate)
+    end
+    if flujo ~= '' then
+        f_tokens = math.max(-f_cap, f_tokens - requested)
+    end
+end
+
+redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', key, math.abs(wait) + math.ceil(capacity * 1000 / rate) + 1000)
+if flujo ~= '' then
+    redis.call('HSET', flujo_key, 'tokens', f_tokens, 'ts', now)
+    redis.call('PEXPIRE', flujo_key, math.ceil(f_cap * 1000 / f_rate) + ttl)
+end
+return {wait, math.floor(share * 1000000), activos}
+"""
+
+
+class LocalTokenBucket:
+    """
+    Token bucket en memoria (fallback cuando Redis no está disponible).
+
+    Mismo algoritmo de reserva que el script Lua. No necesita lock: entre
+    la lectura y la escritura del estado no hay ningún await.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._ts = time.monotonic()
+
+    def reserve(self, requested: float = 1, reserve: float = 0) -> float:
+        """
+        Reservar tokens; retorna segundos de espera.
+
+        Negativo = no se reservó (respetando `reserve`); reintentar tras
+        esa cantidad de segundos.
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._ts) * self.rate
+        )
+        self._ts = now
+        if reserve > 0 and self._tokens - requested < reserve:
+            return -max(0.001, (requested + reserve - self._tokens) / self.rate)
+        self._tokens -= requested
+        return max(0.0, -self._tokens / self.rate)
+
+
+class TokenBucketRateLimiter:
+    """
+    Rate limiter compartido entre la API y los workers Celery.
+
+    - Redis: un único bucket para toda la flota (clave FACTUS_RATE_LIMIT_KEY),
+      así la suma de todos los nodos respeta la cuota de Factus y la usa completa.
+    - Reparto justo: con la cuota agotada, cada flujo (usuario, lote) activo
+      en la flota recibe su parte ponderada (ver _RESERVE_SCRIPT).
+    - Fallback: si Redis falla, cada proceso usa un bucket local con
+      rate / FACTUS_RATE_LIMIT_NODES para seguir por debajo de la cuota
+      (sin reparto entre flujos). Se reintenta Redis pasado REDIS_RETRY_SECONDS.
+
+    Uso:
+        await factus_rate_limiter.acquire(flujo=Flujo.para_lote(lote.id, usuario_id))
+        response = await client.post(...)
+        ...
+        await factus_rate_limiter.liberar_flujo(flujo)  # al terminar el lote
+    """
+
+    REDIS_RETRY_SECONDS = 30.0
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        key: str,
+        redis_url: Optional[str] = None,
+        nodes: int = 1,
+        enabled: bool = True,
+        flow_ttl: float = 5.0,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.key = key
+        self.flujos_key = f"{key}:flujos"
+        self.flow_ttl = flow_ttl
+        self.redis_url = redis_url
+        self.enabled = enabled and rate > 0
+
+        self._nodes = max(1, nodes)
+        self._local = LocalTokenBucket(rate / self._nodes, capacity / self._nodes)
+        self._redis = None
+        self._redis_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._script = None
+        self._redis_down_until = 0.0
+
+    def _get_script(self):
+        """Script registrado en el cliente Redis del event loop actual"""
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            self._redis = aioredis.from_url(self.redis_url)
+            self._redis_loop = loop
+            self._script = self._redis.register_script(_RESERVE_SCRIPT)
+        return self._script
+
+    def _redis_disponible(self) -> bool:
+        return (
+            aioredis is not None
+            and bool(self.redis_url)
+            and time.monotonic() >= self._redis_down_until
+        )
+
+    def _flujo_key(self, flujo: Flujo) -> str:
+        return f"{self.key}:flujo:{flujo.clave}"
+
+    async def _reserve(
+        self, requested: float, reserve: float, flujo: Optional[Flujo]
+    ) -> float:
+        """Reservar en Redis, o en el bucket local si Redis no responde"""
+        if not self._redis_disponible():
+            return self._local.reserve(requested, reserve / self._nodes)
+
+        try:
+            script = self._get_script()
+            wait_ms, share, activos = await script(
+                keys=[
+                    self.key,
+                    self.flujos_key,
+                    self._flujo_key(flujo) if flujo else self.flujos_key,
+                ],
+                args=[
+                    self.rate,
+                    self.capacity,
+                    requested,
+                    reserve,
+                    flujo.clave if flujo else "",
+                    int(self.flow_ttl * 1000),
+                ],
+            )
+        except (RedisError, OSError) as e:
+            print(f"⚠️  Rate limiter sin Redis ({e}); usando bucket local")
+            self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+            return self._local.reserve(requested, reserve / self._nodes)
+
+        if flujo is not None:
+            metrics.set_gauge("factus_fair_active_flows", int(activos))
+            metrics.set_gauge(
+                "factus_fair_share", int(share) / 1_000_000,
+                usuario=flujo.usuario_id, lote=flujo.lote_id,
+            )
+        return int(wait_ms) / 1000
+
+    async def acquire(
+        self,
+        tokens: float = 1,
+        reserve: float = 0,
+        flujo: Optional[Flujo] = None,
+    ) -> float:
+        """
+        Esperar hasta poder enviar.
+
+        Args:
+            tokens: Tokens a consumir
+            reserve: Tokens que deben quedar libres para tráfico prioritario
+                (0 = reservar en la cola normal)
+            flujo: Flujo masivo (usuario, lote) para el reparto justo
+                (None = sin reparto, ej: tráfico interactivo)
+
+        Returns:
+            Segundos esperados (0 si había tokens disponibles)
+        """
+        if not self.enabled:
+            return 0.0
+
+        esperado = 0.0
+        while True:
+            wait = await self._reserve(tokens, reserve, flujo)
+            if wait >= 0:
+                break
+            # Sin tokens por encima de la reserva: esperar y volver a intentar
+            await asyncio.sleep(-wait)
+            esperado += -wait
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return esperado + wait
+
+    async def liberar_flujo(self, flujo: Flujo) -> None:
+        """
+        Sacar un flujo terminado del reparto.
+
+        Sin esto su parte queda reservada hasta que expira (flow_ttl).
+        """
+        metrics.remove_gauge(
+            "factus_fair_share", usuario=flujo.usuario_id, lote=flujo.lote_id
+        )
+        if not self.enabled or not self._redis_disponible():
+            return
+        try:
+            self._get_script()
+            await self._redis.zrem(self.flujos_key, flujo.clave)
+            await self._redis.delete(self._flujo_key(flujo))
+        except (RedisError, OSError) as e:
+            print(f"⚠️  No se pudo liberar el flujo {flujo.clave} ({e})")
+
+    async def aclose(self):
+        """Cerrar la conexión Redis del event loop actual"""
+        client, loop = self._redis, self._redis_loop
+        self._redis = None
+        self._redis_loop = None
+        self._script = None
+
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+
+factus_rate_limiter = TokenBucketRateLimiter(
+    rate=settings.FACTUS_RATE_LIMIT_PER_SECOND,
+    capacity=max(1, settings.FACTUS_RATE_LIMIT_BURST),
+    key=settings.FACTUS_RATE_LIMIT_KEY,
+    redis_url=settings.REDIS_URL,
+    nodes=settings.FACTUS_RATE_LIMIT_NODES,
+    enabled=settings.FACTUS_RATE_LIMIT_ENABLED,
+    flow_ttl=settings.FACTUS_FAIR_FLOW_TTL,
+)
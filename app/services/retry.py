@@ -0,0 +1,137 @@
+"""Retry - Política de reintentos para envíos a Factus"""
+
+import random
+import uuid
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.models.dead_letter import FALLO_PERMANENTE, FALLO_TRANSITORIO
+
+
+# Namespace fijo: la misma referencia produce siempre la misma clave
+_IDEMPOTENCY_NAMESPACE = uuid.UUID("6f1c3a52-9d0e-4b7a-8e2f-3c5d1a7b9e40")
+
+# status 0 = sin respuesta (timeout / error de red)
+STATUS_REINTENTABLES = frozenset({0, 408, 425, 429, 500, 502, 503, 504})
+
+
+def generar_idempotency_key(reference_code: str) -> str:
+    """
+    Clave de idempotencia estable por código de referencia.
+
+    Se envía en cada intento (reintentos, reanudaciones de lote, re-drives),
+    de modo que Factus puede deduplicar una factura que sí llegó a procesar
+    aunque la respuesta se haya perdido.
+    """
+    return str(uuid.uuid5(_IDEMPOTENCY_NAMESPACE, f"factus-bill:{reference_code}"))
+
+
+def clasificar_fallo(resultado: dict) -> str:
+    """
+    TRANSITORIO si el fallo puede resolverse reenviando más tarde (sin
+    respuesta, 429, 5xx, circuito abierto o presupuesto de reintentos
+    agotado); PERMANENTE si Factus rechazó los datos.
+    """
+    if (
+        resultado.get("status") in STATUS_REINTENTABLES
+        or resultado.get("circuit_open")
+        or resultado.get("retry_budget_agotado")
+    ):
+        return FALLO_TRANSITORIO
+    return FALLO_PERMANENTE
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Interpretar el header Retry-After (segundos o fecha HTTP)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(value)
+        return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """
+    Presupuesto de reintentos de un lote.
+
+    Permite max(minimo, ratio * envíos) reintentos en total. Cuando Factus
+    falla de forma masiva, el lote deja de reintentar en lugar de
+    multiplicar la carga sobre un servicio ya degradado.
+    """
+
+    def __init__(self, ratio: float, minimo: int):
+        self.ratio = ratio
+        self.minimo = minimo
+        self.envios = 0
+        self.reintentos = 0
+
+    def registrar_envio(self) -> None:
+        self.envios += 1
+
+    @property
+    def disponibles(self) -> int:
+        return max(self.minimo, int(self.envios * self.ratio)) - self.reintentos
+
+    def consumir(self) -> bool:
+        """Tomar un reintento del presupuesto; False si está agotado"""
+        if self.disponibles <= 0:
+            return False
+        self.reintentos += 1
+        return True
+
+    @classmethod
+    def para_lote(cls, dispatchers: int = 1) -> "RetryBudget":
+        """
+        Parte del presupuesto del lote para uno de sus `dispatchers`.
+
+        La parte proporcional ya se reparte sola (cada dispatcher cuenta
+        sus propios envíos); el mínimo se divide para que N dispatchers
+        no sumen N veces el mínimo del lote.
+        """
+        return cls(
+            ratio=settings.FACTUS_RETRY_BUDGET_RATIO,
+            minimo=-(-settings.FACTUS_RETRY_BUDGET_MIN // max(1, dispatchers)),
+        )
+
+
+class RetryPolicy:
+    """
+    Reintentos con backoff exponencial y "full jitter".
+
+    Espera del intento n: uniforme en [0, min(max_delay, base * 2^n)],
+    nunca menor que el Retry-After indicado por Factus.
+    """
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def es_reintentable(resultado: dict) -> bool:
+        return resultado.get("status") in STATUS_REINTENTABLES
+
+    def debe_reintentar(self, resultado: dict, intentos: int) -> bool:
+        return intentos < self.max_attempts and self.es_reintentable(resultado)
+
+    def calcular_espera(self, intentos: int, retry_after: Optional[float] = None) -> float:
+        techo = min(self.max_delay, self.base_delay * (2 ** intentos))
+        espera = random.uniform(0, techo)
+        if retry_after is not None:
+            espera = max(espera, min(retry_after, self.max_delay))
+        return espera
+
+
+factus_retry_policy = RetryPolicy(
+    max_attempts=settings.FACTUS_RETRY_MAX_ATTEMPTS,
+    base_delay=settings.FACTUS_RETRY_BASE_DELAY,
+    max_delay=settings.FACTUS_RETRY_MAX_DELAY,
+)
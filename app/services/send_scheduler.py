@@ -0,0 +1,226 @@
+"""Send Scheduler - Orden de salida de los envíos a Factus en espera"""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class Carril(IntEnum):
+    """Carriles de prioridad (menor valor = sale antes)"""
+    INTERACTIVO = 0  # POST /facturas: un usuario espera en pantalla
+    MASIVO = 1       # Pipeline de lotes (Celery)
+
+
+def _parsear_pesos(raw: str) -> Dict[int, float]:
+    """FACTUS_FAIR_USER_WEIGHTS="7:3,12:0.5" → {7: 3.0, 12: 0.5}"""
+    pesos: Dict[int, float] = {}
+    for par in filter(None, (p.strip() for p in raw.split(","))):
+        usuario, _, peso = par.partition(":")
+        pesos[int(usuario)] = max(0.01, float(peso))
+    return pesos
+
+
+_PESOS_USUARIO = _parsear_pesos(settings.FACTUS_FAIR_USER_WEIGHTS)
+
+
+@dataclass(frozen=True)
+class Flujo:
+    """
+    Flujo de envíos masivos para el reparto justo: un lote de un usuario.
+
+    El peso es del usuario (FACTUS_FAIR_USER_WEIGHTS, por defecto 1); los
+    lotes de un mismo usuario se reparten su parte por igual.
+    """
+    usuario_id: Optional[int]
+    lote_id: Optional[int]
+    peso: float = 1.0
+
+    @classmethod
+    def para_lote(cls, lote_id: int, usuario_id: Optional[int]) -> "Flujo":
+        return cls(
+            usuario_id=usuario_id,
+            lote_id=lote_id,
+            peso=_PESOS_USUARIO.get(usuario_id, 1.0),
+        )
+
+    @property
+    def clave(self) -> str:
+        """Identificador estable del flujo (miembro en Redis)"""
+        return f"{self.usuario_id or 0}|{self.lote_id or 0}|{self.peso:g}"
+
+
+# Flujo de los envíos masivos que no indican uno (ej: scripts)
+FLUJO_ANONIMO = Flujo(usuario_id=None, lote_id=None)
+
+
+@dataclass
+class _ColaUsuario:
+    peso: float
+    etiqueta: float = 0.0                  # tag de inicio del usuario
+    v_lotes: float = 0.0                   # tiempo virtual entre sus lotes
+    lotes: Dict[Optional[int], Deque[asyncio.Future]] = field(default_factory=dict)
+    etiquetas_lote: Dict[Optional[int], float] = field(default_factory=dict)
+
+
+class ColaJusta:
+    """
+    Weighted fair queuing de dos niveles (start-time fair queuing).
+
+    - Nivel usuario: cada usuario con envíos en espera tiene un tag de
+      inicio; sale el menor y su tag avanza 1/peso. Un usuario que se
+      activa arranca en el tiempo virtual actual, sin crédito acumulado.
+    - Nivel lote: igual entre los lotes del usuario, con peso 1.
+
+    Así un lote pequeño no espera detrás de uno de 100k: recibe su parte
+    desde el primer envío. Coste O(usuarios activos + lotes del usuario).
+    """
+
+    def __init__(self):
+        self._usuarios: Dict[Optional[int], _ColaUsuario] = {}
+        self._v = 0.0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def push(self, fut: asyncio.Future, flujo: Flujo) -> None:
+        usuario = self._usuarios.get(flujo.usuario_id)
+        if usuario is None:
+            usuario = _ColaUsuario(peso=flujo.peso, etiqueta=self._v)
+            self._usuarios[flujo.usuario_id] = usuario
+
+        cola = usuario.lotes.get(flujo.lote_id)
+        if cola is None:
+            cola = usuario.lotes[flujo.lote_id] = deque()
+            usuario.etiquetas_lote[flujo.lote_id] = usuario.v_lotes
+        cola.append(fut)
+        self._len += 1
+
+    def pop(self) -> Optional[asyncio.Future]:
+        while self._usuarios:
+            usuario_id, usuario = min(
+                self._usuarios.items(), key=lambda item: item[1].etiqueta
+            )
+            lote_id = min(usuario.etiquetas_lote, key=usuario.etiquetas_lote.get)
+            cola = usuario.lotes[lote_id]
+            fut = cola.popleft()
+            self._len -= 1
+
+            # Los futures cancelados se descartan sin contar como servicio
+            if not fut.done():
+                self._v = usuario.etiqueta
+                usuario.etiqueta += 1 / usuario.peso
+                usuario.v_lotes = usuario.etiquetas_lote[lote_id]
+                usuario.etiquetas_lote[lote_id] += 1
+
+            if not cola:
+                del usuario.lotes[lote_id]
+                del usuario.etiquetas_lote[lote_id]
+                if not usuario.lotes:
+                    del self._usuarios[usuario_id]
+
+            if not fut.done():
+                return fut
+        return None
+
+    def clear(self) -> None:
+        self._usuarios.clear()
+        self._len = 0
+
+    def profundidades(self) -> Dict[Tuple[Optional[int], Optional[int]], int]:
+        """Envíos en espera por (usuario, lote)"""
+        return {
+            (usuario_id, lote_id): len(cola)
+            for usuario_id, usuario in self._usuarios.items()
+            for lote_id, cola in usuario.lotes.items()
+        }
+
+
+class SendScheduler:
+    """
+    Cola de espera con carriles de prioridad.
+
+    El tráfico interactivo siempre sale antes que el masivo; el masivo usa
+    la capacidad (ventana de concurrencia) que quede libre y se reparte
+    entre usuarios y lotes con una ColaJusta. Se usa como disciplina de
+    cola del AdaptiveConcurrencyLimiter.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._interactivo: Deque[asyncio.Future] = deque()
+        self._masivo = ColaJusta()
+        self._flujos_publicados: set = set()
+
+    def __len__(self) -> int:
+        return len(self._interactivo) + len(self._masivo)
+
+    def push(
+        self,
+        fut: asyncio.Future,
+        carril: Carril,
+        flujo: Flujo = FLUJO_ANONIMO,
+    ) -> None:
+        if carril == Carril.INTERACTIVO:
+            self._interactivo.append(fut)
+        else:
+            self._masivo.push(fut, flujo)
+        self._publicar_metricas()
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """Siguiente envío en espera (ignora los ya cancelados)"""
+        fut = None
+        while self._interactivo and fut is None:
+            candidato = self._interactivo.popleft()
+            if not candidato.done():
+                fut = candidato
+        if fut is None:
+            fut = self._masivo.pop()
+        self._publicar_metricas()
+        return fut
+
+    def clear(self) -> None:
+        self._interactivo.clear()
+        self._masivo.clear()
+        self._publicar_metricas()
+
+    def _publicar_metricas(self) -> None:
+        metrics.set_gauge(
+            "factus_send_queue_depth", len(self._interactivo),
+            scheduler=self.name, carril=Carril.INTERACTIVO.name,
+        )
+        metrics.set_gauge(
+            "factus_send_queue_depth", len(self._masivo),
+            scheduler=self.name, carril=Carril.MASIVO.name,
+        )
+
+        profundidades = self._masivo.profundidades()
+        for usuario_id, lote_id in self._flujos_publicados - profundidades.keys():
+            metrics.remove_gauge(
+                "factus_fair_queue_depth",
+                scheduler=self.name, usuario=usuario_id, lote=lote_id,
+            )
+        for (usuario_id, lote_id), profundidad in profundidades.items():
+            metrics.set_gauge(
+                "factus_fair_queue_depth", profundidad,
+                scheduler=self.name, usuario=usuario_id, lote=lote_id,
+            )
+        self._flujos_publicados = set(profundidades)
+
+
+def reserva_tokens(carril: Carril) -> float:
+    """
+    Tokens del rate limiter que el carril debe dejar libres.
+
+    El masivo no consume los últimos FACTUS_INTERACTIVE_RESERVE tokens del
+    bucket compartido, así una factura interactiva nunca espera detrás de
+    un lote de 100k.
+    """
+    if carril == Carril.INTERACTIVO:
+        return 0
+    return settings.FACTUS_INTERACTIVE_RESERVE
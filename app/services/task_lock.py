@@ -0,0 +1,64 @@
+"""Task Lock - Exclusión mutua entre tareas Celery vía Redis"""
+
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover - redis es opcional
+    aioredis = None
+    RedisError = OSError
+
+
+# Borrar el lock solo si sigue siendo nuestro: si venció y otra tarea lo
+# tomó, no se le quita
+_LIBERAR_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@asynccontextmanager
+async def lock_tarea(nombre: str, ttl: float) -> AsyncIterator[bool]:
+    """
+    Lock entre workers con expiración (SET NX PX).
+
+    Cede True si se obtuvo y False si otra tarea lo tiene. El TTL lo
+    libera si el worker muere sin soltarlo. Sin Redis (no instalado o
+    caído) cede True: la tarea debe acotar su trabajo por sí misma.
+
+    Uso:
+        async with lock_tarea("despachar-outbox", 600) as adquirido:
+            if adquirido:
+                ...
+    """
+    if aioredis is None or not settings.REDIS_URL:
+        yield True
+        return
+
+    clave = f"factus:lock:{nombre}"
+    token = uuid.uuid4().hex
+    cliente = aioredis.from_url(settings.REDIS_URL)
+    adquirido: Optional[bool] = None
+    try:
+        try:
+            adquirido = bool(
+                await cliente.set(clave, token, nx=True, px=max(1, int(ttl * 1000)))
+            )
+        except (RedisError, OSError) as e:
+            print(f"⚠️  Lock {nombre} sin Redis ({e}); se continúa sin exclusión")
+
+        yield True if adquirido is None else adquirido
+    finally:
+        if adquirido:
+            try:
+                await cliente.eval(_LIBERAR_SCRIPT, 1, clave, token)
+            except (RedisError, OSError):
+                pass
+        await cliente.aclose()
@@ -1,15 +1,45 @@
 import asyncio
+import functools
 import os
 import traceback
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import update
 from sqlalchemy.orm import sessionmaker
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.core.database import DATABASE_URL
-from app.models import Lote, Factura
+from app.core.deadline import Deadline, con_deadline, deadline_expirado
+from app.models import Lote, Factura, FacturaOutbox
+from app.models.factura import ESTADOS_TERMINALES
+from app.models.lote import ESTADOS_DETENIDOS
+from app.repositories.factura_repository import FacturaRepository
+from app.repositories.lote_repository import CambiosContadores, LoteRepository
+from app.repositories.outbox_repository import OutboxRepository
+from app.repositories.dead_letter_repository import DeadLetterRepository
 from app.services.transformer import procesar_archivo_subido
 from app.services.api_client import factus_client
+from app.services.progress import lote_progress
+from app.services.retry import RetryBudget, clasificar_fallo
+from app.services.send_scheduler import Carril, Flujo
+from app.services.task_lock import lock_tarea
+
+# Facturas ingeridas por chunk; cada chunk confirmado es un checkpoint
+TAMANO_CHUNK = settings.LOTE_CHUNK_SIZE
+
+# Facturas ya registradas en BD: terminales o con su envío en el outbox
+ESTADOS_REGISTRADOS = (*ESTADOS_TERMINALES, "PENDIENTE")
+
+# Motivo de un envío omitido: el lease venció y otro dispatcher tomó la fila
+# (los demás motivos son el estado del lote detenido: ESTADOS_DETENIDOS)
+OMITIDO_LEASE = "LEASE_PERDIDO"
+
+# Motivo de rechazo de las facturas que no salen por el estado del lote
+MOTIVO_DETENIDO = {"CANCELADO": "Lote cancelado", "EXPIRADO": "Plazo del lote vencido"}
 
 @celery_app.task(name="procesar_archivo_task")
 def procesar_archivo_task(lote_id: int, file_path: str):
@@ -22,14 +52,377 @@ def procesar_archivo_task(lote_id: int, file_path: str):
         print(f"Error fatal en tarea Celery: {e}")
         traceback.print_exc()
 
-async def _procesar_archivo_async(lote_id: int, file_path: str):
-    # Creamos un motor específico para esta tarea para evitar conflictos de Event Loop
-    # con el motor global si se usara asyncio.run() repetidamente.
-    local_engine = create_async_engine(DATABASE_URL, echo=False)
+@celery_app.task(name="despachar_outbox_task")
+def despachar_outbox_task(lote_id: Optional[int] = None):
+    """
+    Dispatcher del outbox: envía a Factus las facturas pendientes.
+
+    Con lote_id procesa hasta FACTUS_OUTBOX_TASK_BATCHES batches de ese
+    lote y, si quedan envíos, se re-encola; sin él (celery beat) es el
+    barrido global: un solo barrido a la vez (lock en Redis), con
+    FACTUS_OUTBOX_SWEEP_BATCHES batches de cualquier lote, incluidos los
+    envíos de dispatchers caídos (lease vencido).
+    """
+    try:
+        asyncio.run(_despachar_outbox_async(lote_id))
+    except Exception as e:
+        print(f"Error fatal en dispatcher del outbox: {e}")
+        traceback.print_exc()
 
+@celery_app.task(name="redrive_dead_letters_task")
+def redrive_dead_letters_task():
+    """Re-driver programado (celery beat) de facturas con fallo transitorio"""
+    try:
+        asyncio.run(_redrive_dead_letters_async())
+    except Exception as e:
+        print(f"Error fatal en re-driver del dead-letter: {e}")
+        traceback.print_exc()
+
+def _crear_sesiones():
+    """Motor y sesiones propios de la tarea (ligados a su event loop)"""
+    local_engine = create_async_engine(DATABASE_URL, echo=False)
     async_session = sessionmaker(
         local_engine, class_=AsyncSession, expire_on_commit=False
     )
+    return local_engine, async_session
+
+def _reference_code(factura_data: dict) -> str:
+    """Código de referencia con el que se persiste la factura"""
+    return str(factura_data.get("numbering_range_id"))
+
+
+def _factura_pendiente(lote_id: int, factura_data: dict) -> Factura:
+    """Fila Factura PENDIENTE: su envío queda en el outbox"""
+    cust = factura_data.get("customer", {})
+    return Factura(
+        lote_id=lote_id,
+        reference_code=_reference_code(factura_data),
+        cliente_email=cust.get("email", ""),
+        total=factura_data.get("total_bruto", 0.0),
+        estado="PENDIENTE",
+        api_response=None
+    )
+
+
+def _resultado_envio(resp: dict) -> dict:
+    """Columnas de la Factura a partir de la respuesta de Factus"""
+    es_exito = resp["status"] in [200, 201]
+    motivo = None
+    if resp.get("deadline_expirado"):
+        motivo = "Plazo del lote vencido"
+    elif not es_exito:
+        motivo = f"API Error: {resp.get('status')}"
+    return {
+        "estado": "ENVIADA" if es_exito else "ERROR_API",
+        "motivo_rechazo": motivo,
+        "api_response": resp,
+    }
+
+
+def _dead_letter(fila: FacturaOutbox, resp: dict) -> Optional[dict]:
+    """Entrada del dead-letter para un envío fallido (None si fue aceptado)"""
+    if resp["status"] in [200, 201]:
+        return None
+    return {
+        "factura_id": fila.factura_id,
+        "lote_id": fila.lote_id,
+        "payload": fila.payload,
+        "clasificacion": clasificar_fallo(resp),
+        "status": resp.get("status") or 0,
+        "error": str(resp.get("error") or resp.get("response") or "")[:1000],
+        "intentos": resp.get("intentos", 1),
+    }
+
+
+async def _flujos_de(
+    session: AsyncSession,
+    filas: List[FacturaOutbox],
+    flujos: Dict[int, Flujo],
+    plazos: Dict[int, Optional[Deadline]],
+) -> None:
+    """Completar los cachés lote_id → Flujo / Deadline para las filas reclamadas"""
+    faltantes = list({f.lote_id for f in filas if f.lote_id is not None} - flujos.keys())
+    if not faltantes:
+        return
+    lote_repo = LoteRepository(session)
+    usuarios = await lote_repo.get_usuarios(faltantes)
+    for lote_id, usuario_id in usuarios.items():
+        flujos[lote_id] = Flujo.para_lote(lote_id, usuario_id)
+    for lote_id, fecha_limite in (await lote_repo.get_plazos(faltantes)).items():
+        plazos[lote_id] = Deadline.desde_fecha(fecha_limite) if fecha_limite else None
+
+
+def _presupuesto(
+    presupuestos: Dict[Optional[int], RetryBudget], lote_id: Optional[int]
+) -> RetryBudget:
+    """Presupuesto de reintentos del lote en este dispatcher"""
+    if lote_id not in presupuestos:
+        presupuestos[lote_id] = RetryBudget.para_lote(settings.FACTUS_OUTBOX_DISPATCHERS)
+    return presupuestos[lote_id]
+
+
+async def _publicar_resultados(por_lote: Dict[int, Dict[str, int]]) -> None:
+    """Publicar el avance de cada lote tras registrar un batch"""
+    for lote_id, por_estado in por_lote.items():
+        await lote_progress.publicar(
+            lote_id,
+            procesados=sum(por_estado.values()),
+            enviadas=por_estado.get("ENVIADA", 0),
+            errores=por_estado.get("ERROR_API", 0),
+        )
+
+
+async def _publicar_cierres(lote_ids: List[int], estado: str) -> None:
+    for lote_id in lote_ids:
+        await lote_progress.publicar(lote_id, estado=estado)
+
+
+async def _enviar_fila(
+    fila: FacturaOutbox,
+    retry_budget: RetryBudget,
+    flujo: Optional[Flujo],
+    plazo: Optional[Deadline],
+    antes_de_enviar,
+) -> dict:
+    """
+    Enviar una fila del outbox bajo el plazo de su lote.
+
+    Cada envío corre en su propia tarea de gather, así el deadline queda
+    acotado a ese envío (reintentos, esperas y timeout HTTP incluidos).
+    `antes_de_enviar` renueva el lease y mira el estado del lote justo
+    antes de cada POST.
+    """
+    with con_deadline(plazo):
+        return await factus_client.enviar_factura(
+            fila.payload, retry_budget, Carril.MASIVO, flujo, antes_de_enviar
+        )
+
+
+async def _despachar_outbox(
+    async_session,
+    lote_id: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> Tuple[int, bool]:
+    """
+    Drenar el outbox: reclamar un batch, enviarlo y registrar resultados.
+
+    Cada batch se reclama con un lease propio (FOR UPDATE SKIP LOCKED), así
+    varios dispatchers en paralelo nunca envían la misma fila a la vez. Si
+    uno muere, sus filas vuelven a estar disponibles al vencer el lease y
+    el reenvío usa la misma Idempotency-Key.
+
+    Los envíos corren bajo el plazo (fecha_limite) de su lote; al vencer,
+    el lote deja de reclamarse y se cierra como EXPIRADO con lo ya enviado.
+
+    Args:
+        max_batches: Batches a procesar como máximo (None = hasta vaciar)
+
+    Returns:
+        (facturas registradas por este dispatcher, True si se detuvo en
+        max_batches y puede quedar trabajo)
+    """
+    token = uuid.uuid4().hex
+    # Un presupuesto por lote: un lote que falla no agota los reintentos
+    # de los demás lotes del barrido global
+    presupuestos: Dict[Optional[int], RetryBudget] = {}
+    flujos: Dict[int, Flujo] = {}
+    plazos: Dict[int, Optional[Deadline]] = {}
+    # Lotes que este dispatcher vio terminar: solo esos ceden su flujo
+    terminados: Set[int] = set()
+    registradas = 0
+    batches = 0
+    vacio = False
+
+    try:
+        async with async_session() as session:
+            outbox_repo = OutboxRepository(session)
+            # Durante el gather la sesión solo renueva leases, de a uno
+            lock_sesion = asyncio.Lock()
+
+            async def renovar_lease(fila: FacturaOutbox) -> Optional[str]:
+                """Motivo para no enviar la fila, o None si puede salir"""
+                async with lock_sesion:
+                    vigente, estado_lote = await outbox_repo.renovar_lease(
+                        fila.id, token, settings.FACTUS_OUTBOX_LEASE_SECONDS
+                    )
+                if not vigente:
+                    return OMITIDO_LEASE
+                if estado_lote in ESTADOS_DETENIDOS:
+                    return estado_lote
+                return None
+
+            if lote_id is None:
+                # Barrido global: cerrar los lotes cuyo plazo venció
+                expirados = await outbox_repo.expirar_lotes_vencidos()
+                for expirado in expirados:
+                    print(f"⌛ Lote {expirado} expirado (plazo vencido)")
+                await _publicar_cierres(expirados, "EXPIRADO")
+                terminados.update(expirados)
+            while max_batches is None or batches < max_batches:
+                filas = await outbox_repo.reclamar(
+                    token,
+                    settings.FACTUS_OUTBOX_BATCH_SIZE,
+                    settings.FACTUS_OUTBOX_LEASE_SECONDS,
+                    lote_id,
+                )
+                if not filas:
+                    vacio = True
+                    break
+                batches += 1
+                await _flujos_de(session, filas, flujos, plazos)
+                # Cerrar la transacción de esas lecturas antes de los envíos
+                # (minutos): sin "idle in transaction" ni snapshot retenido
+                await session.commit()
+
+                resultados_envio = await asyncio.gather(
+                    *(
+                        _enviar_fila(
+                            fila, _presupuesto(presupuestos, fila.lote_id),
+                            flujos.get(fila.lote_id), plazos.get(fila.lote_id),
+                            functools.partial(renovar_lease, fila),
+                        )
+                        for fila in filas
+                    )
+                )
+
+                # Filas no enviadas porque su lote se detuvo tras el reclamo:
+                # canceladas (lote cancelado o expirado) o de vuelta a
+                # PENDIENTE (pausado). Las de lease perdido las registra el
+                # dispatcher que las tiene ahora.
+                omitidas: Dict[str, List[int]] = {}
+                for fila, resp in zip(filas, resultados_envio):
+                    if resp.get("omitido"):
+                        omitidas.setdefault(resp["omitido"], []).append(fila.id)
+                        if resp["omitido"] in MOTIVO_DETENIDO:
+                            terminados.add(fila.lote_id)
+                for estado_lote, motivo in MOTIVO_DETENIDO.items():
+                    await outbox_repo.cancelar_reclamadas(
+                        token, omitidas.get(estado_lote, []), motivo
+                    )
+                await outbox_repo.liberar_reclamadas(token, omitidas.get("PAUSADO", []))
+
+                # Factura + outbox + dead-letter + contador del lote en la
+                # misma transacción (también las omitidas de arriba)
+                por_lote = await outbox_repo.registrar_resultados(
+                    token,
+                    [
+                        (fila, _resultado_envio(resp), _dead_letter(fila, resp))
+                        for fila, resp in zip(filas, resultados_envio)
+                        if not resp.get("omitido")
+                    ],
+                )
+                registradas += sum(sum(c.values()) for c in por_lote.values())
+                await _publicar_resultados(por_lote)
+                completados = await outbox_repo.completar_lotes_drenados(set(por_lote))
+                await _publicar_cierres(completados, "COMPLETADO")
+                terminados.update(completados)
+
+            # Lote sin nada que reclamar (ya drenado por otros, reanudado
+            # con todo enviado, o con el plazo vencido): cerrarlo si corresponde
+            if vacio and lote_id is not None:
+                if await outbox_repo.expirar_lotes_vencidos(lote_id):
+                    print(f"⌛ Lote {lote_id} expirado (plazo vencido)")
+                    await _publicar_cierres([lote_id], "EXPIRADO")
+                    terminados.add(lote_id)
+                completados = await outbox_repo.completar_lotes_drenados({lote_id})
+                await _publicar_cierres(completados, "COMPLETADO")
+                terminados.update(completados)
+    finally:
+        # Ceder la parte de la cuota de los lotes terminados. El flujo de un
+        # lote que sigue activo no se toca: sus otros dispatchers (o la
+        # tarea que continúa este) siguen enviando con él; si nadie envía,
+        # sale del reparto solo al pasar FACTUS_FAIR_FLOW_TTL
+        for lote_flujo, flujo in flujos.items():
+            if lote_flujo in terminados:
+                await factus_client.rate_limiter.liberar_flujo(flujo)
+
+    return registradas, not vacio
+
+
+async def _redrive_dead_letters_async():
+    """
+    Devolver al outbox los fallos transitorios cuyo backoff venció.
+
+    No envía nada por sí mismo: los reenvíos salen por los dispatchers
+    (rate limiter, concurrencia adaptativa y reparto justo incluidos). Si
+    Factus sigue caído no reencola, para no gastar reenvíos en vano.
+    """
+    local_engine, async_session = _crear_sesiones()
+    try:
+        estado_api = await factus_client.verificar_estado_api()
+        if estado_api["codigo"] >= 500:
+            print(f"⏸️  Re-drive omitido: Factus no disponible ({estado_api['mensaje']})")
+            return
+
+        async with async_session() as session:
+            dead_letters = DeadLetterRepository(session)
+            entradas = await dead_letters.reclamar_para_reenvio(
+                settings.FACTUS_DLQ_REDRIVE_BATCH, settings.FACTUS_DLQ_MAX_REDRIVES
+            )
+            # Entradas + facturas + outbox + lotes en una sola transacción
+            await dead_letters.programar_reenvio(
+                entradas, settings.FACTUS_DLQ_BACKOFF_SECONDS
+            )
+            lotes = await OutboxRepository(session).reencolar(
+                [e.factura_id for e in entradas]
+            )
+            await session.commit()
+
+        if entradas:
+            print(f"🔁 Re-drive: {len(entradas)} facturas devueltas al outbox")
+        for lote_id, cantidad in lotes.items():
+            await lote_progress.publicar(lote_id, procesados=-cantidad, errores=-cantidad)
+            despachar_outbox_task.delay(lote_id)
+    finally:
+        await factus_client.aclose()
+        await lote_progress.aclose()
+        await local_engine.dispose()
+
+
+async def _barrer_outbox(async_session) -> int:
+    """
+    Barrido global acotado: un batch (o pocos) y terminar.
+
+    Beat lo lanza cada FACTUS_OUTBOX_SWEEP_SECONDS; si el anterior sigue
+    corriendo, el nuevo no hace nada. Así no se acumulan barridos
+    ocupando workers que necesita la ingesta de archivos.
+    """
+    ttl = settings.FACTUS_OUTBOX_LEASE_SECONDS * (settings.FACTUS_OUTBOX_SWEEP_BATCHES + 1)
+    async with lock_tarea("despachar-outbox", ttl) as adquirido:
+        if not adquirido:
+            print("⏭️  Barrido del outbox omitido: otro sigue en curso")
+            return 0
+        registradas, _ = await _despachar_outbox(
+            async_session, None, settings.FACTUS_OUTBOX_SWEEP_BATCHES
+        )
+        return registradas
+
+
+async def _despachar_outbox_async(lote_id: Optional[int]):
+    local_engine, async_session = _crear_sesiones()
+    try:
+        if lote_id is None:
+            registradas = await _barrer_outbox(async_session)
+        else:
+            registradas, quedan = await _despachar_outbox(
+                async_session, lote_id, settings.FACTUS_OUTBOX_TASK_BATCHES
+            )
+            if quedan:
+                # Continuar en una tarea nueva: ninguna tarea supera el
+                # visibility_timeout del broker
+                despachar_outbox_task.delay(lote_id)
+        if registradas:
+            print(f"📤 Dispatcher outbox: {registradas} facturas registradas")
+    finally:
+        await factus_client.aclose()
+        await lote_progress.aclose()
+        await local_engine.dispose()
+
+
+async def _procesar_archivo_async(lote_id: int, file_path: str):
+    # Creamos un motor específico para esta tarea para evitar conflictos de Event Loop
+    # con el motor global si se usara asyncio.run() repetidamente.
+    local_engine, async_session = _crear_sesiones()
 
     lote = None
     try:
@@ -40,10 +433,26 @@ async def _procesar_archivo_async(lote_id: int, file_path: str):
                 print(f"Lote {lote_id} no encontrado.")
                 return
 
-            lote.estado = "PROCESANDO"
+            if lote.estado in ("COMPLETADO", "CANCELADO", "EXPIRADO"):
+                # Tarea re-entregada después de terminar: nada que hacer
+                print(f"Lote {lote_id} ya {lote.estado.lower()}, se omite.")
+                return
+
+            if lote.estado == "PROCESANDO":
+                print(
+                    f"♻️  Reanudando lote {lote_id} desde el checkpoint "
+                    f"(chunks completados: {lote.chunks_completados})"
+                )
+
+            # Un lote pausado sigue ingiriendo; solo sus envíos esperan
+            if lote.estado != "PAUSADO":
+                lote.estado = "PROCESANDO"
             session.add(lote)
             await session.commit()
             await session.refresh(lote)
+            await lote_progress.publicar(lote.id, estado=lote.estado)
+            lote_repo = LoteRepository(session)
+            plazo = Deadline.desde_fecha(lote.fecha_limite) if lote.fecha_limite else None
 
             try:
                 # 2. Transformar (Polars)
@@ -58,12 +467,29 @@ async def _procesar_archivo_async(lote_id: int, file_path: str):
                 lote.total_registros = total_docs
                 session.add(lote)
 
+                # Los rechazados se insertan bajo el mismo lock que los chunks:
+                # una ejecución concurrente (re-entrega del broker) espera aquí
+                # y después ve lo que insertó la primera
+                _, chunks = await lote_repo.get_checkpoint(lote.id)
+                if chunks != lote.chunks_completados:
+                    await session.commit()
+                    print(f"♻️  Lote {lote.id}: otra ejecución continúa la ingesta")
+                    return
+
+                # Facturas ya registradas en una ejecución anterior (checkpoint).
+                # No se vuelven a insertar: las PENDIENTE ya tienen su envío
+                # en el outbox.
+                factura_repo = FacturaRepository(session)
+                ya_registradas = await factura_repo.get_reference_codes_by_lote(
+                    lote.id, ESTADOS_REGISTRADOS
+                )
+
                 # 3. Guardar Rechazados (Bulk Insert)
                 facturas_rechazadas_db = []
                 rechazados_map = {}
                 for err in errores_validacion:
                     fid = err["id_factura"]
-                    if fid not in rechazados_map:
+                    if fid not in rechazados_map and fid not in ya_registradas:
                         rechazados_map[fid] = err
 
                 for fid, err_data in rechazados_map.items():
@@ -90,61 +516,116 @@ async def _procesar_archivo_async(lote_id: int, file_path: str):
 
                 if facturas_rechazadas_db:
                     session.add_all(facturas_rechazadas_db)
-                    await session.commit()
+                    # Incremento en SQL: los dispatchers también suman aquí
+                    await session.execute(
+                        update(Lote)
+                        .where(Lote.id == lote.id)
+                        .values(
+                            registros_procesados=Lote.registros_procesados
+                            + len(facturas_rechazadas_db)
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    contadores = CambiosContadores()
+                    for factura in facturas_rechazadas_db:
+                        contadores.mover(lote.id, None, "RECHAZADA", factura.total)
+                    await lote_repo.ajustar_contadores(contadores)
+                lote.fecha_checkpoint = datetime.utcnow()
+                session.add(lote)
+                await session.commit()
+                await lote_progress.publicar(
+                    lote.id,
+                    total=total_docs,
+                    procesados=len(facturas_rechazadas_db),
+                    rechazadas=len(facturas_rechazadas_db),
+                )
 
-                # 4. Enviar a API (Async)
-                tareas_envio = []
-                for factura in lote_facturas:
-                    tarea = factus_client.enviar_factura(factura)
-                    tareas_envio.append(tarea)
-
-                resultados_envio = []
-                if tareas_envio:
-                    resultados_envio = await asyncio.gather(*tareas_envio)
-
-                # 5. Guardar Resultados API
-                facturas_procesadas_db = []
-                # zip para correlacionar solicitud con respuesta
-                for factura_data, resp in zip(lote_facturas, resultados_envio):
-                    es_exito = resp["status"] in [200, 201]
-                    estado_final = "ENVIADA" if es_exito else "ERROR_API"
-
-                    ref = str(factura_data.get("numbering_range_id"))
-                    cust = factura_data.get("customer", {})
-                    email = cust.get("email", "")
-                    total = factura_data.get("total_bruto", 0.0)
-
-                    motivo = None
-                    if not es_exito:
-                        motivo = f"API Error: {resp.get('status')}"
-
-                    facturas_procesadas_db.append(Factura(
-                        lote_id=lote.id,
-                        reference_code=ref,
-                        cliente_email=email,
-                        total=total,
-                        estado=estado_final,
-                        motivo_rechazo=motivo,
-                        api_response=resp
-                    ))
+                # 4. Ingerir por chunks: Factura PENDIENTE + fila del outbox en
+                # la misma transacción (si la factura existe, su envío también).
+                # Orden determinista (group_by de Polars no garantiza orden).
+                pendientes = sorted(
+                    (
+                        f for f in lote_facturas
+                        if _reference_code(f) not in ya_registradas
+                    ),
+                    key=_reference_code,
+                )
 
-                if facturas_procesadas_db:
-                    session.add_all(facturas_procesadas_db)
+                # Bajo el plazo del lote, cada transacción de chunk lleva su
+                # statement_timeout (ver app.core.database)
+                detenido = None
+                with con_deadline(plazo):
+                    for inicio in range(0, len(pendientes), TAMANO_CHUNK):
+                        # Punto de control: bloquear el lote durante el chunk para
+                        # que una cancelación vea (y cancele) todo lo ya ingerido
+                        estado, chunks = await lote_repo.get_checkpoint(lote.id)
+                        if chunks != lote.chunks_completados:
+                            # Otra ejecución de esta tarea (re-entrega del
+                            # broker) ingirió un chunk: sigue ella, así
+                            # ninguna fila se inserta dos veces
+                            await session.commit()
+                            print(f"♻️  Lote {lote.id}: otra ejecución continúa la ingesta")
+                            return
+                        if estado in ("CANCELADO", "EXPIRADO") or deadline_expirado():
+                            await session.commit()
+                            detenido = "CANCELADO" if estado == "CANCELADO" else "EXPIRADO"
+                            break
+                        chunk = pendientes[inicio:inicio + TAMANO_CHUNK]
+                        facturas = [_factura_pendiente(lote.id, f) for f in chunk]
+                        session.add_all(facturas)
+                        await session.flush()
+                        session.add_all([
+                            FacturaOutbox(factura_id=factura.id, lote_id=lote.id, payload=factura_data)
+                            for factura, factura_data in zip(facturas, chunk)
+                        ])
+                        contadores = CambiosContadores()
+                        for factura in facturas:
+                            contadores.mover(lote.id, None, "PENDIENTE", factura.total)
+                        await lote_repo.ajustar_contadores(contadores)
+                        lote.chunks_completados += 1
+                        lote.fecha_checkpoint = datetime.utcnow()
+                        session.add(lote)
+                        await session.commit()
+                        await lote_progress.publicar(lote.id, ingeridas=len(chunk))
+
+                if detenido is not None:
+                    # Si el plazo venció, el lote queda EXPIRADO con lo ya
+                    # ingerido; lo que no salió pasa a CANCELADA (no-op si
+                    # ya estaba cancelado o expirado)
+                    if await OutboxRepository(session).expirar_lotes_vencidos(lote.id):
+                        await _publicar_cierres([lote.id], "EXPIRADO")
+                    print(f"⛔ Lote {lote.id} {detenido.lower()} durante la ingesta")
+                    return
 
-                # 6. Cerrar Lote
-                lote.estado = "COMPLETADO"
+                lote.ingesta_completa = True
                 session.add(lote)
                 await session.commit()
 
+                # 5. Despachar: N dispatchers drenan el outbox del lote en
+                # paralelo, cada uno en su propia tarea (la ingesta termina
+                # aquí). El lote se cierra al drenar (si está pausado, al
+                # reanudarlo).
+                for _ in range(settings.FACTUS_OUTBOX_DISPATCHERS):
+                    despachar_outbox_task.delay(lote.id)
+
             except Exception as e:
                 import traceback
                 traceback.print_exc()
+                if lote and plazo is not None and plazo.expirado:
+                    # statement_timeout del plazo: es expiración, no error
+                    try:
+                        await session.rollback()
+                        if await OutboxRepository(session).expirar_lotes_vencidos(lote.id):
+                            await _publicar_cierres([lote.id], "EXPIRADO")
+                    except:
+                        pass
                 # Si lote fue obtenido, actualizamos estado
-                if lote:
+                elif lote:
                     lote.estado = "ERROR"
                     session.add(lote)
                     try:
                         await session.commit()
+                        await lote_progress.publicar(lote.id, estado="ERROR")
                     except:
                         pass
     except Exception as outer_e:
@@ -155,7 +636,9 @@ async def _procesar_archivo_async(lote_id: int, file_path: str):
         pass
 
     finally:
-        # Cerrar el motor local
+        # Cerrar el pool HTTP de esta tarea (ligado a su event loop) y el motor local
+        await factus_client.aclose()
+        await lote_progress.aclose()
         await local_engine.dispose()
 
         # Limpieza archivo temporal
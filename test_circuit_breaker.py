@@ -0,0 +1,92 @@
+"""
+Tests del circuit breaker (app.services.circuit_breaker)
+
+Ejecutar: pytest test_circuit_breaker.py
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitBreaker, EstadoCircuito
+
+
+class Reloj:
+    """time.monotonic controlado por el test"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self) -> float:
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=reloj.monotonic))
+    return reloj
+
+
+def _abierto(reloj) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+    for _ in range(3):
+        breaker.registrar_fallo()
+    return breaker
+
+
+def test_abre_tras_fallos_consecutivos(reloj):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+    breaker.registrar_fallo()
+    breaker.registrar_fallo()
+    breaker.registrar_exito()
+    breaker.registrar_fallo()
+    breaker.registrar_fallo()
+    assert breaker.cerrado
+
+    breaker.registrar_fallo()
+    assert breaker.estado == EstadoCircuito.ABIERTO
+    assert breaker.tiempo_restante == 10
+
+
+def test_un_solo_sondeo_pasado_el_reset_timeout(reloj):
+    breaker = _abierto(reloj)
+    assert not breaker.intentar_sondeo()
+
+    reloj.ahora += 10
+    assert breaker.intentar_sondeo()
+    assert breaker.estado == EstadoCircuito.SEMI_ABIERTO
+    assert not breaker.intentar_sondeo()
+
+
+def test_sondeo_exitoso_cierra(reloj):
+    breaker = _abierto(reloj)
+    reloj.ahora += 10
+    breaker.intentar_sondeo()
+    breaker.registrar_exito()
+    assert breaker.cerrado and breaker.tiempo_restante == 0
+
+
+def test_sondeo_fallido_vuelve_a_abrir(reloj):
+    breaker = _abierto(reloj)
+    reloj.ahora += 10
+    breaker.intentar_sondeo()
+    breaker.registrar_fallo()
+    assert breaker.estado == EstadoCircuito.ABIERTO
+    assert breaker.tiempo_restante == 10
+
+
+def test_sondeo_sin_respuesta_se_libera_al_expirar(reloj):
+    breaker = _abierto(reloj)
+    reloj.ahora += 10
+    assert breaker.intentar_sondeo()
+
+    # El que tenía el sondeo murió sin registrar resultado
+    reloj.ahora += 10
+    assert breaker.intentar_sondeo()
+
+
+def test_cerrado_no_da_sondeos(reloj):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+    assert not breaker.intentar_sondeo()
@@ -0,0 +1,113 @@
+"""
+Tests del reparto justo entre usuarios y lotes (ColaJusta, Flujo)
+
+Ejecutar: pytest test_cola_justa.py
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.send_scheduler import ColaJusta, Flujo, _parsear_pesos
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def _encolar(loop, cola, flujo, n):
+    futuros = [loop.create_future() for _ in range(n)]
+    for fut in futuros:
+        cola.push(fut, flujo)
+    return futuros
+
+
+def _salida(cola, etiquetas):
+    """Flujo de cada envío en el orden en que sale de la cola"""
+    orden = []
+    while True:
+        fut = cola.pop()
+        if fut is None:
+            return orden
+        orden.append(etiquetas[fut])
+
+
+def _etiquetar(loop, cola, **flujos):
+    etiquetas = {}
+    for nombre, (flujo, n) in flujos.items():
+        for fut in _encolar(loop, cola, flujo, n):
+            etiquetas[fut] = nombre
+    return etiquetas
+
+
+def test_lote_pequeno_no_espera_detras_del_grande(loop):
+    cola = ColaJusta()
+    etiquetas = _etiquetar(
+        loop, cola,
+        grande=(Flujo(usuario_id=1, lote_id=1), 100),
+        pequeno=(Flujo(usuario_id=2, lote_id=2), 3),
+    )
+    assert _salida(cola, etiquetas)[:6] == ["grande", "pequeno"] * 3
+    assert len(cola) == 0
+
+
+def test_pesos_por_usuario(loop):
+    cola = ColaJusta()
+    etiquetas = _etiquetar(
+        loop, cola,
+        pesado=(Flujo(usuario_id=1, lote_id=1, peso=3), 30),
+        normal=(Flujo(usuario_id=2, lote_id=2), 30),
+    )
+    primeros = _salida(cola, etiquetas)[:20]
+    assert primeros.count("pesado") == 15 and primeros.count("normal") == 5
+
+
+def test_lotes_de_un_usuario_comparten_su_parte(loop):
+    cola = ColaJusta()
+    etiquetas = _etiquetar(
+        loop, cola,
+        a1=(Flujo(usuario_id=1, lote_id=1), 20),
+        a2=(Flujo(usuario_id=1, lote_id=2), 20),
+        b=(Flujo(usuario_id=2, lote_id=3), 20),
+    )
+    primeros = _salida(cola, etiquetas)[:20]
+    assert primeros.count("b") == 10
+    assert primeros.count("a1") == 5 and primeros.count("a2") == 5
+
+
+def test_usuario_nuevo_no_acumula_credito(loop):
+    cola = ColaJusta()
+    etiquetas = _etiquetar(loop, cola, viejo=(Flujo(usuario_id=1, lote_id=1), 20))
+    for _ in range(10):
+        cola.pop()
+
+    etiquetas.update(_etiquetar(loop, cola, nuevo=(Flujo(usuario_id=2, lote_id=2), 20)))
+    # Alterna desde su llegada; no recibe 10 envíos seguidos
+    assert _salida(cola, etiquetas)[:4] in (
+        ["viejo", "nuevo"] * 2, ["nuevo", "viejo"] * 2
+    )
+
+
+def test_descarta_cancelados(loop):
+    cola = ColaJusta()
+    cancelado, vivo = _encolar(loop, cola, Flujo(usuario_id=1, lote_id=1), 2)
+    cancelado.cancel()
+    assert cola.pop() is vivo
+    assert cola.pop() is None and len(cola) == 0
+
+
+def test_profundidades(loop):
+    cola = ColaJusta()
+    _encolar(loop, cola, Flujo(usuario_id=1, lote_id=1), 2)
+    _encolar(loop, cola, Flujo(usuario_id=2, lote_id=5), 1)
+    assert cola.profundidades() == {(1, 1): 2, (2, 5): 1}
+
+
+def test_pesos_y_clave_del_flujo():
+    assert _parsear_pesos("7:3, 12:0.5,,") == {7: 3.0, 12: 0.5}
+    assert _parsear_pesos("1:0") == {1: 0.01}
+    assert Flujo(usuario_id=7, lote_id=9, peso=3).clave == "7|9|3"
+    assert Flujo(usuario_id=None, lote_id=None).clave == "0|0|1"
@@ -0,0 +1,122 @@
+"""
+Tests de la ventana AIMD de peticiones en vuelo (app.services.concurrency)
+
+Ejecutar: pytest test_concurrency.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import concurrency
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+from app.services.send_scheduler import Carril, Flujo
+
+
+class Reloj:
+    """time.monotonic controlado por el test"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self) -> float:
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(concurrency, "time", SimpleNamespace(monotonic=reloj.monotonic))
+    return reloj
+
+
+def _limiter(initial=4, min_limit=1, max_limit=8, latency_target=1.0):
+    return AdaptiveConcurrencyLimiter(
+        name="test",
+        initial=initial,
+        min_limit=min_limit,
+        max_limit=max_limit,
+        latency_target=latency_target,
+        backoff=0.5,
+    )
+
+
+def test_ventana_inicial_acotada():
+    assert _limiter(initial=0).limit == 1
+    assert _limiter(initial=50).limit == 8
+
+
+def test_aumento_aditivo_por_ventana_completa():
+    limiter = _limiter(initial=4)
+    for _ in range(4):
+        limiter.release(0.1, sobrecarga=False)
+    assert limiter.limit == pytest.approx(5, abs=0.1)
+
+
+def test_respuesta_lenta_no_agranda_la_ventana():
+    limiter = _limiter(initial=4)
+    limiter.release(5.0, sobrecarga=False)
+    assert limiter.limit == 4
+
+
+def test_sobrecarga_reduce_una_vez_por_latency_target(reloj):
+    limiter = _limiter(initial=8)
+    limiter.release(0.1, sobrecarga=True)
+    limiter.release(0.1, sobrecarga=True)
+    assert limiter.limit == 4
+
+    reloj.ahora += 1.0
+    limiter.release(0.1, sobrecarga=True)
+    assert limiter.limit == 2
+
+    for _ in range(3):
+        reloj.ahora += 1.0
+        limiter.release(0.1, sobrecarga=True)
+    assert limiter.limit == 1
+
+
+def test_ventana_llena_espera_y_el_interactivo_sale_primero():
+    async def caso():
+        limiter = _limiter(initial=1)
+        await limiter.acquire()
+
+        orden = []
+
+        async def enviar(nombre, carril):
+            await limiter.acquire(carril, Flujo(usuario_id=1, lote_id=1))
+            orden.append(nombre)
+
+        masivo = asyncio.create_task(enviar("masivo", Carril.MASIVO))
+        interactivo = asyncio.create_task(enviar("interactivo", Carril.INTERACTIVO))
+        await asyncio.sleep(0)
+        assert orden == [] and limiter.in_flight == 1
+
+        limiter.release(5.0, sobrecarga=False)
+        await interactivo
+        assert orden == ["interactivo"]
+
+        limiter.release(5.0, sobrecarga=False)
+        await masivo
+        return orden
+
+    assert asyncio.run(caso()) == ["interactivo", "masivo"]
+
+
+def test_cancelar_en_espera_no_pierde_el_hueco():
+    async def caso():
+        limiter = _limiter(initial=1)
+        await limiter.acquire()
+        esperando = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        esperando.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await esperando
+        limiter.release(5.0, sobrecarga=False)
+        assert limiter.in_flight == 0
+
+        await asyncio.wait_for(limiter.acquire(), 1)
+        return limiter.in_flight
+
+    assert asyncio.run(caso()) == 1
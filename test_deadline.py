@@ -0,0 +1,82 @@
+"""
+Tests del deadline propagado por contextvars (app.core.deadline)
+
+Ejecutar: pytest test_deadline.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.deadline import (
+    Deadline,
+    DeadlineExpirado,
+    con_deadline,
+    deadline_actual,
+    deadline_expirado,
+    esperar,
+    sin_deadline,
+    tiempo_restante,
+)
+
+
+def test_sin_deadline_no_recorta():
+    assert deadline_actual() is None
+    assert tiempo_restante(30) == 30
+    assert not deadline_expirado()
+
+
+def test_con_deadline_recorta_y_se_restaura():
+    with con_deadline(Deadline.en_segundos(5)) as plazo:
+        assert deadline_actual() is plazo
+        assert 4 < tiempo_restante(30) <= 5
+        assert tiempo_restante(1) == 1
+    assert deadline_actual() is None
+
+
+def test_conserva_el_deadline_mas_estricto():
+    estricto = Deadline.en_segundos(5)
+    with con_deadline(estricto):
+        with con_deadline(Deadline.en_segundos(60)) as plazo:
+            assert plazo is estricto
+        with con_deadline(None) as plazo:
+            assert plazo is estricto
+        mas_estricto = Deadline.en_segundos(1)
+        with con_deadline(mas_estricto) as plazo:
+            assert plazo is mas_estricto
+        assert deadline_actual() is estricto
+
+
+def test_sin_deadline_lo_suspende():
+    with con_deadline(Deadline.en_segundos(-1)):
+        assert deadline_expirado()
+        with sin_deadline():
+            assert deadline_actual() is None
+        assert deadline_expirado()
+
+
+def test_desde_fecha_limite():
+    vencido = Deadline.desde_fecha(datetime.utcnow() - timedelta(seconds=1))
+    assert vencido.expirado and vencido.restante() == 0
+    assert 50 < Deadline.desde_fecha(datetime.utcnow() + timedelta(minutes=1)).restante() <= 60
+
+
+def test_esperar_cancela_al_vencer():
+    async def caso():
+        with con_deadline(Deadline.en_segundos(0.01)):
+            await esperar(asyncio.sleep(10))
+
+    with pytest.raises(DeadlineExpirado):
+        asyncio.run(caso())
+
+
+def test_tareas_hijas_heredan_el_deadline():
+    async def caso():
+        async def restante():
+            return tiempo_restante(30)
+
+        with con_deadline(Deadline.en_segundos(5)):
+            return await asyncio.gather(restante(), asyncio.create_task(restante()))
+
+    assert all(4 < r <= 5 for r in asyncio.run(caso()))
@@ -0,0 +1,56 @@
+"""
+Tests del turno de la sesión entre DataLoaders y resolvers (app.graphql.loaders)
+
+Ejecutar: pytest test_loaders.py
+"""
+
+import asyncio
+
+from app.graphql import loaders as loaders_module
+from app.graphql.loaders import Loaders
+
+
+class SesionExclusiva:
+    """Sesión de prueba que falla si dos corrutinas la usan a la vez"""
+
+    def __init__(self):
+        self.en_uso = False
+        self.consultas = 0
+
+    async def consultar(self):
+        assert not self.en_uso, "uso concurrente de la sesión"
+        self.en_uso = True
+        await asyncio.sleep(0.01)
+        self.en_uso = False
+        self.consultas += 1
+
+
+class LoteRepositoryPrueba:
+    def __init__(self, session):
+        self.session = session
+
+    async def get_by_ids(self, ids):
+        await self.session.consultar()
+        return {}
+
+
+def test_ejecutar_espera_a_los_loaders(monkeypatch):
+    monkeypatch.setattr(loaders_module, "LoteRepository", LoteRepositoryPrueba)
+    sesion = SesionExclusiva()
+
+    async def caso():
+        loaders = Loaders(sesion)
+
+        async def contar():
+            await sesion.consultar()
+            return 42
+
+        # totalCount y edges { node { lote } } en paralelo, como en Strawberry
+        return await asyncio.gather(
+            loaders.ejecutar(contar),
+            loaders.lote.load(1),
+            loaders.ejecutar(contar),
+        )
+
+    assert asyncio.run(caso()) == [42, None, 42]
+    assert sesion.consultas == 3
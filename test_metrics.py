@@ -0,0 +1,15 @@
+"""
+Tests del endpoint /metrics (app.main)
+
+Ejecutar: pytest test_metrics.py
+"""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_metricas_requieren_autenticacion():
+    # Sin `with`: no corre el startup (no necesita la base de datos)
+    client = TestClient(app)
+    assert client.get("/metrics").status_code == 401
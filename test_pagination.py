@@ -0,0 +1,70 @@
+"""
+Tests de los cursores keyset (app.repositories.pagination)
+
+Ejecutar: pytest test_pagination.py
+"""
+
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+
+from app.models import Factura, Lote
+from app.repositories.pagination import (
+    CursorInvalido,
+    _tipo_python,
+    codificar_cursor,
+    decodificar_cursor,
+)
+
+
+def _cursor(valores) -> str:
+    """Cursor armado a mano (como lo haría un cliente que lo manipula)"""
+    crudo = json.dumps(valores).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def test_ida_y_vuelta_por_id():
+    assert decodificar_cursor(codificar_cursor([42]), (Lote.id,)) == (42,)
+
+
+def test_ida_y_vuelta_por_fecha_e_id():
+    fecha = datetime(2026, 1, 2, 3, 4, 5, 678)
+    cursor = codificar_cursor([fecha, 7])
+    assert decodificar_cursor(cursor, (Lote.fecha_carga, Lote.id)) == (fecha, 7)
+
+
+def test_tipo_de_columna_envuelta():
+    # fecha_carga es UTCDateTime (TypeDecorator con python_type = object)
+    assert _tipo_python(Lote.fecha_carga) is datetime
+    assert _tipo_python(Lote.id) is int
+
+
+def test_entero_en_columna_float():
+    assert decodificar_cursor(_cursor([3]), (Factura.total,)) == (3.0,)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "%%%",                  # no es base64 / JSON
+        _cursor({"id": 1}),     # no es una lista
+        _cursor([1, 2]),        # más valores que columnas de orden
+        _cursor(["x"]),         # texto para un id
+        _cursor([1.5]),         # float para un id
+        _cursor([True]),        # bool para un id
+        _cursor([None]),        # nulo
+    ],
+)
+def test_cursor_invalido_por_id(cursor):
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(cursor, (Lote.id,))
+
+
+@pytest.mark.parametrize("fecha", ["ayer", 123])
+def test_cursor_invalido_por_fecha(fecha):
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(_cursor([fecha, 1]), (Lote.fecha_carga, Lote.id))
@@ -0,0 +1,92 @@
+"""
+Tests del token bucket local y del fallback sin Redis (app.services.rate_limiter)
+
+Ejecutar: pytest test_rate_limiter.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import LocalTokenBucket, TokenBucketRateLimiter
+
+
+class Reloj:
+    """time.monotonic controlado por el test"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self) -> float:
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    # Solo el `time` del módulo: el event loop sigue con el reloj real
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=reloj.monotonic))
+    return reloj
+
+
+def test_rafaga_hasta_la_capacidad(reloj):
+    bucket = LocalTokenBucket(rate=10, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Sin tokens: se reserva igual y se espera lo que falta (1 token a 10/s)
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+
+
+def test_recarga_sin_superar_la_capacidad(reloj):
+    bucket = LocalTokenBucket(rate=10, capacity=2)
+    bucket.reserve(2)
+    reloj.ahora += 60
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_reserva_para_trafico_prioritario(reloj):
+    bucket = LocalTokenBucket(rate=10, capacity=5)
+    bucket.reserve(3)
+
+    # Quedan 2: el masivo no toma los 2 reservados y no consume nada
+    espera = bucket.reserve(1, reserve=2)
+    assert espera == pytest.approx(-0.1)
+    # El interactivo (reserve=0) sí los usa
+    assert bucket.reserve(2) == 0.0
+
+
+def test_fallback_local_reparte_la_cuota_entre_nodos():
+    limiter = TokenBucketRateLimiter(rate=10, capacity=20, key="k", nodes=4)
+    assert limiter._local.rate == 2.5
+    assert limiter._local.capacity == 5
+
+
+def test_acquire_deshabilitado_no_espera():
+    limiter = TokenBucketRateLimiter(rate=0, capacity=1, key="k")
+    assert asyncio.run(limiter.acquire()) == 0.0
+
+
+def test_acquire_sin_redis_usa_el_bucket_local(reloj):
+    limiter = TokenBucketRateLimiter(rate=10, capacity=2, key="k", redis_url=None)
+    assert asyncio.run(limiter.acquire(2)) == 0.0
+    assert limiter._local.reserve() == pytest.approx(0.1)
+
+
+def test_redis_caido_pasa_al_bucket_local(reloj):
+    # Puerto cerrado: la conexión falla al instante
+    limiter = TokenBucketRateLimiter(
+        rate=10, capacity=2, key="k", redis_url="redis://127.0.0.1:1/0"
+    )
+
+    async def caso():
+        try:
+            return await limiter.acquire()
+        finally:
+            await limiter.aclose()
+
+    assert asyncio.run(caso()) == 0.0
+    assert limiter._redis_down_until == reloj.ahora + limiter.REDIS_RETRY_SECONDS
+    assert not limiter._redis_disponible()
@@ -0,0 +1,92 @@
+"""
+Tests de la política y el presupuesto de reintentos (app.services.retry)
+
+Ejecutar: pytest test_retry.py
+"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app.core.config import settings
+from app.models.dead_letter import FALLO_PERMANENTE, FALLO_TRANSITORIO
+from app.services import retry
+from app.services.retry import (
+    RetryBudget,
+    RetryPolicy,
+    clasificar_fallo,
+    generar_idempotency_key,
+    parse_retry_after,
+)
+
+
+def test_reintenta_solo_fallos_transitorios():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=1)
+    assert policy.debe_reintentar({"status": 503}, intentos=1)
+    assert policy.debe_reintentar({"status": 0}, intentos=2)
+    assert not policy.debe_reintentar({"status": 503}, intentos=3)
+    assert not policy.debe_reintentar({"status": 422}, intentos=1)
+
+
+def test_espera_con_full_jitter_acotada(monkeypatch):
+    policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=4)
+    monkeypatch.setattr(retry.random, "uniform", lambda a, b: b)
+    assert [policy.calcular_espera(n) for n in range(5)] == [0.5, 1, 2, 4, 4]
+
+    monkeypatch.setattr(retry.random, "uniform", lambda a, b: a)
+    assert policy.calcular_espera(3) == 0
+
+
+def test_retry_after_es_el_minimo_sin_superar_max_delay(monkeypatch):
+    policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=4)
+    monkeypatch.setattr(retry.random, "uniform", lambda a, b: a)
+    assert policy.calcular_espera(1, retry_after=3) == 3
+    assert policy.calcular_espera(1, retry_after=60) == 4
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("mañana") is None
+
+    fecha = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(fecha, usegmt=True)) <= 30
+
+
+def test_presupuesto_minimo_y_proporcional():
+    budget = RetryBudget(ratio=0.1, minimo=2)
+    assert [budget.consumir() for _ in range(3)] == [True, True, False]
+
+    for _ in range(40):
+        budget.registrar_envio()
+    assert budget.disponibles == 2
+    assert budget.consumir() and budget.consumir() and not budget.consumir()
+
+
+def test_presupuesto_del_lote_repartido_entre_dispatchers(monkeypatch):
+    monkeypatch.setattr(settings, "FACTUS_RETRY_BUDGET_MIN", 10)
+    assert RetryBudget.para_lote().minimo == 10
+    assert RetryBudget.para_lote(dispatchers=4).minimo == 3
+    assert RetryBudget.para_lote(dispatchers=0).minimo == 10
+
+
+@pytest.mark.parametrize(
+    "resultado, clasificacion",
+    [
+        ({"status": 0}, FALLO_TRANSITORIO),
+        ({"status": 429}, FALLO_TRANSITORIO),
+        ({"status": 0, "circuit_open": True}, FALLO_TRANSITORIO),
+        ({"status": 503, "retry_budget_agotado": True}, FALLO_TRANSITORIO),
+        ({"status": 422}, FALLO_PERMANENTE),
+        ({"status": 400}, FALLO_PERMANENTE),
+    ],
+)
+def test_clasificar_fallo(resultado, clasificacion):
+    assert clasificar_fallo(resultado) == clasificacion
+
+
+def test_idempotency_key_estable_por_referencia():
+    assert generar_idempotency_key("REF-1") == generar_idempotency_key("REF-1")
+    assert generar_idempotency_key("REF-1") != generar_idempotency_key("REF-2")
@@ -0,0 +1,56 @@
+"""
+Tests de la cola de envíos con carriles de prioridad (app.services.send_scheduler)
+
+Ejecutar: pytest test_send_scheduler.py
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.send_scheduler import Carril, Flujo, SendScheduler, reserva_tokens
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_interactivo_antes_que_masivo(loop):
+    scheduler = SendScheduler("test")
+    masivo = loop.create_future()
+    interactivo = loop.create_future()
+    scheduler.push(masivo, Carril.MASIVO, Flujo(usuario_id=1, lote_id=1))
+    scheduler.push(interactivo, Carril.INTERACTIVO)
+
+    assert len(scheduler) == 2
+    assert scheduler.pop() is interactivo
+    assert scheduler.pop() is masivo
+    assert scheduler.pop() is None
+
+
+def test_descarta_envios_cancelados(loop):
+    scheduler = SendScheduler("test")
+    cancelado, vivo = loop.create_future(), loop.create_future()
+    scheduler.push(cancelado, Carril.INTERACTIVO)
+    scheduler.push(vivo, Carril.MASIVO)
+    cancelado.cancel()
+
+    assert scheduler.pop() is vivo
+    assert scheduler.pop() is None
+
+
+def test_clear_vacia_ambos_carriles(loop):
+    scheduler = SendScheduler("test")
+    scheduler.push(loop.create_future(), Carril.INTERACTIVO)
+    scheduler.push(loop.create_future(), Carril.MASIVO)
+    scheduler.clear()
+    assert len(scheduler) == 0 and scheduler.pop() is None
+
+
+def test_reserva_de_tokens_solo_para_el_masivo():
+    assert reserva_tokens(Carril.INTERACTIVO) == 0
+    assert reserva_tokens(Carril.MASIVO) == settings.FACTUS_INTERACTIVE_RESERVE
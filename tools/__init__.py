@@ -0,0 +1 @@
+"""Herramientas de desarrollo (simulador de Factus, benchmarks)"""
@@ -0,0 +1,282 @@
+"""
+Simulador local de la API Factus.
+
+Implementa /v1/bills/validate y /v1/numbering-ranges sobre HTTP real para
+probar bajo carga el camino completo de FactusService (pool HTTP/2, rate
+limiter, concurrencia AIMD, reintentos, circuit breaker) en una sola
+máquina y sin red.
+
+Ejecutar:
+    python -m tools.factus_simulator --port 5000 --latency-dist lognormal \\
+        --latency-ms 120 --error-429-rate 0.02 --max-rps 50
+
+    # La app apunta al simulador con APP_MODE != TEST y
+    # FACTUS_URL=http://localhost:5000
+
+Perfil en caliente (sin reiniciar):
+    curl -X PUT localhost:5000/_sim/config -H "Content-Type: application/json" \\
+        -d '{"error_5xx_rate": 0.5}'
+    curl localhost:5000/_sim/stats
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+
+class SimulatorConfig(BaseModel):
+    """Perfil de latencia, errores y capacidad del simulador"""
+
+    # fixed | uniform | normal | lognormal | pareto
+    latency_dist: str = Field(default="lognormal", pattern="^(fixed|uniform|normal|lognormal|pareto)$")
+    latency_ms: float = Field(default=100.0, ge=0, description="Media / mediana de latencia")
+    latency_jitter_ms: float = Field(default=30.0, ge=0, description="Dispersión de la latencia")
+    latency_max_ms: float = Field(default=10_000.0, ge=0, description="Tope de latencia")
+
+    error_429_rate: float = Field(default=0.0, ge=0, le=1)
+    error_5xx_rate: float = Field(default=0.0, ge=0, le=1)
+    # Peticiones que nunca responden a tiempo (fuerzan el timeout del cliente)
+    timeout_rate: float = Field(default=0.0, ge=0, le=1)
+    timeout_ms: float = Field(default=60_000.0, ge=0)
+
+    # Capacidad: 0 = sin límite
+    max_rps: float = Field(default=0.0, ge=0, description="Cuota; excedida → 429 + Retry-After")
+    max_concurrency: int = Field(default=0, ge=0, description="Peticiones atendidas a la vez; el resto hace cola")
+
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "SimulatorConfig":
+        """Leer el perfil desde variables SIM_* (ej: SIM_LATENCY_MS=80)"""
+        values = {}
+        for name in cls.model_fields:
+            raw = os.getenv(f"SIM_{name.upper()}")
+            if raw is not None:
+                values[name] = raw
+        return cls(**values)
+
+
+class FactusSimulator:
+    """Estado del simulador: perfil, cuota, cola y estadísticas"""
+
+    def __init__(self, config: SimulatorConfig):
+        self.stats: Counter = Counter()
+        self._idempotencia: Dict[str, dict] = {}
+        self.aplicar_config(config)
+
+    def aplicar_config(self, config: SimulatorConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self._tokens = config.max_rps
+        self._tokens_ts = time.monotonic()
+        self._semaforo = (
+            asyncio.Semaphore(config.max_concurrency) if config.max_concurrency else None
+        )
+
+    # ============= PERFIL =============
+
+    def muestrear_latencia(self) -> float:
+        """Latencia en segundos según la distribución configurada"""
+        c = self.config
+        media, dispersion = c.latency_ms, c.latency_jitter_ms
+
+        if c.latency_dist == "fixed":
+            ms = media
+        elif c.latency_dist == "uniform":
+            ms = self.rng.uniform(max(0.0, media - dispersion), media + dispersion)
+        elif c.latency_dist == "normal":
+            ms = self.rng.gauss(media, dispersion)
+        elif c.latency_dist == "lognormal":
+            # media = mediana; dispersion controla la cola larga
+            sigma = dispersion / media if media > 0 else 0.0
+            ms = media * self.rng.lognormvariate(0.0, sigma)
+        else:  # pareto: cola muy pesada, mínimo = media
+            ms = media * self.rng.paretovariate(max(1.01, media / max(dispersion, 1e-9)))
+
+        return min(max(ms, 0.0), c.latency_max_ms) / 1000
+
+    def tomar_cuota(self) -> Optional[float]:
+        """None si hay cuota; si no, segundos hasta el próximo token"""
+        rate = self.config.max_rps
+        if rate <= 0:
+            return None
+        now = time.monotonic()
+        self._tokens = min(rate, self._tokens + (now - self._tokens_ts) * rate)
+        self._tokens_ts = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return None
+        return (1 - self._tokens) / rate
+
+    async def atender(self) -> Optional[JSONResponse]:
+        """
+        Aplicar cuota, errores inyectados, cola y latencia.
+
+        Returns:
+            Respuesta de error a devolver, o None si la petición tiene éxito
+        """
+        self.stats["requests"] += 1
+
+        espera = self.tomar_cuota()
+        if espera is not None:
+            self.stats["429_quota"] += 1
+            return _error(429, "Too Many Requests", {"Retry-After": f"{espera:.3f}"})
+
+        tirada = self.rng.random()
+        c = self.config
+        if tirada < c.error_429_rate:
+            self.stats["429_injected"] += 1
+            return _error(429, "Too Many Requests", {"Retry-After": "1"})
+        tirada -= c.error_429_rate
+        if tirada < c.error_5xx_rate:
+            self.stats["5xx_injected"] += 1
+            await asyncio.sleep(self.muestrear_latencia())
+            return _error(self.rng.choice([500, 502, 503, 504]), "Upstream error")
+        tirada -= c.error_5xx_rate
+        if tirada < c.timeout_rate:
+            self.stats["timeouts_injected"] += 1
+            await asyncio.sleep(c.timeout_ms / 1000)
+            return _error(504, "Gateway Timeout")
+
+        if self._semaforo is not None:
+            async with self._semaforo:
+                await asyncio.sleep(self.muestrear_latencia())
+        else:
+            await asyncio.sleep(self.muestrear_latencia())
+        return None
+
+    # ============= IDEMPOTENCIA =============
+
+    def respuesta_previa(self, key: Optional[str]) -> Optional[dict]:
+        return self._idempotencia.get(key) if key else None
+
+    def guardar_respuesta(self, key: Optional[str], body: dict) -> None:
+        if key:
+            self._idempotencia[key] = body
+
+
+def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"status": "Error", "message": message},
+        headers=headers,
+    )
+
+
+def create_app(config: Optional[SimulatorConfig] = None) -> FastAPI:
+    """Construir la app del simulador con el perfil dado (o SIM_* del entorno)"""
+    sim = FactusSimulator(config or SimulatorConfig.from_env())
+    app = FastAPI(title="Factus Simulator", version="1.0.0")
+    app.state.simulator = sim
+
+    @app.post("/v1/bills/validate")
+    async def validate_bill(
+        request: Request,
+        idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    ):
+        previa = sim.respuesta_previa(idempotency_key)
+        if previa is not None:
+            sim.stats["idempotent_replays"] += 1
+            return JSONResponse(status_code=201, content=previa, headers={"Idempotent-Replayed": "true"})
+
+        error = await sim.atender()
+        if error is not None:
+            return error
+
+        payload = await request.json()
+        faltantes = [k for k in ("reference_code", "customer", "items") if not payload.get(k)]
+        if faltantes:
+            sim.stats["422"] += 1
+            return JSONResponse(
+                status_code=422,
+                content={"status": "Validation error", "message": f"Campos requeridos: {', '.join(faltantes)}"},
+            )
+
+        ref = str(payload["reference_code"])
+        body = {
+            "status": "Created",
+            "message": "Documento con el código de referencia registrado con éxito [SIMULATOR]",
+            "data": {
+                "bill": {
+                    "number": f"SETP{sim.stats['201'] + 990000001}",
+                    "reference_code": ref,
+                    "cufe": uuid.uuid5(uuid.NAMESPACE_OID, ref).hex,
+                    "qr": f"https://simulator.local/qr/{ref}",
+                }
+            },
+        }
+        sim.stats["201"] += 1
+        sim.guardar_respuesta(idempotency_key, body)
+        return JSONResponse(status_code=201, content=body)
+
+    @app.get("/v1/numbering-ranges")
+    async def numbering_ranges():
+        error = await sim.atender()
+        if error is not None:
+            return error
+        return {
+            "status": "OK",
+            "data": [
+                {"id": 8, "document": "Factura de Venta", "prefix": "SETP", "from": 990000000, "to": 995000000}
+            ],
+        }
+
+    @app.get("/_sim/config", response_model=SimulatorConfig)
+    async def get_config():
+        return sim.config
+
+    @app.put("/_sim/config", response_model=SimulatorConfig)
+    async def update_config(cambios: dict):
+        """Cambiar el perfil en caliente (solo los campos enviados)"""
+        sim.aplicar_config(SimulatorConfig(**{**sim.config.model_dump(), **cambios}))
+        return sim.config
+
+    @app.get("/_sim/stats")
+    async def get_stats():
+        return dict(sim.stats)
+
+    @app.post("/_sim/reset")
+    async def reset_stats():
+        sim.stats.clear()
+        sim._idempotencia.clear()
+        return {"reset": True}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local de la API Factus")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    defaults = SimulatorConfig.from_env()
+    for name, field in SimulatorConfig.model_fields.items():
+        tipo = field.annotation if field.annotation in (int, float, str) else str
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=tipo,
+            default=getattr(defaults, name),
+            help=field.description,
+        )
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+
+    import uvicorn
+
+    uvicorn.run(create_app(SimulatorConfig(**args)), host=host, port=port, log_level="warning")
+
+
+# Para `uvicorn tools.factus_simulator:app --port 5000` (perfil desde SIM_*)
+app = create_app()
+
+
+if __name__ == "__main__":
+    main()